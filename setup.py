@@ -1,16 +1,59 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 from setuptools import setup, Extension, find_packages
+import os
+import shutil
+import tempfile
+
+
+def has_fftw():
+    """
+    Check whether the single precision FFTW library can be linked. Set
+    TOMOPY_USE_FFTW=0 to build with the bundled FFT routines instead.
+    """
+    if os.environ.get('TOMOPY_USE_FFTW', '1') == '0':
+        return False
+    from distutils.ccompiler import new_compiler
+    from distutils.errors import CompileError, LinkError
+    from distutils.sysconfig import customize_compiler
+
+    compiler = new_compiler()
+    customize_compiler(compiler)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        src = os.path.join(tmpdir, 'fftw.c')
+        with open(src, 'w') as f:
+            f.write('#include <fftw3.h>\n'
+                    'void probe(void) { fftwf_cleanup(); }\n')
+        objs = compiler.compile([src], output_dir=tmpdir)
+        compiler.link_shared_object(
+            objs, os.path.join(tmpdir, 'fftw.so'), libraries=['fftw3f'])
+    except (CompileError, LinkError):
+        return False
+    finally:
+        shutil.rmtree(tmpdir)
+    return True
+
+
+define_macros = []
+libraries = []
+if has_fftw():
+    define_macros.append(('USE_FFTW', None))
+    libraries.append('fftw3f')
 
 tomoc = Extension(
     name='lib.libtomopy',
-    extra_compile_args=['-std=c99'],
+    extra_compile_args=['-std=c99', '-fopenmp', '-fno-trapping-math'],
+    extra_link_args=['-fopenmp', '-fno-trapping-math'],
+    define_macros=define_macros,
+    libraries=libraries,
     sources=[
         'src/corr.c',
         'src/utils.c',
         'src/simulate.c',
         'src/gridrec.c',
         'src/fft.c',
+        'src/fftplan.c',
         'src/art.c',
         'src/bart.c',
         'src/fbp.c',
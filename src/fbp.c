@@ -41,126 +41,169 @@
 // ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
 // POSSIBILITY OF SUCH DAMAGE.
 
-#include "utils.h"
+#include "gridrec.h"
+#include "fftplan.h"
+
+
+// Build the frequency response of the band-limited ramp filter 
+// (Ram-Lak kernel sampled in real space, so that the zero frequency 
+// is handled correctly) apodized with the gridrec filter window. 
+// The response includes the 1/pd normalization of the inverse FFT 
+// and the PI/dx angular integration step.
+static void 
+set_fbp_filter(int dx, int pd, float (*pf)(float), float *H)
+{
+    int j, pd2 = pd >> 1;
+    float f;
+    complex *h = malloc_vector_c(pd);
+    fft_plan *plan = fft_get_plan(1, &pd);
+
+    if (pf == filter_none)
+    {
+        for (j=0; j<pd; j++)
+        {
+            H[j] = PI/dx/pd;
+        }
+        free(h);
+        return;
+    }
+
+    for (j=0; j<pd; j++)
+    {
+        h[j].r = h[j].i = 0.0;
+    }
+    h[0].r = 0.25;
+    for (j=1; j<=pd2; j+=2)
+    {
+        h[j].r = h[pd-j].r = -1.0/(PI*PI*j*j);
+    }
+    fft_execute(plan, (float*)h, 1);
+
+    for (j=0; j<pd; j++)
+    {
+        H[j] = h[j].r*PI/dx/pd;
+        if (j > 0)
+        {
+            // Window of the filter, i.e. its ratio to the ideal ramp.
+            f = (float)min(j, pd-j)/pd;
+            H[j] *= (*pf)(f)/f;
+        }
+    }
+    free(h);
+}
 
 
 void 
 fbp(
     float *data, int dx, int dy, int dz, float *center, float *theta,
-    float *recon, int ngridx, int ngridy)
+    float *recon, int ngridx, int ngridy, char *fname, int ncore)
 {
-    float *gridx = (float *)malloc((ngridx+1)*sizeof(float));
-    float *gridy = (float *)malloc((ngridy+1)*sizeof(float));
-    float *coordx = (float *)malloc((ngridy+1)*sizeof(float));
-    float *coordy = (float *)malloc((ngridx+1)*sizeof(float));
-    float *ax = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *ay = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *bx = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *by = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *coorx = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *coory = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *dist = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    int *indi = (int *)malloc((ngridx+ngridy)*sizeof(int));
-
-    assert(coordx != NULL && coordy != NULL &&
-        ax != NULL && ay != NULL && by != NULL && bx != NULL &&
-        coorx != NULL && coory != NULL && dist != NULL && indi != NULL);
-
-    int s, p, d, n;
-    int quadrant;
-    float theta_p, sin_p, cos_p;
-    float mov, xi, yi;
-    int asize, bsize, csize;
-    float* simdata;
-    int ind_data, ind_recon;
-
-    simdata = (float *)calloc((dx*dy*dz), sizeof(float));
+    int s, p, j, ix, iy, pd;
+    int ld = dz+3;
+    float *H, *sine, *cose, *filt;
+    complex *sino;
+    fft_plan *plan;
+
+    // Zero-pad the projections to at least twice their length so 
+    // that the circular convolution does not wrap around.
+    pd = 1;
+    while (pd < 2*dz)
+    {
+        pd <<= 1;
+    }
+
+    plan = fft_get_plan(1, &pd);
+    H = malloc_vector_f(pd);
+    set_fbp_filter(dx, pd, get_filter(fname), H);
+    set_trig_tables(dx, theta, &sine, &cose);
 
     // For each slice
-    for (s=0; s<dy; s++) 
+    #pragma omp parallel num_threads(ncore) \
+        private(s, p, j, ix, iy, sino, filt)
     {
-        preprocessing(ngridx, ngridy, dz, center[s], 
-            &mov, gridx, gridy); // Outputs: mov, gridx, gridy
-            
-        // For each projection angle 
-        for (p=0; p<dx; p++) 
+        // Filtered sinogram of the slice, indexed (d+1)+p*ld. One zero 
+        // sample in front and two behind each row let the 
+        // backprojector clamp instead of testing the detector bounds.
+        sino = malloc_vector_c(pd);
+        filt = (float *)calloc(dx*ld, sizeof(float));
+
+        #pragma omp for schedule(dynamic)
+        for (s=0; s<dy; s++)
         {
-            // Calculate the sin and cos values 
-            // of the projection angle and find
-            // at which quadrant on the cartesian grid.
-            theta_p = fmod(theta[p], 2*M_PI);
-            quadrant = calc_quadrant(theta_p);
-            sin_p = sinf(theta_p);
-            cos_p = cosf(theta_p);
-
-            // For each detector pixel 
-            for (d=0; d<dz; d++) 
+            float *slice = data+s*dz;
+            float *obj = recon+s*ngridx*ngridy;
+
+            // Filter two projections at once, one in the real and one 
+            // in the imaginary part. The filter is real and even, so 
+            // the two do not mix.
+            for (p=0; p<dx; p+=2)
             {
-                // Calculate coordinates
-                xi = -1e6;
-                yi = -(dz-1)/2.0+d+mov;
-                calc_coords(
-                    ngridx, ngridy, xi, yi, sin_p, cos_p, gridx, gridy, 
-                    coordx, coordy);
-
-                // Merge the (coordx, gridy) and (gridx, coordy)
-                trim_coords(
-                    ngridx, ngridy, coordx, coordy, gridx, gridy, 
-                    &asize, ax, ay, &bsize, bx, by);
-
-                // Sort the array of intersection points (ax, ay) and
-                // (bx, by). The new sorted intersection points are 
-                // stored in (coorx, coory). Total number of points 
-                // are csize.
-                sort_intersections(
-                    quadrant, asize, ax, ay, bsize, bx, by, 
-                    &csize, coorx, coory);
-
-                // Calculate the distances (dist) between the 
-                // intersection points (coorx, coory). Find the 
-                // indices of the pixels on the reconstruction grid.
-                calc_dist(
-                    ngridx, ngridy, csize, coorx, coory, 
-                    indi, dist);
-
-                // Calculate simdata 
-                calc_simdata(p, s, d, ngridx, ngridy, dy, dz,
-                    csize, indi, dist, recon,
-                    simdata); // Output: simdata
-
-
-                // Calculate dist*dist
-                float sum_dist2 = 0.0;
-                for (n=0; n<csize-1; n++) 
+                for (j=0; j<dz; j++)
+                {
+                    sino[j].r = slice[j+p*dy*dz];
+                    sino[j].i = (p+1 < dx) ? slice[j+(p+1)*dy*dz] : 0.0;
+                }
+                for (; j<pd; j++)
                 {
-                    sum_dist2 += dist[n]*dist[n];
+                    sino[j].r = sino[j].i = 0.0;
                 }
 
-                // Update
-                if (sum_dist2 != 0.0) 
+                fft_execute(plan, (float*)sino, 1);
+                for (j=0; j<pd; j++)
+                {
+                    sino[j].r *= H[j];
+                    sino[j].i *= H[j];
+                }
+                fft_execute(plan, (float*)sino, -1);
+
+                for (j=0; j<dz; j++)
+                {
+                    filt[j+1+p*ld] = sino[j].r;
+                }
+                if (p+1 < dx)
                 {
-                    ind_recon = s*ngridx*ngridy;
-                    ind_data = d+s*dz+p*dy*dz;
-                    for (n=0; n<csize-1; n++) 
+                    for (j=0; j<dz; j++)
                     {
-                        recon[indi[n]+ind_recon] += data[ind_data]*dist[n];
+                        filt[j+1+(p+1)*ld] = sino[j].i;
+                    }
+                }
+            }
+
+            // Pixel-driven backprojection. The center of pixel 
+            // (ix, iy) projects onto the fractional detector position 
+            // -x*sin+y*cos+center-0.5, which is interpolated linearly 
+            // between the two nearest filtered samples.
+            float umax = dz+1;
+            float y0 = -ngridy/2.0+0.5;
+            for (ix=0; ix<ngridx; ix++)
+            {
+                float x = -ngridx/2.0+ix+0.5;
+                float *row = obj+ix*ngridy;
+                for (p=0; p<dx; p++)
+                {
+                    float *q = filt+p*ld;
+                    float c = cose[p];
+                    float u0 = -x*sine[p]+y0*c+center[s]+0.5;
+
+                    #pragma omp simd
+                    for (iy=0; iy<ngridy; iy++)
+                    {
+                        float u = u0+iy*c;
+                        u = (u < 0.0f) ? 0.0f : u;
+                        u = (u > umax) ? umax : u;
+                        int i = (int)u;
+                        float w = u-i;
+                        row[iy] += (1.0f-w)*q[i]+w*q[i+1];
                     }
                 }
             }
         }
+
+        free(sino);
+        free(filt);
     }
 
-    free(simdata);
-    free(gridx);
-    free(gridy);
-    free(coordx);
-    free(coordy);
-    free(ax);
-    free(ay);
-    free(bx);
-    free(by);
-    free(coorx);
-    free(coory);
-    free(dist);
-    free(indi);
-}
\ No newline at end of file
+    free(sine);
+    free(cose);
+    free(H);
+}
@@ -0,0 +1,155 @@
+// Copyright (c) 2015, UChicago Argonne, LLC. All rights reserved.
+
+// Copyright 2015. UChicago Argonne, LLC. This software was produced 
+// under U.S. Government contract DE-AC02-06CH11357 for Argonne National 
+// Laboratory (ANL), which is operated by UChicago Argonne, LLC for the 
+// U.S. Department of Energy. The U.S. Government has rights to use, 
+// reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR 
+// UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR 
+// ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is 
+// modified to produce derivative works, such modified software should 
+// be clearly marked, so as not to confuse it with the version available 
+// from ANL.
+
+// Additionally, redistribution and use in source and binary forms, with 
+// or without modification, are permitted provided that the following 
+// conditions are met:
+
+//     * Redistributions of source code must retain the above copyright 
+//       notice, this list of conditions and the following disclaimer. 
+
+//     * Redistributions in binary form must reproduce the above copyright 
+//       notice, this list of conditions and the following disclaimer in 
+//       the documentation and/or other materials provided with the 
+//       distribution. 
+
+//     * Neither the name of UChicago Argonne, LLC, Argonne National 
+//       Laboratory, ANL, the U.S. Government, nor the names of its 
+//       contributors may be used to endorse or promote products derived 
+//       from this software without specific prior written permission. 
+
+// THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS 
+// "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT 
+// LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS 
+// FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago 
+// Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, 
+// INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, 
+// BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; 
+// LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER 
+// CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT 
+// LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN 
+// ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE 
+// POSSIBILITY OF SUCH DAMAGE.
+
+#include "fftplan.h"
+#include "fft.h"
+#include <assert.h>
+
+#ifdef USE_FFTW
+#include <fftw3.h>
+#endif
+
+
+struct fft_plan 
+{
+    int ndim;
+    int n[FFT_MAX_DIMS];
+    unsigned long nn[FFT_MAX_DIMS+1]; // 1-based sizes for fourn
+#ifdef USE_FFTW
+    fftwf_plan plan_p; // isign=1
+    fftwf_plan plan_m; // isign=-1
+#endif
+    struct fft_plan *next;
+};
+
+
+// Plans created so far. The list only grows; guarded by the fftplan 
+// critical section, which also serializes the (not thread-safe) FFTW 
+// planner.
+static fft_plan *plans = NULL;
+
+
+static fft_plan* 
+create_plan(int ndim, const int *n)
+{
+    int i;
+    fft_plan *plan = (fft_plan *)malloc(sizeof(fft_plan));
+    assert(plan != NULL);
+
+    plan->ndim = ndim;
+    for (i=0; i<ndim; i++)
+    {
+        plan->n[i] = n[i];
+        plan->nn[i+1] = n[i];
+    }
+
+#ifdef USE_FFTW
+    // FFTW_ESTIMATE does not touch the array, and FFTW_UNALIGNED lets 
+    // the plan be executed on any array of the same size.
+    long size = 1;
+    for (i=0; i<ndim; i++)
+    {
+        size *= n[i];
+    }
+    fftwf_complex *tmp = fftwf_malloc(size*sizeof(fftwf_complex));
+    plan->plan_p = fftwf_plan_dft(ndim, n, tmp, tmp, 
+        FFTW_BACKWARD, FFTW_ESTIMATE | FFTW_UNALIGNED);
+    plan->plan_m = fftwf_plan_dft(ndim, n, tmp, tmp, 
+        FFTW_FORWARD, FFTW_ESTIMATE | FFTW_UNALIGNED);
+    fftwf_free(tmp);
+#endif
+    return plan;
+}
+
+
+fft_plan* 
+fft_get_plan(int ndim, const int *n)
+{
+    int i, same;
+    fft_plan *plan;
+
+    assert(ndim >= 1 && ndim <= FFT_MAX_DIMS);
+
+    #pragma omp critical(fftplan)
+    {
+        for (plan=plans; plan!=NULL; plan=plan->next)
+        {
+            same = (plan->ndim == ndim);
+            for (i=0; same && i<ndim; i++)
+            {
+                same = (plan->n[i] == n[i]);
+            }
+            if (same)
+            {
+                break;
+            }
+        }
+        if (plan == NULL)
+        {
+            plan = create_plan(ndim, n);
+            plan->next = plans;
+            plans = plan;
+        }
+    }
+    return plan;
+}
+
+
+void 
+fft_execute(fft_plan *plan, float *data, int isign)
+{
+#ifdef USE_FFTW
+    fftwf_execute_dft(
+        (isign == 1) ? plan->plan_p : plan->plan_m, 
+        (fftwf_complex *)data, (fftwf_complex *)data);
+#else
+    if (plan->ndim == 1)
+    {
+        four1(data-1, plan->nn[1], isign);
+    }
+    else
+    {
+        fourn(data-1, plan->nn, plan->ndim, isign);
+    }
+#endif
+}
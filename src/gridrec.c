@@ -42,28 +42,24 @@
 // POSSIBILITY OF SUCH DAMAGE.
 
 #include "gridrec.h"
-#include "fft.h"
+#include "fftplan.h"
 
 
-void 
-gridrec(
-    float *data, int dx, int dy, int dz, float *center, float *theta, 
-    float *recon, int ngridx, int ngridy, char *fname)
+gridrec_plan* 
+gridrec_create_plan(
+    int dx, int dz, float *theta, int ngridx, int ngridy, char *fname)
 {
-    int s, p, iu, iv;
-    float (*filter)(float);
-    float ***data3d, ***recon3d;
-    float *sine, *cose, *wtbl, *work, *winv;
+    gridrec_plan *plan;
     float C, nt, lambda;
-    float L;
-    int ltbl = 512;
-    int itmp, pdim, M02;
-    complex *sino, *filphase, **H;
-
-    data3d = convert(data, dx, dy, dz);
-    recon3d = convert(recon, dy, ngridx, ngridy);
+    int itmp, pdim;
 
-    filter = get_filter(fname);
+    plan = (gridrec_plan *)malloc(sizeof(gridrec_plan));
+    plan->dx = dx;
+    plan->dz = dz;
+    plan->ngridx = ngridx;
+    plan->ngridy = ngridy;
+    plan->filter = get_filter(fname);
+    plan->filters = NULL;
 
     C = 7.0;
     nt = 20;
@@ -83,251 +79,559 @@ gridrec(
         itmp >>= 1;
     }
 
-    M02 = pdim/2-1;
-    L = (int)2*C/PI;
+    plan->pdim = pdim;
+    plan->M02 = pdim/2-1;
+
+    // Get the (cached) plans of the projection and image transforms.
+    int H_size[2] = {pdim, pdim};
+    plan->plan1d = fft_get_plan(1, &pdim);
+    plan->plan2d = fft_get_plan(2, H_size);
+
+    plan->C = C;
+    plan->L = (int)2*C/PI;
+    plan->ltbl = 512;
 
-    // Allocate storage for various arrays.
-    sino = malloc_vector_c(pdim); 
-    filphase = malloc_vector_c(pdim/2);   
-    H = malloc_matrix_c(pdim, pdim);
-    wtbl = malloc_vector_f(ltbl+1);
-    winv = malloc_vector_f(pdim-1);
-    work = malloc_vector_f(L+1);
+    // Allocate storage for the lookup tables.
+    plan->wtbl = malloc_vector_f(plan->ltbl+1);
+    plan->winv = malloc_vector_f(pdim-1);
 
     // Set up table of sines and cosines.
-    set_trig_tables(dx, theta, &sine, &cose);    
+    set_trig_tables(dx, theta, &plan->sine, &plan->cose);    
 
     // Set up PSWF lookup tables.
-    set_pswf_tables(C, nt, lambda, coefs, ltbl, M02, wtbl, winv);
+    set_pswf_tables(
+        C, nt, lambda, coefs, plan->ltbl, plan->M02, 
+        plan->wtbl, plan->winv);
 
-    // For each slice.
-    for(s=0; s<dy-1; s+=2)
+    return plan;
+}
+
+
+void 
+gridrec_destroy_plan(gridrec_plan *plan)
+{
+    filter_table *t, *next;
+
+    for(t=plan->filters; t!=NULL; t=next)
     {
-        // Set up table of combined filter-phase factors.
-        set_filter_tables(dx, pdim, center[s], filter, filphase);
+        next = t->next;
+        free(t->filphase);
+        free(t);
+    }
+    free(plan->sine);
+    free(plan->cose);
+    free(plan->wtbl);
+    free(plan->winv);
+    free(plan);
+}
+
 
-        // First clear the array H
-        for(iu=0; iu<pdim; iu++) 
+static void 
+trim_filter_tables(gridrec_plan *plan)
+{
+    // Free the least recently used tables beyond the first 
+    // MAX_FILTER_TABLES of the list which no thread is using. Must be 
+    // called inside the gridrec_filter critical section.
+    filter_table *t, *prev = NULL;
+    int n = 0;
+
+    for(t=plan->filters; t!=NULL; )
+    {
+        if(++n > MAX_FILTER_TABLES && t->users == 0)
         {
-            for(iv=0; iv<pdim; iv++)
-            {
-                H[iu][iv].r = H[iu][iv].i = 0.0;
-            }
+            prev->next = t->next;
+            free(t->filphase);
+            free(t);
+            t = prev->next;
         }
+        else
+        {
+            prev = t;
+            t = t->next;
+        }
+    }
+}
 
-        // Loop over the dx projection angles. For each angle, do the following:
 
-        //     1. Copy the real projection data from the two slices into the
-        //      real and imaginary parts of the first dz elements of the 
-        //      complex array, sino[].  Set the remaining pdim-dz elements
-        //      to zero (zero-padding).
+static void 
+release_filter_table(gridrec_plan *plan, filter_table *t)
+{
+    // Mark a table returned by get_filter_table as no longer in use.
+    #pragma omp critical(gridrec_filter)
+    {
+        t->users--;
+        trim_filter_tables(plan);
+    }
+}
 
-        //     2. Carry out a (1D) Fourier transform on the complex data.
-        //      This results in transform data that is arranged in 
-        //      "wrap-around" order, with non-negative spatial frequencies 
-        //      occupying the first half, and negative frequencies the second 
-        //      half, of the array, sino[].
-            
-        //     3. Multiply each element of the 1-D transform by a complex,
-        //      frequency dependent factor, filphase[].  These factors were
-        //      precomputed as part of recon_init() and combine the 
-        //      tomographic filtering with a phase factor which shifts the 
-        //      origin in configuration space to the projection of the 
-        //      rotation axis as defined by the parameter, "center".  If a 
-        //      region of interest (ROI) centered on a different origin has 
-        //      been specified [(X0,Y0)!=(0,0)], multiplication by an 
-        //      additional phase factor, dependent on angle as well as 
-        //      frequency, is required.
-
-        //     4. For each data element, find the Cartesian coordinates, 
-        //      <U,V>, of the corresponding point in the 2D frequency plane, 
-        //      in  units of the spacing in the MxM rectangular grid placed 
-        //      thereon; then calculate the upper and lower limits in each 
-        //      coordinate direction of the integer coordinates for the 
-        //      grid points contained in an LxL box centered on <U,V>.  
-        //      Using a precomputed table of the (1-D) convolving function, 
-        //      W, calculate the contribution of this data element to the
-        //      (2-D) convolvent (the 2_D convolvent is the product of
-        //      1_D convolvents in the X and Y directions) at each of these
-        //      grid points, and update the complex 2D array H accordingly.  
-
-        // At the end of Phase 1, the array H[][] contains data arranged in 
-        // "natural", rather than wrap-around order -- that is, the origin in 
-        // the spatial frequency plane is situated in the middle, rather than 
-        // at the beginning, of the array, H[][].  This simplifies the code 
-        // for carrying out the convolution (step 4 above), but necessitates 
-        // an additional correction -- See Phase 3 below.
-
-        complex Cdata1, Cdata2, Ctmp;
-        float U, V, rtmp, L2 = (int)C/PI;
-        float convolv, tblspcg = 2*ltbl/L;
-
-        int pdim2 = pdim >> 1, M2 = pdim >> 1;
-        int iul, iuh, iu, ivl, ivh, iv;
-        int j, k;
-
-        // For each projection
-        for(p=0; p<dx; p++)
-        {
-            j = 0;
-            while(j<dz)  
-            {     
-                sino[j].r = data3d[p][s][j];
-                sino[j].i = data3d[p][s+1][j];
-                j++;
-            }
 
-            // Zero fill the rest of the array
-            while(j<pdim)
+static filter_table* 
+get_filter_table(gridrec_plan *plan, float center)
+{
+    // Return the table of combined filter-phase factors for the
+    // given center, computing it the first time the center is seen.
+    // A found table is moved to the front of the list, so the centers
+    // of neighbouring slices are found after a step or two. The table
+    // stays valid until it is passed to release_filter_table.
+    filter_table *t, *prev = NULL;
+
+    #pragma omp critical(gridrec_filter)
+    {
+        for(t=plan->filters; t!=NULL; prev=t, t=t->next)
+        {
+            if(t->center == center)
             {
-                sino[j].r = sino[j].i = 0.0;
-                j++;
+                break;
             }
+        }
+        if(t != NULL && prev != NULL)
+        {
+            prev->next = t->next;
+            t->next = plan->filters;
+            plan->filters = t;
+        }
+        else if(t == NULL)
+        {
+            t = (filter_table *)malloc(sizeof(filter_table));
+            t->center = center;
+            t->users = 0;
+            t->filphase = malloc_vector_c(plan->pdim/2);
+            set_filter_tables(
+                plan->dx, plan->pdim, center, plan->filter, t->filphase);
+            t->next = plan->filters;
+            plan->filters = t;
+        }
+        t->users++;
+    }
+    return t;
+}
 
-            // Take FFT of the projection array
-            four1((float*)sino-1,pdim,1); 
 
-            // For each FFT(projection)
-            for(j=1; j<pdim2; j++)
-            {    
-                Ctmp.r = filphase[j].r;
-                Ctmp.i = filphase[j].i;
-
-                Cmult(Cdata1, Ctmp, sino[j])
-                Ctmp.i = -Ctmp.i;
-                Cmult(Cdata2, Ctmp, sino[pdim-j])
-
-                U = (rtmp=j) * cose[p] + M2;
-                V = rtmp * sine[p] + M2;
-
-                // Note freq space origin is at (M2,M2), but we
-                // offset the indices U, V, etc. to range from 0 to M-1.
-                iul = ceil(U-L2); iuh=floor(U+L2);
-                ivl = ceil(V-L2); ivh=floor(V+L2);
-                if(iul<1)iul = 1; if(iuh>=pdim)iuh = pdim-1; 
-                if(ivl<1)ivl = 1; if(ivh>=pdim)ivh = pdim-1; 
-
-                // Note aliasing value (at index=0) is forced to zero.
-                for(iv=ivl, k=0; iv<=ivh; iv++, k++) {
-                    work[k] = Cnvlvnt(abs(V-iv)*tblspcg);
-                }
+static inline void 
+grid_sample(
+    gridrec_plan *plan, complex **H, float *work, 
+    int p, int j, complex Cdata1, complex Cdata2)
+{
+    // Convolve the filtered transform samples of projection p at the
+    // frequencies j (Cdata1) and -j (Cdata2) onto the frequency plane 
+    // H (step 4 of Phase 1, see gridrec_execute).
+    int pdim = plan->pdim, M2 = pdim >> 1;
+    float *wtbl = plan->wtbl;
+    float U, V, rtmp, L2 = (int)plan->C/PI;
+    float convolv, tblspcg = 2*plan->ltbl/plan->L;
+    int iul, iuh, iu, ivl, ivh, iv;
+    int k;
+
+    U = (rtmp=j) * plan->cose[p] + M2;
+    V = rtmp * plan->sine[p] + M2;
+
+    // Note freq space origin is at (M2,M2), but we
+    // offset the indices U, V, etc. to range from 0 to M-1.
+    iul = ceil(U-L2); iuh=floor(U+L2);
+    ivl = ceil(V-L2); ivh=floor(V+L2);
+    if(iul<1)
+    {
+        iul = 1;
+    }
+    if(iuh>=pdim)
+    {
+        iuh = pdim-1;
+    }
+    if(ivl<1)
+    {
+        ivl = 1;
+    }
+    if(ivh>=pdim)
+    {
+        ivh = pdim-1;
+    }
+
+    // Note aliasing value (at index=0) is forced to zero.
+    for(iv=ivl, k=0; iv<=ivh; iv++, k++) {
+        work[k] = Cnvlvnt(abs(V-iv)*tblspcg);
+    }
                     
-                for(iu=iul ;iu<=iuh; iu++)
+    for(iu=iul ;iu<=iuh; iu++)
+    {
+        rtmp = Cnvlvnt(abs(U-iu)*tblspcg);
+        for(iv=ivl, k=0; iv<=ivh; iv++, k++)
+        {
+            convolv = rtmp*work[k];
+            H[iu][iv].r += convolv*Cdata1.r;
+            H[iu][iv].i += convolv*Cdata1.i;
+            H[pdim-iu][pdim-iv].r += convolv*Cdata2.r;
+            H[pdim-iu][pdim-iv].i += convolv*Cdata2.i;
+        }
+    }
+}
+
+
+static void 
+copy_pair(gridrec_plan *plan, complex **H, float **out1, float **out2)
+{
+    // Copy the real and imaginary parts of H, with the final 
+    // correction, into the images out1 and out2 (Phase 3, see 
+    // gridrec_execute). out2 may be NULL.
+    int pdim = plan->pdim, M02 = plan->M02;
+    int ngridx = plan->ngridx, ngridy = plan->ngridy;
+    float *winv = plan->winv;
+    int iu, iv, j, k;
+
+    int ustart, vstart, ufin, vfin;
+    float corrn_u, corrn;
+    int padx = (pdim-ngridx)/2;
+    int pady = (pdim-ngridy)/2;
+    int offsetx = M02+1-padx;
+    int offsety = M02+1-pady;
+
+    ustart = pdim-offsety;
+    ufin = pdim;
+    j = 0;
+    while(j<ngridy)
+    {
+        for(iu=ustart; iu<ufin; j++, iu++)
+        {
+            corrn_u = winv[j+pady];
+            vstart = pdim-offsetx;
+            vfin = pdim;
+            k = 0;
+            while(k<ngridx)
+            {
+                for(iv=vstart; iv<vfin; k++, iv++)
                 {
-                    rtmp = Cnvlvnt(abs(U-iu)*tblspcg);
-                    for(iv=ivl, k=0; iv<=ivh; iv++, k++)
+                    corrn = corrn_u*winv[k+padx]; 
+                    out1[ngridx-1-k][j] = corrn*H[iu][iv].r;
+                    if(out2 != NULL)
                     {
-                        convolv = rtmp*work[k];
-                        H[iu][iv].r += convolv*Cdata1.r;
-                        H[iu][iv].i += convolv*Cdata1.i;
-                        H[pdim-iu][pdim-iv].r += convolv*Cdata2.r;
-                        H[pdim-iu][pdim-iv].i += convolv*Cdata2.i;
+                        out2[ngridx-1-k][j] = corrn*H[iu][iv].i;
                     }
                 }
+                if(k<ngridx)
+                {
+                    vstart = 0;
+                    vfin = ngridx-offsetx;
+                }
             }
         }
+        if(j<ngridy) 
+        {
+            ustart = 0;
+            ufin = ngridy-offsety;
+        }
+    }
+}
 
-        // Carry out a 2D inverse FFT on the array H.
-
-        // At the conclusion of this phase, the configuration 
-        // space data is arranged in wrap-around order with the origin
-        // (center of reconstructed images) situated at the start of the 
-        // array.  The first (resp. second) half of the array contains the lower,
-        // Y<0 (resp, upper Y>0) part of the image, and within each row of the 
-        // array, the first (resp. second) half contains data for the right [X>0]
-        // (resp. left [X<0]) half of the image.
-
-        unsigned long H_size[2];
-        H_size[0] = H_size[1] = pdim;
-        fourn((float*)(*H)-1, H_size-1, 2, -1);  
-
-        // Copy the real and imaginary parts of the complex data from H[][],
-        // into the output buffers for the two reconstructed real images, 
-        // simultaneously carrying out a final multiplicative correction.  
-        // The correction factors are taken from the array, winv[], previously 
-        // computed in set_pswf_tables(), and consist logically of three parts, namely:
-
-        //  1. A positive real factor, corresponding to the reciprocal
-        //     of the inverse Fourier transform, of the convolving
-        //     function, W, and
-
-        //  2. Multiplication by the cell size, (1/D1)^2, in 2D frequency
-        //     space.  This correctly normalizes the 2D inverse FFT carried
-        //     out in Phase 2.  (Note that all quantities are ewxpressed in
-        //     units in which the detector spacing is one.)
-
-        //  3. A sign change for the "odd-numbered" elements (in a 
-        //     checkerboard pattern) of the array.  This compensates
-        //     for the fact that the 2-D Fourier transform (Phase 2) 
-        //     started with a frequency array in which the zero frequency 
-        //     point appears in the middle of the array instead of at 
-        //     its start.
-
-        // Only the elements in the square M0xM0 subarray of H[][], centered 
-        // about the origin, are utilized.  The other elements are not part of the
-        // actual region being reconstructed and are discarded.  Because of the 
-        // wrap-around ordering, the subarray must actually be taken from the four
-        // corners" of the 2D array, H[][] -- See Phase 2 description, above.
-
-        // The final data correponds physically to the linear X-ray absorption
-        // coefficient expressed in units of the inverse detector spacing -- to 
-        // convert to inverse cm (say), one must divide the data by the detector 
-        // spacing in cm.
-
-        int ustart, vstart, ufin, vfin;
-        float corrn_u, corrn;
-        int padx = (pdim-ngridx)/2;
-        int pady = (pdim-ngridy)/2;
-        int offsetx = M02+1-padx;
-        int offsety = M02+1-pady;
-
-        ustart = pdim-offsety;
-        ufin = pdim;
-        j = 0;
-        while(j<ngridy)
+
+void 
+gridrec(
+    float *data, int dx, int dy, int dz, float *center, float *theta, 
+    float *recon, int ngridx, int ngridy, char *fname, int ncore)
+{
+    gridrec_plan *plan;
+
+    plan = gridrec_create_plan(dx, dz, theta, ngridx, ngridy, fname);
+    gridrec_execute(plan, data, dy, center, recon, ncore);
+    gridrec_destroy_plan(plan);
+}
+
+
+void 
+gridrec_execute(
+    gridrec_plan *plan, float *data, int dy, float *center, 
+    float *recon, int ncore)
+{
+    int s, p, iu, iv;
+    int dx = plan->dx;
+    int dz = plan->dz;
+    int pdim = plan->pdim;
+    float ***data3d, ***recon3d;
+    float *work;
+    complex *sino, *filphase, **H;
+    filter_table *filt;
+
+    data3d = convert(data, dx, dy, dz);
+    recon3d = convert(recon, dy, plan->ngridx, plan->ngridy);
+
+    // Slice pairs are reconstructed independently. Each thread owns 
+    // its projection and frequency-plane buffers, while the trig, 
+    // PSWF and filter tables and the FFT plans are shared.
+    #pragma omp parallel num_threads(ncore) \
+        private(s, p, iu, iv, sino, filphase, filt, H, work)
+    {
+        // Allocate storage for various arrays.
+        sino = malloc_vector_c(pdim); 
+        H = malloc_matrix_c(pdim, pdim);
+        work = malloc_vector_f(plan->L+1);
+
+        // For each slice.
+        #pragma omp for schedule(dynamic)
+        for(s=0; s<dy-1; s+=2)
         {
-            for(iu=ustart; iu<ufin; j++, iu++)
+            // Get the table of combined filter-phase factors.
+            filt = get_filter_table(plan, center[s]);
+            filphase = filt->filphase;
+
+            // First clear the array H
+            for(iu=0; iu<pdim; iu++) 
             {
-                corrn_u = winv[j+pady];
-                vstart = pdim-offsetx;
-                vfin = pdim;
-                k = 0;
-                while(k<ngridx)
+                for(iv=0; iv<pdim; iv++)
                 {
-                    for(iv=vstart; iv<vfin; k++, iv++)
-                    {
-                        corrn = corrn_u*winv[k+padx]; 
-                        recon3d[s][ngridx-1-k][j] = corrn*H[iu][iv].r;
-                        recon3d[s+1][ngridx-1-k][j] = corrn*H[iu][iv].i;
-                    }
-                    if(k<ngridx)
-                    {
-                        vstart = 0;
-                        vfin = ngridx-offsetx;
-                    }
+                    H[iu][iv].r = H[iu][iv].i = 0.0;
                 }
             }
-            if(j<ngridy) 
+
+            // Loop over the dx projection angles. For each angle, do the following:
+
+            //     1. Copy the real projection data from the two slices into the
+            //      real and imaginary parts of the first dz elements of the 
+            //      complex array, sino[].  Set the remaining pdim-dz elements
+            //      to zero (zero-padding).
+
+            //     2. Carry out a (1D) Fourier transform on the complex data.
+            //      This results in transform data that is arranged in 
+            //      "wrap-around" order, with non-negative spatial frequencies 
+            //      occupying the first half, and negative frequencies the second 
+            //      half, of the array, sino[].
+            
+            //     3. Multiply each element of the 1-D transform by a complex,
+            //      frequency dependent factor, filphase[].  These factors were
+            //      precomputed as part of recon_init() and combine the 
+            //      tomographic filtering with a phase factor which shifts the 
+            //      origin in configuration space to the projection of the 
+            //      rotation axis as defined by the parameter, "center".  If a 
+            //      region of interest (ROI) centered on a different origin has 
+            //      been specified [(X0,Y0)!=(0,0)], multiplication by an 
+            //      additional phase factor, dependent on angle as well as 
+            //      frequency, is required.
+
+            //     4. For each data element, find the Cartesian coordinates, 
+            //      <U,V>, of the corresponding point in the 2D frequency plane, 
+            //      in  units of the spacing in the MxM rectangular grid placed 
+            //      thereon; then calculate the upper and lower limits in each 
+            //      coordinate direction of the integer coordinates for the 
+            //      grid points contained in an LxL box centered on <U,V>.  
+            //      Using a precomputed table of the (1-D) convolving function, 
+            //      W, calculate the contribution of this data element to the
+            //      (2-D) convolvent (the 2_D convolvent is the product of
+            //      1_D convolvents in the X and Y directions) at each of these
+            //      grid points, and update the complex 2D array H accordingly.  
+
+            // At the end of Phase 1, the array H[][] contains data arranged in 
+            // "natural", rather than wrap-around order -- that is, the origin in 
+            // the spatial frequency plane is situated in the middle, rather than 
+            // at the beginning, of the array, H[][].  This simplifies the code 
+            // for carrying out the convolution (step 4 above), but necessitates 
+            // an additional correction -- See Phase 3 below.
+
+            complex Cdata1, Cdata2, Ctmp;
+            int pdim2 = pdim >> 1;
+            int j;
+
+            // For each projection
+            for(p=0; p<dx; p++)
             {
-                ustart = 0;
-                ufin = ngridy-offsety;
+                j = 0;
+                while(j<dz)  
+                {     
+                    sino[j].r = data3d[p][s][j];
+                    sino[j].i = data3d[p][s+1][j];
+                    j++;
+                }
+
+                // Zero fill the rest of the array
+                while(j<pdim)
+                {
+                    sino[j].r = sino[j].i = 0.0;
+                    j++;
+                }
+
+                // Take FFT of the projection array
+                fft_execute(plan->plan1d, (float*)sino, 1);
+
+                // For each FFT(projection)
+                for(j=1; j<pdim2; j++)
+                {    
+                    Ctmp.r = filphase[j].r;
+                    Ctmp.i = filphase[j].i;
+
+                    Cmult(Cdata1, Ctmp, sino[j])
+                    Ctmp.i = -Ctmp.i;
+                    Cmult(Cdata2, Ctmp, sino[pdim-j])
+
+                    grid_sample(plan, H, work, p, j, Cdata1, Cdata2);
+                }
             }
+            release_filter_table(plan, filt);
+
+            // Carry out a 2D inverse FFT on the array H.
+
+            // At the conclusion of this phase, the configuration 
+            // space data is arranged in wrap-around order with the origin
+            // (center of reconstructed images) situated at the start of the 
+            // array.  The first (resp. second) half of the array contains the lower,
+            // Y<0 (resp, upper Y>0) part of the image, and within each row of the 
+            // array, the first (resp. second) half contains data for the right [X>0]
+            // (resp. left [X<0]) half of the image.
+
+            fft_execute(plan->plan2d, (float*)(*H), -1);
+
+            // Copy the real and imaginary parts of the complex data from H[][],
+            // into the output buffers for the two reconstructed real images, 
+            // simultaneously carrying out a final multiplicative correction.  
+            // The correction factors are taken from the array, winv[], previously 
+            // computed in set_pswf_tables(), and consist logically of three parts, namely:
+
+            //  1. A positive real factor, corresponding to the reciprocal
+            //     of the inverse Fourier transform, of the convolving
+            //     function, W, and
+
+            //  2. Multiplication by the cell size, (1/D1)^2, in 2D frequency
+            //     space.  This correctly normalizes the 2D inverse FFT carried
+            //     out in Phase 2.  (Note that all quantities are ewxpressed in
+            //     units in which the detector spacing is one.)
+
+            //  3. A sign change for the "odd-numbered" elements (in a 
+            //     checkerboard pattern) of the array.  This compensates
+            //     for the fact that the 2-D Fourier transform (Phase 2) 
+            //     started with a frequency array in which the zero frequency 
+            //     point appears in the middle of the array instead of at 
+            //     its start.
+
+            // Only the elements in the square M0xM0 subarray of H[][], centered 
+            // about the origin, are utilized.  The other elements are not part of the
+            // actual region being reconstructed and are discarded.  Because of the 
+            // wrap-around ordering, the subarray must actually be taken from the four
+            // corners" of the 2D array, H[][] -- See Phase 2 description, above.
+
+            // The final data correponds physically to the linear X-ray absorption
+            // coefficient expressed in units of the inverse detector spacing -- to 
+            // convert to inverse cm (say), one must divide the data by the detector 
+            // spacing in cm.
+
+            copy_pair(plan, H, recon3d[s], recon3d[s+1]);
         }
+
+        free(sino);
+        free(work);
+        free_matrix(H);
     }
 
-    free(sine);
-    free(cose);
-    free(sino);
-    free(wtbl);
-    free(filphase);
-    free(winv);
-    free(work);
-    free_matrix(H);
+    free_convert(data3d, dx);
+    free_convert(recon3d, dy);
 
     return;
 }
 
 
+void 
+gridrec_sweep(
+    gridrec_plan *plan, float *data, int ncenter, float *center, 
+    float *recon, int ncore)
+{
+    // Reconstruct a single sinogram (data, indexed j+p*dz) with each of 
+    // the ncenter rotation centers. Only the filter-phase factors 
+    // depend on the center, so every projection is Fourier transformed 
+    // once. Two centers are evaluated per 2D transform, the first in 
+    // the real and the second in the imaginary part of H.
+    int n, p, j, iu, iv;
+    int dx = plan->dx;
+    int dz = plan->dz;
+    int pdim = plan->pdim;
+    int pdim2 = pdim >> 1;
+    float ***recon3d;
+    float *work;
+    complex *phase1, *phase2, *A, *B, **F, **H;
+    filter_table *filt1, *filt2;
+    complex Cdata1, Cdata2;
+
+    recon3d = convert(recon, ncenter, plan->ngridx, plan->ngridy);
+
+    // Transform the zero-padded projections.
+    F = malloc_matrix_c(dx, pdim);
+
+    #pragma omp parallel for num_threads(ncore) private(j)
+    for(p=0; p<dx; p++)
+    {
+        for(j=0; j<dz; j++)
+        {
+            F[p][j].r = data[j+p*dz];
+            F[p][j].i = 0.0;
+        }
+        for(; j<pdim; j++)
+        {
+            F[p][j].r = F[p][j].i = 0.0;
+        }
+        fft_execute(plan->plan1d, (float*)F[p], 1);
+    }
+
+    #pragma omp parallel num_threads(ncore) \
+        private(n, p, j, iu, iv, phase1, phase2, filt1, filt2, \
+        A, B, H, work, \
+        Cdata1, Cdata2)
+    {
+        A = malloc_vector_c(pdim2);
+        B = malloc_vector_c(pdim2);
+        H = malloc_matrix_c(pdim, pdim);
+        work = malloc_vector_f(plan->L+1);
+
+        // For each pair of centers. An odd last center is paired with
+        // itself and its imaginary part discarded.
+        #pragma omp for schedule(dynamic)
+        for(n=0; n<ncenter; n+=2)
+        {
+            filt1 = get_filter_table(plan, center[n]);
+            filt2 = get_filter_table(plan, center[min(n+1, ncenter-1)]);
+            phase1 = filt1->filphase;
+            phase2 = filt2->filphase;
+
+            // The projections are real, so F[-j] = conj(F[j]). Weighting
+            // F[j] by phase1+i*phase2 and F[-j] by conj(phase1)+
+            // i*conj(phase2) puts the reconstruction with the first 
+            // center in the real and the second in the imaginary part.
+            for(j=1; j<pdim2; j++)
+            {
+                A[j].r = phase1[j].r-phase2[j].i;
+                A[j].i = phase1[j].i+phase2[j].r;
+                B[j].r = phase1[j].r+phase2[j].i;
+                B[j].i = phase2[j].r-phase1[j].i;
+            }
+            release_filter_table(plan, filt1);
+            release_filter_table(plan, filt2);
+
+            for(iu=0; iu<pdim; iu++) 
+            {
+                for(iv=0; iv<pdim; iv++)
+                {
+                    H[iu][iv].r = H[iu][iv].i = 0.0;
+                }
+            }
+
+            for(p=0; p<dx; p++)
+            {
+                for(j=1; j<pdim2; j++)
+                {    
+                    Cmult(Cdata1, A[j], F[p][j])
+                    Cmult(Cdata2, B[j], F[p][pdim-j])
+                    grid_sample(plan, H, work, p, j, Cdata1, Cdata2);
+                }
+            }
+
+            fft_execute(plan->plan2d, (float*)(*H), -1);
+            copy_pair(
+                plan, H, recon3d[n], (n+1 < ncenter) ? recon3d[n+1] : NULL);
+        }
+
+        free(A);
+        free(B);
+        free(work);
+        free_matrix(H);
+    }
+
+    free_matrix(F);
+    free_convert(recon3d, ncenter);
+}
+
+
 void 
 set_filter_tables(
     int dx, int pd, float center, 
@@ -466,6 +770,18 @@ convert(float *arr, int dim0, int dim1, int dim2)
 }
 
 
+void 
+free_convert(float ***r3, int dim0)
+{
+    // Frees the pointer tables allocated by convert.
+    for(int i=0; i<dim0; i++)
+    {
+        free(r3[i]);
+    }
+    free(r3);
+}
+
+
 float*
 malloc_vector_f(long n) 
 {
@@ -51,6 +51,7 @@
 #include <stddef.h>
 #include <time.h>
 #include <sys/stat.h>
+#include "fftplan.h"
 
 
 #ifdef WIN32
@@ -74,6 +75,33 @@ typedef struct {
     float i;
 } complex;
 
+// Number of unused filter-phase tables a plan keeps.
+#define MAX_FILTER_TABLES 32
+
+// Combined filter-phase factors of one rotation center, with the
+// number of threads currently using them.
+typedef struct filter_table {
+    float center;
+    int users;
+    complex *filphase;
+    struct filter_table *next;
+} filter_table;
+
+// Everything gridrec needs besides the data: trig tables of the 
+// projection angles, PSWF lookup tables, FFT plans and the 
+// filter-phase tables of the most recently used centers.
+typedef struct {
+    int dx, dz;
+    int ngridx, ngridy;
+    int pdim, M02, ltbl;
+    float C, L;
+    float (*filter)(float);
+    float *sine, *cose;
+    float *wtbl, *winv;
+    fft_plan *plan1d, *plan2d;
+    filter_table *filters;
+} gridrec_plan;
+
 void 
 gridrec(
     float *data,
@@ -82,11 +110,55 @@ gridrec(
     float *theta,
     float *recon,
     int ngridx, int ngridy,
-    char name[16]);
+    char *fname,
+    int ncore);
+
+gridrec_plan* 
+gridrec_create_plan(
+    int dx, int dz,
+    float *theta,
+    int ngridx, int ngridy,
+    char *fname);
+
+void 
+gridrec_execute(
+    gridrec_plan *plan,
+    float *data,
+    int dy,
+    float *center,
+    float *recon,
+    int ncore);
+
+void 
+gridrec_sweep(
+    gridrec_plan *plan,
+    float *data,
+    int ncenter,
+    float *center,
+    float *recon,
+    int ncore);
+
+void 
+gridrec_destroy_plan(
+    gridrec_plan *plan);
+
+void 
+fbp(
+    float *data,
+    int dx, int dy, int dz,
+    float *center,
+    float *theta,
+    float *recon,
+    int ngridx, int ngridy,
+    char *fname,
+    int ncore);
 
 float*** 
 convert(float *arr, int dim0, int dim1, int dim2);
 
+void 
+free_convert(float ***r3, int dim0);
+
 float* 
 malloc_vector_f(long n);
 
@@ -44,147 +44,172 @@
 #include "utils.h"
 
 
+static inline void
+mlem_ray(
+    float *data, int dy, int dz, int s, int p, int d,
+    tracer *tr, raytable *table, geometry *geo,
+    int ngridx, int ngridy, float *recon, float *simdata,
+    float *sum_dist, float *update)
+{
+    int n, csize;
+    int *indi;
+    float *dist;
+    float upd, sum_dist2;
+
+    // Trace the ray or fetch it from the ray table.
+    csize = get_ray(tr, table, geo, p, d, &indi, &dist);
+
+    // Calculate simdata 
+    calc_simdata(p, 0, d, ngridx, ngridy, 1, dz,
+        csize, indi, dist, recon+s*ngridx*ngridy,
+        simdata); // Output: simdata
+
+    // Calculate dist*dist
+    sum_dist2 = 0.0;
+    #pragma omp simd reduction(+:sum_dist2)
+    for (n=0; n<csize-1; n++) 
+    {
+        sum_dist2 += dist[n]*dist[n];
+    }
+    for (n=0; n<csize-1; n++) 
+    {
+        sum_dist[indi[n]] += dist[n];
+    }
+
+    // Update. Rays through pixels that have all gone to zero cannot
+    // be corrected by a multiplicative update and are skipped.
+    if (sum_dist2 != 0.0 && simdata[d+p*dz] != 0.0) 
+    {
+        upd = data[d+s*dz+p*dy*dz]/simdata[d+p*dz];
+        for (n=0; n<csize-1; n++) 
+        {
+            update[indi[n]] += upd*dist[n];
+        }
+    }
+}
+
+
 void 
 mlem(
     float *data, int dx, int dy, int dz, float *center, float *theta,
-    float *recon, int ngridx, int ngridy, int num_iter)
+    float *recon, int ngridx, int ngridy, int num_iter, 
+    int num_block, float *ind_block, 
+    float cache_size, int engine, float *roi, 
+    float tol, float *history, int ncore)
 {
-    float *gridx = (float *)malloc((ngridx+1)*sizeof(float));
-    float *gridy = (float *)malloc((ngridy+1)*sizeof(float));
-    float *coordx = (float *)malloc((ngridy+1)*sizeof(float));
-    float *coordy = (float *)malloc((ngridx+1)*sizeof(float));
-    float *ax = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *ay = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *bx = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *by = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *coorx = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *coory = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *dist = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    int *indi = (int *)malloc((ngridx+ngridy)*sizeof(int));
-
-    assert(coordx != NULL && coordy != NULL &&
-        ax != NULL && ay != NULL && by != NULL && bx != NULL &&
-        coorx != NULL && coory != NULL && dist != NULL && indi != NULL);
-
-    int s, p, d, i, m, n;
-    int quadrant;
-    float theta_p, sin_p, cos_p;
-    float mov, xi, yi;
-    int asize, bsize, csize;
+    geometry geo;
+    tracer tr;
+    raycache cache;
+    raytable *table;
+
+    init_geometry(&geo, dx, dz, theta, ngridx, ngridy, engine);
+    set_geometry_roi(&geo, roi);
+    init_raycache(&cache, cache_size);
+
+    int s, p, d, g, k, i, n, b, q;
     float *simdata;
-    float upd;
-    int ind_data, ind_recon;
+    float *prev;
+    int ind_recon;
     float *sum_dist;
-    float sum_dist2;
     float *update;
 
-    for (i=0; i<num_iter; i++) 
+    if (num_block < 1 || num_block > dx)
     {
-        simdata = (float *)calloc((dx*dy*dz), sizeof(float));
+        num_block = (num_block < 1) ? 1 : dx;
+    }
 
-        // For each slice
-        for (s=0; s<dy; s++) 
+    // For each slice
+    #pragma omp parallel for num_threads(ncore) schedule(dynamic) \
+        private(tr, table, simdata, prev, p, d, g, k, i, n, b, q, \
+        ind_recon, sum_dist, update)
+    for (s=0; s<dy; s++) 
+    {
+        init_tracer(&tr, ngridx, ngridy);
+        table = get_raytable(&cache, &geo, &tr, center[s]);
+
+        // Simulated data of the slice, indexed d+p*dz.
+        simdata = (float *)malloc((dx*dz)*sizeof(float));
+        prev = (float *)malloc((ngridx*ngridy)*sizeof(float));
+        sum_dist = (float *)malloc((ngridx*ngridy)*sizeof(float));
+        update = (float *)malloc((ngridx*ngridy)*sizeof(float));
+        assert(simdata != NULL && prev != NULL && 
+            sum_dist != NULL && update != NULL);
+
+        for (i=0; i<num_iter; i++) 
         {
-            preprocessing(ngridx, ngridy, dz, center[s], 
-                &mov, gridx, gridy); // Outputs: mov, gridx, gridy
-            
-            sum_dist = (float *)calloc((ngridx*ngridy), sizeof(float));
-            update = (float *)calloc((ngridx*ngridy), sizeof(float));
-            
-            // For each projection angle 
-            for (p=0; p<dx; p++) 
+            // Keep the estimate to measure the change of the iteration.
+            memcpy(prev, recon+s*ngridx*ngridy, 
+                (ngridx*ngridy)*sizeof(float));
+
+            // Clear the simulated data of the slice.
+            memset(simdata, 0, (dx*dz)*sizeof(float));
+
+            // For each ordered subset. Subset b holds the projections 
+            // ind_block[b*dx/num_block] to ind_block[(b+1)*dx/num_block-1].
+            for (b=0; b<num_block; b++)
             {
-                // Calculate the sin and cos values 
-                // of the projection angle and find
-                // at which quadrant on the cartesian grid.
-                theta_p = fmod(theta[p], 2*M_PI);
-                quadrant = calc_quadrant(theta_p);
-                sin_p = sinf(theta_p);
-                cos_p = cosf(theta_p);
-
-                // For each detector pixel 
-                for (d=0; d<dz; d++) 
+                memset(sum_dist, 0, (ngridx*ngridy)*sizeof(float));
+                memset(update, 0, (ngridx*ngridy)*sizeof(float));
+
+                if (num_block == 1)
                 {
-                    // Calculate coordinates
-                    xi = -1e6;
-                    yi = -(dz-1)/2.0+d+mov;
-                    calc_coords(
-                        ngridx, ngridy, xi, yi, sin_p, cos_p, gridx, gridy, 
-                        coordx, coordy);
-
-                    // Merge the (coordx, gridy) and (gridx, coordy)
-                    trim_coords(
-                        ngridx, ngridy, coordx, coordy, gridx, gridy, 
-                        &asize, ax, ay, &bsize, bx, by);
-
-                    // Sort the array of intersection points (ax, ay) and
-                    // (bx, by). The new sorted intersection points are 
-                    // stored in (coorx, coory). Total number of points 
-                    // are csize.
-                    sort_intersections(
-                        quadrant, asize, ax, ay, bsize, bx, by, 
-                        &csize, coorx, coory);
-
-                    // Calculate the distances (dist) between the 
-                    // intersection points (coorx, coory). Find the 
-                    // indices of the pixels on the reconstruction grid.
-                    calc_dist(
-                        ngridx, ngridy, csize, coorx, coory, 
-                        indi, dist);
-
-                    // Calculate simdata 
-                    calc_simdata(p, s, d, ngridx, ngridy, dy, dz,
-                        csize, indi, dist, recon,
-                        simdata); // Output: simdata
-
-
-                    // Calculate dist*dist
-                    sum_dist2 = 0.0;
-                    for (n=0; n<csize-1; n++) 
+                    // Sweep all angles by groups of symmetric angles, 
+                    // so that their rays are derived from each other.
+                    for (g=0; g<geo.ngroups; g++) 
                     {
-                        sum_dist2 += dist[n]*dist[n];
-                        sum_dist[indi[n]] += dist[n];
+                        // For each detector pixel 
+                        for (d=0; d<dz; d++) 
+                        {
+                            // For each projection angle of the group
+                            for (k=geo.groupptr[g]; k<geo.groupptr[g+1]; k++) 
+                            {
+                                p = geo.order[k];
+                                mlem_ray(data, dy, dz, s, p, d, &tr, table, 
+                                    &geo, ngridx, ngridy, recon, simdata, 
+                                    sum_dist, update);
+                            }
+                        }
                     }
-
-                    // Update
-                    if (sum_dist2 != 0.0) 
+                }
+                else
+                {
+                    for (q=b*dx/num_block; q<(b+1)*dx/num_block; q++) 
                     {
-                        ind_data = d+s*dz+p*dy*dz;
-                        upd = data[ind_data]/simdata[ind_data];
-                        for (n=0; n<csize-1; n++) 
+                        p = ind_block[q];
+                        for (d=0; d<dz; d++) 
                         {
-                            update[indi[n]] += upd*dist[n];
+                            mlem_ray(data, dy, dz, s, p, d, &tr, table, 
+                                &geo, ngridx, ngridy, recon, simdata, 
+                                sum_dist, update);
                         }
                     }
                 }
-            }
 
-            m = 0;
-            for (n = 0; n < ngridx*ngridy; n++) {
-                if (sum_dist[n] != 0.0) {
-                    ind_recon = s*ngridx*ngridy;
-                    recon[m+ind_recon] *= update[m]/sum_dist[n];
+                // Apply the update where rays cross the pixel. Selecting 
+                // instead of branching lets the loop vectorize.
+                ind_recon = s*ngridx*ngridy;
+                #pragma omp simd
+                for (n = 0; n < ngridx*ngridy; n++) {
+                    recon[n+ind_recon] *= (sum_dist[n] != 0.0) ? 
+                        update[n]/sum_dist[n] : 1.0;
                 }
-                m++;
             }
 
-            free(sum_dist);
-            free(update);
+            if (record_iteration(data, dx, dy, dz, s, simdata, prev, 
+                    recon+s*ngridx*ngridy, ngridx*ngridy, 
+                    i, num_iter, tol, history)) 
+            {
+                break;
+            }
         }
 
         free(simdata);
+        free(prev);
+        free(sum_dist);
+        free(update);
+        free_tracer(&tr);
     }
 
-    free(gridx);
-    free(gridy);
-    free(coordx);
-    free(coordy);
-    free(ax);
-    free(ay);
-    free(bx);
-    free(by);
-    free(coorx);
-    free(coory);
-    free(dist);
-    free(indi);
-}
\ No newline at end of file
+    free_raycache(&cache);
+    free_geometry(&geo);
+}
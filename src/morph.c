@@ -71,29 +71,34 @@ apply_padding(
 DLL void 
 downsample2d(
     float* data, int dx, int dy, int dz,
-    int level, float* out) 
+    int binsize, int ragged, float* out, int ncore) 
 {
-    int m, n, k, i, p, iproj, ind;
-    int binsize;
-    
-    binsize = pow(2, level);
-    
-    dz /= binsize;
+    // Average bins of binsize values along the last axis. If ragged, 
+    // the values beyond the last whole bin make one more bin.
+    int m, n, k, p, nz, cnt;
+    long i, o;
+    float sum;
 
-    for (m = 0, ind = 0; m < dx; m++) 
+    nz = ragged ? (dz+binsize-1)/binsize : dz/binsize;
+
+    #pragma omp parallel for num_threads(ncore) \
+        private(n, k, p, cnt, i, o, sum)
+    for (m = 0; m < dx; m++) 
     {
-        iproj = m * (dz * dy);
-            
         for (n = 0; n < dy; n++) 
         {
-            i = iproj + n * dz;
-            for (k = 0; k < dz; k++) 
+            i = ((long)m*dy+n)*dz;
+            o = ((long)m*dy+n)*nz;
+            for (k = 0; k < nz; k++) 
             {
-                for (p = 0; p < binsize; p++) 
+                sum = 0.0;
+                cnt = 0;
+                for (p = k*binsize; p < (k+1)*binsize && p < dz; p++) 
                 {
-                    out[i+k] += data[ind]/binsize;
-                    ind++;
+                    sum += data[i+p];
+                    cnt++;
                 }
+                out[o+k] = sum/cnt;
             }
         }
     }
@@ -103,33 +108,37 @@ downsample2d(
 DLL void 
 downsample3d(
     float* data, int dx, int dy, int dz,
-    int level, float* out) 
+    int binsize, int ragged, float* out, int ncore) 
 {
-    int m, n, k, i, p, q, iproj, ind;
-    int binsize, binsize2;
-    
-    binsize = pow(2, level);
-    binsize2 = binsize * binsize;
-    
-    dy /= binsize;
-    dz /= binsize;
+    // Average bins of binsize x binsize values over the last two axes.
+    int m, n, k, p, q, ny, nz, cnt;
+    long i, o;
+    float sum;
+
+    ny = ragged ? (dy+binsize-1)/binsize : dy/binsize;
+    nz = ragged ? (dz+binsize-1)/binsize : dz/binsize;
 
-    for (m = 0, ind = 0; m < dx; m++) 
+    #pragma omp parallel for num_threads(ncore) \
+        private(n, k, p, q, cnt, i, o, sum)
+    for (m = 0; m < dx; m++) 
     {
-        iproj = m * (dz * dy);
-        for (n = 0; n < dy; n++) 
+        for (n = 0; n < ny; n++) 
         {
-            i = iproj + n * dz;
-            for (q = 0; q < binsize; q++) 
+            o = ((long)m*ny+n)*nz;
+            for (k = 0; k < nz; k++) 
             {
-                for (k = 0; k < dz; k++) 
-                { 
-                    for (p = 0; p < binsize; p++) 
+                sum = 0.0;
+                cnt = 0;
+                for (q = n*binsize; q < (n+1)*binsize && q < dy; q++) 
+                {
+                    i = ((long)m*dy+q)*dz;
+                    for (p = k*binsize; p < (k+1)*binsize && p < dz; p++) 
                     {
-                        out[i+k] += data[ind]/binsize2;
-                        ind++;
+                        sum += data[i+p];
+                        cnt++;
                     }
                 }
+                out[o+k] = sum/cnt;
             }
         }
     }
@@ -138,28 +147,29 @@ downsample3d(
 
 DLL void 
 upsample2d(
-    float* data, int dy, int dz,
-    int level, float* out) {
-
-    long m, n, k, i, p, q, iproj, ind;
-    int binsize;
-    
-    binsize = pow(2, level);
+    float* data, int dx, int dy, int dz,
+    int binsize, float* out, int ncore) 
+{
+    // Replicate each value binsize x binsize times over the last two 
+    // axes.
+    int m, n, k, q, p;
+    long i, o;
     
-    for (m = 0, ind = 0; m < dy; m++) 
+    #pragma omp parallel for num_threads(ncore) \
+        private(n, k, q, p, i, o)
+    for (m = 0; m < dx; m++) 
     {
-        iproj = m * (dz * dz);
-        for (n = 0; n < dz; n++) 
+        for (n = 0; n < dy; n++) 
         {
-            i = iproj + n * dz;
+            i = ((long)m*dy+n)*dz;
             for (q = 0; q < binsize; q++) 
             {
+                o = (((long)m*dy+n)*binsize+q)*dz*binsize;
                 for (k = 0; k < dz; k++) 
                 {
                     for (p = 0; p < binsize; p++) 
                     {
-                        out[ind] = data[i+k];
-                        ind++;
+                        out[o+k*binsize+p] = data[i+k];
                     }
                 }
             }
@@ -170,34 +180,25 @@ upsample2d(
 
 DLL void 
 upsample3d(
-    float* data, int dy, int dz,
-    int level, float* out) {
-
-    int m, n, k, i, p, q, j, iproj, ind;
-    int binsize;
+    float* data, int dx, int dy, int dz,
+    int binsize, float* out, int ncore) 
+{
+    // Replicate each value binsize times along all three axes.
+    long size;
+    int j;
 
-    binsize = pow(2, level);
+    size = (long)dy*dz*binsize*binsize;
+    upsample2d(data, dx, dy, dz, binsize, out, ncore);
 
-    for (m = 0, ind = 0; m < dy; m++) 
+    // Spread the upsampled images to their final place, last first, 
+    // and copy each one binsize times.
+    for (j = dx-1; j >= 0; j--) 
     {
-        iproj = m * (dz * dz);
-        for (j = 0; j < binsize; j++) 
+        int r;
+        for (r = binsize-1; r >= 0; r--) 
         {
-            for (n = 0; n < dz; n++) 
-            {
-                i = iproj + n * dz;
-                for (q = 0; q < binsize; q++) 
-                {
-                    for (k = 0; k < dz; k++) 
-                    {
-                        for (p = 0; p < binsize; p++) 
-                        {
-                            out[ind] = data[i+k];
-                            ind++;
-                        }
-                    }
-                }
-            }
+            memmove(out+((long)j*binsize+r)*size, out+(long)j*size, 
+                size*sizeof(float));
         }
     }
-}
\ No newline at end of file
+}
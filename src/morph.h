@@ -48,6 +48,7 @@
 
 #include <stdio.h>
 #include <math.h>
+#include <string.h>
 
 
 #ifdef WIN32
@@ -67,24 +68,26 @@ DLL void
 downsample2d(
     float* data, 
     int dx, int dy, int dz,
-    int level, float* out);
+    int binsize, int ragged, 
+    float* out, int ncore);
 
 DLL void 
 downsample3d(
     float* data, 
     int dx, int dy, int dz,
-    int level, float* out);
+    int binsize, int ragged, 
+    float* out, int ncore);
 
 DLL void 
 upsample2d(
     float* data, 
-    int dy, int dz,
-    int level, float* out);
+    int dx, int dy, int dz,
+    int binsize, float* out, int ncore);
 
 DLL void 
 upsample3d(
     float* data, 
-    int dy, int dz,
-    int level, float* out);
+    int dx, int dy, int dz,
+    int binsize, float* out, int ncore);
 
-#endif
\ No newline at end of file
+#endif
@@ -48,31 +48,25 @@ void
 ospml_quad(
     float *data, int dx, int dy, int dz, float *center, float *theta,
     float *recon, int ngridx, int ngridy, int num_iter, float *reg_pars, 
-    int num_block, float *ind_block)
+    int num_block, float *ind_block, 
+    float cache_size, int engine, float *roi, 
+    float tol, float *history, int ncore)
 {
-    float *gridx = (float *)malloc((ngridx+1)*sizeof(float));
-    float *gridy = (float *)malloc((ngridy+1)*sizeof(float));
-    float *coordx = (float *)malloc((ngridy+1)*sizeof(float));
-    float *coordy = (float *)malloc((ngridx+1)*sizeof(float));
-    float *ax = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *ay = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *bx = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *by = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *coorx = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *coory = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *dist = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    int *indi = (int *)malloc((ngridx+ngridy)*sizeof(int));
-
-    assert(coordx != NULL && coordy != NULL &&
-        ax != NULL && ay != NULL && by != NULL && bx != NULL &&
-        coorx != NULL && coory != NULL && dist != NULL && indi != NULL);
+    geometry geo;
+    tracer tr;
+    raycache cache;
+    raytable *table;
+
+    init_geometry(&geo, dx, dz, theta, ngridx, ngridy, engine);
+    set_geometry_roi(&geo, roi);
+    init_raycache(&cache, cache_size);
 
     int s, q, p, d, i, m, n, os;
-    int quadrant;
-    float theta_p, sin_p, cos_p;
-    float mov, xi, yi;
-    int asize, bsize, csize;
+    int csize;
+    int *indi;
+    float *dist;
     float *simdata;
+    float *prev;
     float upd;
     int ind_data;
     float *sum_dist;
@@ -82,15 +76,29 @@ ospml_quad(
     float totalwg, wg[8], mg[8];
     int subset_ind1, subset_ind2;
 
-    for (i=0; i<num_iter; i++) 
+    // For each slice
+    #pragma omp parallel for num_threads(ncore) schedule(dynamic) \
+        private(tr, table, simdata, prev, q, p, d, i, m, n, os, csize, indi, \
+        dist, upd, ind_data, sum_dist, sum_dist2, E, F, G, ind0, ind1, \
+        indg, totalwg, wg, mg, subset_ind1, subset_ind2)
+    for (s=0; s<dy; s++) 
     {
-        simdata = (float *)calloc((dx*dy*dz), sizeof(float));
+        init_tracer(&tr, ngridx, ngridy);
+        table = get_raytable(&cache, &geo, &tr, center[s]);
+
+        // Simulated data of the slice, indexed d+p*dz.
+        simdata = (float *)malloc((dx*dz)*sizeof(float));
+        prev = (float *)malloc((ngridx*ngridy)*sizeof(float));
+        assert(simdata != NULL && prev != NULL);
 
-        // For each slice
-        for (s=0; s<dy; s++) 
+        for (i=0; i<num_iter; i++) 
         {
-            preprocessing(ngridx, ngridy, dz, center[s], 
-                &mov, gridx, gridy); // Outputs: mov, gridx, gridy
+            // Keep the estimate to measure the change of the iteration.
+            memcpy(prev, recon+s*ngridx*ngridy, 
+                (ngridx*ngridy)*sizeof(float));
+
+            // Clear the simulated data of the slice.
+            memset(simdata, 0, (dx*dz)*sizeof(float));
             
             subset_ind1 = dx/num_block;
             subset_ind2 = subset_ind1;
@@ -112,48 +120,16 @@ ospml_quad(
                 for (q=0; q<subset_ind2; q++) 
                 {
                     p = ind_block[q+os*subset_ind1];
-
-                    // Calculate the sin and cos values 
-                    // of the projection angle and find
-                    // at which quadrant on the cartesian grid.
-                    theta_p = fmod(theta[p], 2*M_PI);
-                    quadrant = calc_quadrant(theta_p);
-                    sin_p = sinf(theta_p);
-                    cos_p = cosf(theta_p);
-
                     // For each detector pixel 
                     for (d=0; d<dz; d++) 
                     {
-                        // Calculate coordinates
-                        xi = -1e6;
-                        yi = -(dz-1)/2.0+d+mov;
-                        calc_coords(
-                            ngridx, ngridy, xi, yi, sin_p, cos_p, gridx, gridy, 
-                            coordx, coordy);
-
-                        // Merge the (coordx, gridy) and (gridx, coordy)
-                        trim_coords(
-                            ngridx, ngridy, coordx, coordy, gridx, gridy, 
-                            &asize, ax, ay, &bsize, bx, by);
-
-                        // Sort the array of intersection points (ax, ay) and
-                        // (bx, by). The new sorted intersection points are 
-                        // stored in (coorx, coory). Total number of points 
-                        // are csize.
-                        sort_intersections(
-                            quadrant, asize, ax, ay, bsize, bx, by, 
-                            &csize, coorx, coory);
-
-                        // Calculate the distances (dist) between the 
-                        // intersection points (coorx, coory). Find the 
-                        // indices of the pixels on the reconstruction grid.
-                        calc_dist(
-                            ngridx, ngridy, csize, coorx, coory, 
-                            indi, dist);
+                        // Trace the ray or fetch it from the ray table.
+                        csize = get_ray(
+                            &tr, table, &geo, p, d, &indi, &dist);
 
                         // Calculate simdata 
-                        calc_simdata(p, s, d, ngridx, ngridy, dy, dz,
-                            csize, indi, dist, recon,
+                        calc_simdata(p, 0, d, ngridx, ngridy, 1, dz,
+                            csize, indi, dist, recon+s*ngridx*ngridy,
                             simdata); // Output: simdata
 
 
@@ -169,10 +145,11 @@ ospml_quad(
                         if (sum_dist2 != 0.0) 
                         {
                             ind_data = d+s*dz+p*dy*dz;
-                            upd = data[ind_data]/simdata[ind_data];
+                            upd = data[ind_data]/simdata[d+p*dz];
                             for (n=0; n<csize-1; n++) 
                             {
-                                E[indi[n]] -= recon[indi[n]]*upd*dist[n];
+                                E[indi[n]] -= 
+                                    recon[indi[n]+s*ngridx*ngridy]*upd*dist[n];
                             }
                         }
                     }
@@ -363,9 +340,8 @@ ospml_quad(
 
                 for (n = 0; n < ngridx; n++) {
                     for (m = 0; m < ngridy; m++) {
-                        q = m + n*ngridy + s*ngridx*ngridy;
+                        q = m + n*ngridy;
                         if (F[q] != 0.0) {
-                            q = m + n*ngridy;
                             ind0 = q + s*ngridx*ngridy;
                             recon[ind0] = (-G[q]+sqrt(G[q]*G[q]-8*E[q]*F[q]))/(4*F[q]);
                         }
@@ -377,21 +353,20 @@ ospml_quad(
                 free(F);
                 free(G);
             }
+
+            if (record_iteration(data, dx, dy, dz, s, simdata, prev, 
+                    recon+s*ngridx*ngridy, ngridx*ngridy, 
+                    i, num_iter, tol, history)) 
+            {
+                break;
+            }
         }
-            
+
         free(simdata);
+        free(prev);
+        free_tracer(&tr);
     }
 
-    free(gridx);
-    free(gridy);
-    free(coordx);
-    free(coordy);
-    free(ax);
-    free(ay);
-    free(bx);
-    free(by);
-    free(coorx);
-    free(coory);
-    free(dist);
-    free(indi);
+    free_raycache(&cache);
+    free_geometry(&geo);
 }
\ No newline at end of file
@@ -47,31 +47,25 @@
 void 
 pml_quad(
     float *data, int dx, int dy, int dz, float *center, float *theta,
-    float *recon, int ngridx, int ngridy, int num_iter, float *reg_pars)
+    float *recon, int ngridx, int ngridy, int num_iter, float *reg_pars, 
+    float cache_size, int engine, float *roi, 
+    float tol, float *history, int ncore)
 {
-    float *gridx = (float *)malloc((ngridx+1)*sizeof(float));
-    float *gridy = (float *)malloc((ngridy+1)*sizeof(float));
-    float *coordx = (float *)malloc((ngridy+1)*sizeof(float));
-    float *coordy = (float *)malloc((ngridx+1)*sizeof(float));
-    float *ax = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *ay = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *bx = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *by = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *coorx = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *coory = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    float *dist = (float *)malloc((ngridx+ngridy)*sizeof(float));
-    int *indi = (int *)malloc((ngridx+ngridy)*sizeof(int));
-
-    assert(coordx != NULL && coordy != NULL &&
-        ax != NULL && ay != NULL && by != NULL && bx != NULL &&
-        coorx != NULL && coory != NULL && dist != NULL && indi != NULL);
-
-    int s, p, d, i, m, n, q;
-    int quadrant;
-    float theta_p, sin_p, cos_p;
-    float mov, xi, yi;
-    int asize, bsize, csize;
+    geometry geo;
+    tracer tr;
+    raycache cache;
+    raytable *table;
+
+    init_geometry(&geo, dx, dz, theta, ngridx, ngridy, engine);
+    set_geometry_roi(&geo, roi);
+    init_raycache(&cache, cache_size);
+
+    int s, p, d, g, k, i, m, n, q;
+    int csize;
+    int *indi;
+    float *dist;
     float *simdata;
+    float *prev;
     float upd;
     int ind_data;
     float *sum_dist;
@@ -80,84 +74,74 @@ pml_quad(
     int ind0, ind1, indg[8];
     float totalwg, wg[8], mg[8];
 
-    for (i=0; i<num_iter; i++) 
+    // For each slice
+    #pragma omp parallel for num_threads(ncore) schedule(dynamic) \
+        private(tr, table, simdata, prev, p, d, g, k, i, m, n, q, csize, \
+        indi, dist, upd, ind_data, sum_dist, sum_dist2, E, F, G, ind0, ind1, \
+        indg, totalwg, wg, mg)
+    for (s=0; s<dy; s++) 
     {
-        simdata = (float *)calloc((dx*dy*dz), sizeof(float));
+        init_tracer(&tr, ngridx, ngridy);
+        table = get_raytable(&cache, &geo, &tr, center[s]);
 
-        // For each slice
-        for (s=0; s<dy; s++) 
+        // Simulated data of the slice, indexed d+p*dz.
+        simdata = (float *)malloc((dx*dz)*sizeof(float));
+        prev = (float *)malloc((ngridx*ngridy)*sizeof(float));
+        assert(simdata != NULL && prev != NULL);
+
+        for (i=0; i<num_iter; i++) 
         {
-            preprocessing(ngridx, ngridy, dz, center[s], 
-                &mov, gridx, gridy); // Outputs: mov, gridx, gridy
+            // Keep the estimate to measure the change of the iteration.
+            memcpy(prev, recon+s*ngridx*ngridy, 
+                (ngridx*ngridy)*sizeof(float));
+
+            // Clear the simulated data of the slice.
+            memset(simdata, 0, (dx*dz)*sizeof(float));
             
             sum_dist = (float *)calloc((ngridx*ngridy), sizeof(float));
             E = (float *)calloc((ngridx*ngridy), sizeof(float));
             F = (float *)calloc((ngridx*ngridy), sizeof(float));
             G = (float *)calloc((ngridx*ngridy), sizeof(float));
             
-            // For each projection angle 
-            for (p=0; p<dx; p++) 
+            // For each group of symmetric projection angles
+            for (g=0; g<geo.ngroups; g++) 
             {
-                // Calculate the sin and cos values 
-                // of the projection angle and find
-                // at which quadrant on the cartesian grid.
-                theta_p = fmod(theta[p], 2*M_PI);
-                quadrant = calc_quadrant(theta_p);
-                sin_p = sinf(theta_p);
-                cos_p = cosf(theta_p);
-
                 // For each detector pixel 
                 for (d=0; d<dz; d++) 
                 {
-                    // Calculate coordinates
-                    xi = -1e6;
-                    yi = -(dz-1)/2.0+d+mov;
-                    calc_coords(
-                        ngridx, ngridy, xi, yi, sin_p, cos_p, gridx, gridy, 
-                        coordx, coordy);
-
-                    // Merge the (coordx, gridy) and (gridx, coordy)
-                    trim_coords(
-                        ngridx, ngridy, coordx, coordy, gridx, gridy, 
-                        &asize, ax, ay, &bsize, bx, by);
-
-                    // Sort the array of intersection points (ax, ay) and
-                    // (bx, by). The new sorted intersection points are 
-                    // stored in (coorx, coory). Total number of points 
-                    // are csize.
-                    sort_intersections(
-                        quadrant, asize, ax, ay, bsize, bx, by, 
-                        &csize, coorx, coory);
-
-                    // Calculate the distances (dist) between the 
-                    // intersection points (coorx, coory). Find the 
-                    // indices of the pixels on the reconstruction grid.
-                    calc_dist(
-                        ngridx, ngridy, csize, coorx, coory, 
-                        indi, dist);
-
-                    // Calculate simdata 
-                    calc_simdata(p, s, d, ngridx, ngridy, dy, dz,
-                        csize, indi, dist, recon,
-                        simdata); // Output: simdata
-
-
-                    // Calculate dist*dist
-                    sum_dist2 = 0.0;
-                    for (n=0; n<csize-1; n++) 
+                    // For each projection angle of the group
+                    for (k=geo.groupptr[g]; k<geo.groupptr[g+1]; k++) 
                     {
-                        sum_dist2 += dist[n]*dist[n];
-                        sum_dist[indi[n]] += dist[n];
-                    }
+                        p = geo.order[k];
 
-                    // Update
-                    if (sum_dist2 != 0.0) 
-                    {
-                        ind_data = d+s*dz+p*dy*dz;
-                        upd = data[ind_data]/simdata[ind_data];
+                        // Trace the ray or fetch it from the ray table.
+                        csize = get_ray(
+                            &tr, table, &geo, p, d, &indi, &dist);
+
+                        // Calculate simdata 
+                        calc_simdata(p, 0, d, ngridx, ngridy, 1, dz,
+                            csize, indi, dist, recon+s*ngridx*ngridy,
+                            simdata); // Output: simdata
+
+
+                        // Calculate dist*dist
+                        sum_dist2 = 0.0;
                         for (n=0; n<csize-1; n++) 
                         {
-                            E[indi[n]] -= recon[indi[n]]*upd*dist[n];
+                            sum_dist2 += dist[n]*dist[n];
+                            sum_dist[indi[n]] += dist[n];
+                        }
+
+                        // Update
+                        if (sum_dist2 != 0.0) 
+                        {
+                            ind_data = d+s*dz+p*dy*dz;
+                            upd = data[ind_data]/simdata[d+p*dz];
+                            for (n=0; n<csize-1; n++) 
+                            {
+                                E[indi[n]] -= 
+                                    recon[indi[n]+s*ngridx*ngridy]*upd*dist[n];
+                            }
                         }
                     }
                 }
@@ -360,21 +344,20 @@ pml_quad(
             free(E);
             free(F);
             free(G);
+
+            if (record_iteration(data, dx, dy, dz, s, simdata, prev, 
+                    recon+s*ngridx*ngridy, ngridx*ngridy, 
+                    i, num_iter, tol, history)) 
+            {
+                break;
+            }
         }
 
         free(simdata);
+        free(prev);
+        free_tracer(&tr);
     }
 
-    free(gridx);
-    free(gridy);
-    free(coordx);
-    free(coordy);
-    free(ax);
-    free(ay);
-    free(bx);
-    free(by);
-    free(coorx);
-    free(coory);
-    free(dist);
-    free(indi);
+    free_raycache(&cache);
+    free_geometry(&geo);
 }
\ No newline at end of file
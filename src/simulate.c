@@ -47,96 +47,53 @@
 void 
 simulate(
     float *obj, int ox, int oy, int oz, 
-    float *data, int dx, int dy, int dz, float *center, float *theta)
+    float *data, int dx, int dy, int dz, float *center, float *theta,
+    int engine, int ncore)
 {
+    geometry geo;
+    tracer tr;
 
-    float *gridx = (float *)malloc((oy+1)*sizeof(float));
-    float *gridy = (float *)malloc((oz+1)*sizeof(float));
-    float *coordx = (float *)malloc((oz+1)*sizeof(float));
-    float *coordy = (float *)malloc((oy+1)*sizeof(float));
-    float *ax = (float *)malloc((oy+oz)*sizeof(float));
-    float *ay = (float *)malloc((oy+oz)*sizeof(float));
-    float *bx = (float *)malloc((oy+oz)*sizeof(float));
-    float *by = (float *)malloc((oy+oz)*sizeof(float));
-    float *coorx = (float *)malloc((oy+oz)*sizeof(float));
-    float *coory = (float *)malloc((oy+oz)*sizeof(float));
-    float *dist = (float *)malloc((oy+oz)*sizeof(float));
-    int *indi = (int *)malloc((oy+oz)*sizeof(int));
-
-    assert(coordx != NULL && coordy != NULL &&
-        ax != NULL && ay != NULL && by != NULL && bx != NULL &&
-        coorx != NULL && coory != NULL && dist != NULL && indi != NULL);
-
-    int s, p, d;
-    int quadrant;
-    float theta_p, sin_p, cos_p;
-    float mov, xi, yi;
-    int asize, bsize, csize;
+    init_geometry(&geo, dx, dz, theta, oy, oz, engine);
+
+    int s, p, d, g, k;
+    int csize;
+    int *indi;
+    float *dist;
 
     // For each slice
+    #pragma omp parallel for num_threads(ncore) schedule(dynamic) \
+        private(tr, p, d, g, k, csize, indi, dist)
     for (s=0; s<dy; s++) 
     {
-        preprocessing(oy, oz, dz, center[s], 
-            &mov, gridx, gridy); // Outputs: mov, gridx, gridy
+        init_tracer(&tr, oy, oz);
+        set_tracer_center(&tr, dz, center[s]);
 
-        // For each projection angle
-        for (p=0; p<dx; p++) 
+        // For each group of symmetric projection angles
+        for (g=0; g<geo.ngroups; g++) 
         {
-            // Calculate the sin and cos values 
-            // of the projection angle and find
-            // at which quadrant on the cartesian grid.
-            theta_p = fmod(theta[p], 2*M_PI);
-            quadrant = calc_quadrant(theta_p);
-            sin_p = sinf(theta_p);
-            cos_p = cosf(theta_p);
-
+            // For each detector pixel 
             for (d=0; d<dz; d++) 
             {
-                // Calculate coordinates
-                xi = -1e6;
-                yi = -(dz-1)/2.0+d+mov;
-                calc_coords(
-                    oy, oz, xi, yi, sin_p, cos_p, gridx, gridy, 
-                    coordx, coordy);
-
-                // Merge the (coordx, gridy) and (gridx, coordy)
-                trim_coords(
-                    oy, oz, coordx, coordy, gridx, gridy, 
-                    &asize, ax, ay, &bsize, bx, by);
-
-                // Sort the array of intersection points (ax, ay) and
-                // (bx, by). The new sorted intersection points are 
-                // stored in (coorx, coory). Total number of points 
-                // are csize.
-                sort_intersections(
-                    quadrant, asize, ax, ay, bsize, bx, by, 
-                    &csize, coorx, coory);
-
-                // Calculate the distances (dist) between the 
-                // intersection points (coorx, coory). Find the 
-                // indices of the pixels on the object grid.
-                calc_dist(
-                    oy, oz, csize, coorx, coory, 
-                    indi, dist);
-
-                // Calculate simdata 
-                calc_simdata(p, s, d, oy, oz, dy, dz,
-                    csize, indi, dist, obj,
-                    data); // Output: simulated data
+                // For each projection angle of the group
+                for (k=geo.groupptr[g]; k<geo.groupptr[g+1]; k++) 
+                {
+                    p = geo.order[k];
+
+                    // Calculate the distances (dist) between the 
+                    // intersection points and the indices (indi) of 
+                    // the pixels on the object grid.
+                    csize = get_ray(&tr, NULL, &geo, p, d, &indi, &dist);
+
+                    // Calculate simdata 
+                    calc_simdata(p, s, d, oy, oz, dy, dz,
+                        csize, indi, dist, obj,
+                        data); // Output: simulated data
+                }
             }
         }
+
+        free_tracer(&tr);
     }
 
-    free(gridx);
-    free(gridy);
-    free(coordx);
-    free(coordy);
-    free(ax);
-    free(ay);
-    free(bx);
-    free(by);
-    free(coorx);
-    free(coory);
-    free(dist);
-    free(indi);
+    free_geometry(&geo);
 }
\ No newline at end of file
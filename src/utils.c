@@ -239,11 +239,936 @@ calc_simdata(
     float *model, float *simdata)
 {
     int n;
+    float sum = 0.0;
 
     int index_model = s*ry*rz;
     int index_data = c+s*num_pixels+p*num_slices*num_pixels;
+    #pragma omp simd reduction(+:sum)
     for (n=0; n<csize-1; n++) 
     {
-        simdata[index_data] += model[indi[n]+index_model]*dist[n];
+        sum += model[indi[n]+index_model]*dist[n];
     }
-}
\ No newline at end of file
+    simdata[index_data] += sum;
+}
+
+
+bool 
+record_iteration(
+    float *data, int dx, int dy, int dz, int s, 
+    float *simdata, float *prev, float *model, int ngrid, 
+    int i, int num_iter, float tol, float *history)
+{
+    // Record the relative residual norm of the forward projections of 
+    // iteration i of slice s and the relative norm of the change of the 
+    // slice made by the iteration (from prev to model) at 
+    // history[2*(i+s*num_iter)]. Return true once the relative update 
+    // norm falls below tol.
+    int p, d, n;
+    double r = 0.0, b = 0.0, u = 0.0, x = 0.0;
+    float diff, res, upd;
+
+    for (p=0; p<dx; p++) 
+    {
+        for (d=0; d<dz; d++) 
+        {
+            diff = data[d+s*dz+p*dy*dz]-simdata[d+p*dz];
+            r += diff*diff;
+            b += data[d+s*dz+p*dy*dz]*data[d+s*dz+p*dy*dz];
+        }
+    }
+    for (n=0; n<ngrid; n++) 
+    {
+        diff = model[n]-prev[n];
+        u += diff*diff;
+        x += model[n]*model[n];
+    }
+    res = (b > 0.0) ? sqrt(r/b) : sqrt(r);
+    upd = (x > 0.0) ? sqrt(u/x) : sqrt(u);
+
+    if (history != NULL) 
+    {
+        history[2*(i+s*num_iter)] = res;
+        history[2*(i+s*num_iter)+1] = upd;
+    }
+    return tol > 0.0 && upd < tol;
+}
+
+
+typedef struct
+{
+    double r;
+    int q;
+    int m;
+    int p;
+} reduced_angle;
+
+
+static int 
+compare_reduced_angles(const void *a, const void *b)
+{
+    const reduced_angle *ra = (const reduced_angle *)a;
+    const reduced_angle *rb = (const reduced_angle *)b;
+    if (ra->r != rb->r) 
+    {
+        return (ra->r < rb->r) ? -1 : 1;
+    }
+    return ra->p-rb->p;
+}
+
+
+static void 
+group_angles(geometry *geo, float *theta)
+{
+    // Reduce each angle to theta = r+k*period with 0 <= r < period. 
+    // Quarter turns need a square grid, otherwise only half turns are 
+    // used. Flipping the grid along y maps the ray at theta to the ray 
+    // at pi-theta through the same detector pixel, so r and period-r 
+    // are equivalent as well. With c = min(r, period-r), the ray at 
+    // theta is the canonical ray at c, mirrored if r > c (m), turned by 
+    // q quarter turns. Angles whose c agree within SYMMETRY_TOL are 
+    // grouped; on square grids this pairs theta with pi/2-theta.
+    int dx = geo->dx;
+    int nrot = (geo->ngridx == geo->ngridy) ? 4 : 2;
+    double period = 2*M_PI/nrot;
+    double t;
+    int i, j, n, p, b, g, k;
+    int *first;
+    reduced_angle *ra;
+
+    ra = (reduced_angle *)malloc(dx*sizeof(reduced_angle));
+    first = (int *)malloc(dx*sizeof(int));
+    assert(ra != NULL && first != NULL);
+
+    for (p=0; p<dx; p++) 
+    {
+        t = floor(theta[p]/period);
+        ra[p].r = theta[p]-t*period;
+        k = (int)t;
+        if (ra[p].r > period-SYMMETRY_TOL) 
+        {
+            ra[p].r -= period;
+            k++;
+        }
+        // The ray at period-c+k*period is the ray at pi+c mirrored and
+        // turned by (k+1)*period-pi.
+        ra[p].m = (ra[p].r > period-ra[p].r);
+        if (ra[p].m) 
+        {
+            ra[p].r = period-ra[p].r;
+            ra[p].q = (k+1)*(4/nrot)-2;
+        }
+        else 
+        {
+            ra[p].q = k*(4/nrot);
+        }
+        ra[p].p = p;
+    }
+    qsort(ra, dx, sizeof(reduced_angle), compare_reduced_angles);
+
+    // The base of a group is its smallest projection index.
+    for (i=0; i<dx; i=j) 
+    {
+        b = ra[i].p;
+        for (j=i+1; j<dx && ra[j].r-ra[i].r <= SYMMETRY_TOL; j++) 
+        {
+            if (ra[j].p < b) 
+            {
+                b = ra[j].p;
+            }
+        }
+        for (n=i; n<j; n++) 
+        {
+            geo->base[ra[n].p] = b;
+            first[ra[n].p] = n;
+        }
+        // Relative to the base, a member is mirrored if exactly one of
+        // them is. Mirroring reverses the sense of the base's turns.
+        for (n=i; n<j; n++) 
+        {
+            p = ra[n].p;
+            geo->mirror[p] = ra[n].m^ra[first[b]].m;
+            if (geo->mirror[p]) 
+            {
+                geo->rot[p] = (ra[n].q+ra[first[b]].q)%4;
+            }
+            else 
+            {
+                geo->rot[p] = (ra[n].q-ra[first[b]].q)%4;
+            }
+            if (geo->rot[p] < 0) 
+            {
+                geo->rot[p] += 4;
+            }
+        }
+    }
+
+    // Lay out the groups in the order of their bases. Bases come first
+    // in their groups as they have the smallest index.
+    geo->ngroups = 0;
+    for (p=0; p<dx; p++) 
+    {
+        first[p] = 0;
+    }
+    for (p=0; p<dx; p++) 
+    {
+        first[geo->base[p]]++;
+    }
+    geo->groupptr[0] = 0;
+    for (p=0; p<dx; p++) 
+    {
+        if (first[p] > 0) 
+        {
+            g = geo->ngroups++;
+            geo->groupptr[g+1] = geo->groupptr[g]+first[p];
+            first[p] = geo->groupptr[g];
+        }
+    }
+    for (p=0; p<dx; p++) 
+    {
+        geo->order[first[geo->base[p]]++] = p;
+    }
+
+    free(first);
+    free(ra);
+}
+
+
+void 
+init_geometry(
+    geometry *geo, int dx, int dz, float *theta, 
+    int ngridx, int ngridy, int engine)
+{
+    int p;
+    float theta_p;
+
+    geo->dx = dx;
+    geo->dz = dz;
+    geo->ngridx = ngridx;
+    geo->ngridy = ngridy;
+    geo->engine = engine;
+    geo->sin_p = (float *)malloc(dx*sizeof(float));
+    geo->cos_p = (float *)malloc(dx*sizeof(float));
+    geo->quadrant = (int *)malloc(dx*sizeof(int));
+    geo->shift = (float *)calloc(dx, sizeof(float));
+    geo->radius = 0;
+    geo->groupptr = (int *)malloc((dx+1)*sizeof(int));
+    geo->order = (int *)malloc(dx*sizeof(int));
+    geo->base = (int *)malloc(dx*sizeof(int));
+    geo->rot = (int *)malloc(dx*sizeof(int));
+    geo->mirror = (int *)malloc(dx*sizeof(int));
+    assert(geo->sin_p != NULL && geo->cos_p != NULL && 
+        geo->quadrant != NULL && geo->shift != NULL && 
+        geo->groupptr != NULL && 
+        geo->order != NULL && geo->base != NULL && geo->rot != NULL && 
+        geo->mirror != NULL);
+
+    // Calculate the sin and cos values of the projection 
+    // angles and find at which quadrant on the cartesian grid.
+    for (p=0; p<dx; p++) 
+    {
+        theta_p = fmod(theta[p], 2*M_PI);
+        geo->quadrant[p] = calc_quadrant(theta_p);
+        geo->sin_p[p] = sinf(theta_p);
+        geo->cos_p[p] = cosf(theta_p);
+    }
+
+    group_angles(geo, theta);
+}
+
+
+void 
+set_geometry_roi(geometry *geo, float *roi)
+{
+    // Centers the grid at (roi[0], roi[1]) pixels from the rotation 
+    // axis and, if roi[2] > 0, restricts it to the disk of radius 
+    // roi[2] about its center. Off the axis, rays of angles pi or pi/2 
+    // apart are no longer related by the grid symmetries, so each 
+    // angle makes a group of its own.
+    int p;
+
+    if (roi == NULL) 
+    {
+        return;
+    }
+    for (p=0; p<geo->dx; p++) 
+    {
+        geo->shift[p] = roi[0]*geo->sin_p[p]-roi[1]*geo->cos_p[p];
+    }
+    geo->radius = roi[2];
+
+    if (roi[0] != 0 || roi[1] != 0) 
+    {
+        geo->ngroups = geo->dx;
+        for (p=0; p<geo->dx; p++) 
+        {
+            geo->groupptr[p] = p;
+            geo->order[p] = p;
+            geo->base[p] = p;
+            geo->rot[p] = 0;
+            geo->mirror[p] = 0;
+        }
+        geo->groupptr[geo->dx] = geo->dx;
+    }
+}
+
+
+void 
+free_geometry(geometry *geo)
+{
+    free(geo->sin_p);
+    free(geo->cos_p);
+    free(geo->quadrant);
+    free(geo->shift);
+    free(geo->groupptr);
+    free(geo->order);
+    free(geo->base);
+    free(geo->rot);
+    free(geo->mirror);
+}
+
+
+void 
+init_tracer(tracer *tr, int ngridx, int ngridy)
+{
+    tr->ngridx = ngridx;
+    tr->ngridy = ngridy;
+    tr->dz = 0;
+    tr->mov = 0;
+    tr->gridx = (float *)malloc((ngridx+1)*sizeof(float));
+    tr->gridy = (float *)malloc((ngridy+1)*sizeof(float));
+    tr->coordx = (float *)malloc((ngridy+1)*sizeof(float));
+    tr->coordy = (float *)malloc((ngridx+1)*sizeof(float));
+    tr->ax = (float *)malloc((ngridx+ngridy)*sizeof(float));
+    tr->ay = (float *)malloc((ngridx+ngridy)*sizeof(float));
+    tr->bx = (float *)malloc((ngridx+ngridy)*sizeof(float));
+    tr->by = (float *)malloc((ngridx+ngridy)*sizeof(float));
+    tr->coorx = (float *)malloc((ngridx+ngridy)*sizeof(float));
+    tr->coory = (float *)malloc((ngridx+ngridy)*sizeof(float));
+    tr->dist = (float *)malloc(2*(ngridx+ngridy)*sizeof(float));
+    tr->indi = (int *)malloc(2*(ngridx+ngridy)*sizeof(int));
+    tr->symindi = (int *)malloc(2*(ngridx+ngridy)*sizeof(int));
+    tr->ray_p = -1;
+    tr->ray_d = -1;
+    tr->ray_csize = 0;
+
+    assert(tr->gridx != NULL && tr->gridy != NULL &&
+        tr->coordx != NULL && tr->coordy != NULL &&
+        tr->ax != NULL && tr->ay != NULL && 
+        tr->bx != NULL && tr->by != NULL &&
+        tr->coorx != NULL && tr->coory != NULL && 
+        tr->dist != NULL && tr->indi != NULL && 
+        tr->symindi != NULL);
+}
+
+
+void 
+free_tracer(tracer *tr)
+{
+    free(tr->gridx);
+    free(tr->gridy);
+    free(tr->coordx);
+    free(tr->coordy);
+    free(tr->ax);
+    free(tr->ay);
+    free(tr->bx);
+    free(tr->by);
+    free(tr->coorx);
+    free(tr->coory);
+    free(tr->dist);
+    free(tr->indi);
+    free(tr->symindi);
+}
+
+
+void 
+set_tracer_center(tracer *tr, int dz, float center)
+{
+    tr->dz = dz;
+    tr->ray_p = -1;
+    tr->ray_d = -1;
+    preprocessing(tr->ngridx, tr->ngridy, dz, center, 
+        &tr->mov, tr->gridx, tr->gridy); // Outputs: mov, gridx, gridy
+}
+
+
+static int 
+trace_ray_sort(tracer *tr, geometry *geo, int p, int d)
+{
+    int ngridx = tr->ngridx;
+    int ngridy = tr->ngridy;
+    int asize, bsize, csize;
+    float xi, yi;
+
+    // Calculate coordinates
+    xi = -1e6;
+    yi = -(tr->dz-1)/2.0+d+tr->mov+geo->shift[p];
+    calc_coords(
+        ngridx, ngridy, xi, yi, geo->sin_p[p], geo->cos_p[p], 
+        tr->gridx, tr->gridy, tr->coordx, tr->coordy);
+
+    // Merge the (coordx, gridy) and (gridx, coordy)
+    trim_coords(
+        ngridx, ngridy, tr->coordx, tr->coordy, tr->gridx, tr->gridy, 
+        &asize, tr->ax, tr->ay, &bsize, tr->bx, tr->by);
+
+    // Sort the array of intersection points (ax, ay) and
+    // (bx, by). The new sorted intersection points are 
+    // stored in (coorx, coory). Total number of points 
+    // are csize.
+    sort_intersections(
+        geo->quadrant[p], asize, tr->ax, tr->ay, bsize, tr->bx, tr->by, 
+        &csize, tr->coorx, tr->coory);
+
+    // Calculate the distances (dist) between the 
+    // intersection points (coorx, coory). Find the 
+    // indices of the pixels on the reconstruction grid.
+    calc_dist(
+        ngridx, ngridy, csize, tr->coorx, tr->coory, 
+        tr->indi, tr->dist);
+
+    return csize;
+}
+
+
+static int 
+clip_ray(
+    double o, double u, double lo, double hi, 
+    double *tmin, double *tmax)
+{
+    // Narrows the parameter range [tmin, tmax] of the ray o+t*u to 
+    // the slab lo < o+t*u < hi. Returns 0 if the ray misses it.
+    double t0, t1;
+
+    if (u == 0) 
+    {
+        return (o > lo && o < hi);
+    }
+    t0 = (lo-o)/u;
+    t1 = (hi-o)/u;
+    if (t0 > t1) 
+    {
+        double t = t0;
+        t0 = t1;
+        t1 = t;
+    }
+    if (t0 > *tmin) 
+    {
+        *tmin = t0;
+    }
+    if (t1 < *tmax) 
+    {
+        *tmax = t1;
+    }
+    return (*tmin < *tmax);
+}
+
+
+static int 
+trace_ray_siddon(tracer *tr, geometry *geo, int p, int d)
+{
+    // Walks the ray from the grid line crossing where it enters the 
+    // grid to the one where it leaves, emitting one segment per pixel.
+    // The ray is o+t*u with direction u = (cos, sin) and o its point 
+    // closest to the rotation axis. Uses double precision throughout.
+    int ngridx = tr->ngridx;
+    int ngridy = tr->ngridy;
+    double cos_p = geo->cos_p[p];
+    double sin_p = geo->sin_p[p];
+    double yi = -(tr->dz-1)/2.0+d+tr->mov+geo->shift[p];
+    double ox = -yi*sin_p;
+    double oy = yi*cos_p;
+    double x0 = -ngridx/2.0;
+    double y0 = -ngridy/2.0;
+    double tmin = -INFINITY, tmax = INFINITY;
+    double t, tnext, tx, ty, dtx, dty;
+    int ix, iy, sx, sy, n = 0;
+
+    if (!clip_ray(ox, cos_p, x0, -x0, &tmin, &tmax) || 
+            !clip_ray(oy, sin_p, y0, -y0, &tmin, &tmax)) 
+    {
+        return 0;
+    }
+
+    // Pixel of the entry point and parameters of the next crossings 
+    // of vertical (tx) and horizontal (ty) grid lines.
+    t = tmin;
+    ix = (int)floor(ox+t*cos_p-x0);
+    iy = (int)floor(oy+t*sin_p-y0);
+    ix = (ix < 0) ? 0 : (ix >= ngridx) ? ngridx-1 : ix;
+    iy = (iy < 0) ? 0 : (iy >= ngridy) ? ngridy-1 : iy;
+    sx = (cos_p > 0) ? 1 : -1;
+    sy = (sin_p > 0) ? 1 : -1;
+    if (cos_p != 0) 
+    {
+        tx = (x0+ix+(sx > 0)-ox)/cos_p;
+        dtx = 1/fabs(cos_p);
+    }
+    else 
+    {
+        tx = dtx = INFINITY;
+    }
+    if (sin_p != 0) 
+    {
+        ty = (y0+iy+(sy > 0)-oy)/sin_p;
+        dty = 1/fabs(sin_p);
+    }
+    else 
+    {
+        ty = dty = INFINITY;
+    }
+
+    while (t < tmax && ix >= 0 && ix < ngridx && iy >= 0 && iy < ngridy) 
+    {
+        tnext = (tx < ty) ? tx : ty;
+        if (tnext > tmax) 
+        {
+            tnext = tmax;
+        }
+        if (tnext > t) 
+        {
+            tr->indi[n] = iy+ix*ngridy;
+            tr->dist[n] = tnext-t;
+            n++;
+        }
+        t = tnext;
+        if (tx < ty) 
+        {
+            ix += sx;
+            tx += dtx;
+        }
+        else 
+        {
+            iy += sy;
+            ty += dty;
+        }
+    }
+
+    // Number of intersection points, as for the sorting tracer.
+    return (n > 0) ? n+1 : 0;
+}
+
+
+static int 
+trace_ray_vector(tracer *tr, geometry *geo, int p, int d)
+{
+    // Samples the ray at the centers of the grid columns if it runs 
+    // closer to the x-axis, else at the centers of the grid rows, and 
+    // splits the step length between the two pixels nearest to each 
+    // sample. Only the samples within one pixel of the grid are taken.
+    // The sampling loop has no branches so that it compiles to packed
+    // arithmetic. The first and second pixels of the samples are 
+    // stored in two consecutive runs.
+    int ngridx = tr->ngridx;
+    int ngridy = tr->ngridy;
+    float cos_p = geo->cos_p[p];
+    float sin_p = geo->sin_p[p];
+    float yi = -(tr->dz-1)/2.0+d+tr->mov+geo->shift[p];
+    int xmajor = (fabsf(cos_p) >= fabsf(sin_p));
+    int nstep = xmajor ? ngridx : ngridy;
+    int nside = xmajor ? ngridy : ngridx;
+    int stride = xmajor ? ngridy : 1;   // Index step along the ray.
+    int side = xmajor ? 1 : ngridy;     // Index step across the ray.
+    float u = xmajor ? cos_p : sin_p;
+    float v = xmajor ? sin_p : cos_p;
+    float o = xmajor ? -yi*sin_p : yi*cos_p;
+    float w = xmajor ? yi*cos_p : -yi*sin_p;
+    float slope = v/u;
+    float len = 1/fabsf(u);
+    float start = w+slope*(-nstep/2.0+0.5-o)+nside/2.0-0.5;
+    double t0, t1, t;
+    int *indi0, *indi1;
+    float *dist0, *dist1;
+    int n, nlo, nhi, m;
+
+    // Sample n is at position pos = start+slope*n across the ray, in 
+    // pixel units from the center of the first pixel. Find the samples
+    // with -1 < pos < nside.
+    if (slope == 0) 
+    {
+        nlo = 0;
+        nhi = (start > -1 && start < nside) ? nstep : 0;
+    }
+    else 
+    {
+        t0 = (-1-start)/slope;
+        t1 = (nside-start)/slope;
+        if (t0 > t1) 
+        {
+            t = t0;
+            t0 = t1;
+            t1 = t;
+        }
+        t0 = (t0 < 0) ? 0 : (t0 > nstep) ? nstep : ceil(t0);
+        t1 = (t1 < 0) ? 0 : (t1 > nstep-1) ? nstep : floor(t1)+1;
+        nlo = (int)t0;
+        nhi = (int)t1;
+    }
+    m = (nhi > nlo) ? nhi-nlo : 0;
+    if (m == 0) 
+    {
+        return 0;
+    }
+
+    indi0 = tr->indi;
+    indi1 = tr->indi+m;
+    dist0 = tr->dist;
+    dist1 = tr->dist+m;
+    #pragma omp simd
+    for (n=0; n<m; n++) 
+    {
+        float pos = start+slope*(n+nlo);
+        int j = (int)pos;
+        j -= (pos < j);
+        float f = pos-j;
+        int j0 = (j < 0) ? 0 : j;
+        int j1 = (j+1 > nside-1) ? nside-1 : j+1;
+        indi0[n] = (n+nlo)*stride+j0*side;
+        indi1[n] = (n+nlo)*stride+j1*side;
+        dist0[n] = (j >= 0)*(1-f)*len;
+        dist1[n] = (j+1 < nside)*f*len;
+    }
+    return 2*m+1;
+}
+
+
+static int 
+mask_ray(tracer *tr, geometry *geo, int csize)
+{
+    // Drops the intersections with pixels whose centers lie outside 
+    // the disk of the geometry.
+    int n, m = 0, ix, iy;
+    float x, y;
+    float r2 = geo->radius*geo->radius;
+
+    for (n=0; n<csize-1; n++) 
+    {
+        ix = tr->indi[n]/tr->ngridy;
+        iy = tr->indi[n]-ix*tr->ngridy;
+        x = ix+0.5-tr->ngridx/2.0;
+        y = iy+0.5-tr->ngridy/2.0;
+        if (x*x+y*y <= r2) 
+        {
+            tr->indi[m] = tr->indi[n];
+            tr->dist[m] = tr->dist[n];
+            m++;
+        }
+    }
+    return (m > 0) ? m+1 : 0;
+}
+
+
+int 
+trace_ray(tracer *tr, geometry *geo, int p, int d)
+{
+    // Traces the ray through detector pixel d at projection angle p 
+    // into the tracer's indi and dist buffers with the engine of the 
+    // geometry. Returns the number of intersection points.
+    int csize;
+
+    if (geo->engine == ENGINE_SIDDON) 
+    {
+        csize = trace_ray_siddon(tr, geo, p, d);
+    }
+    else if (geo->engine == ENGINE_VECTOR) 
+    {
+        csize = trace_ray_vector(tr, geo, p, d);
+    }
+    else 
+    {
+        csize = trace_ray_sort(tr, geo, p, d);
+    }
+    if (geo->radius > 0) 
+    {
+        csize = mask_ray(tr, geo, csize);
+    }
+
+    tr->ray_p = p;
+    tr->ray_d = d;
+    tr->ray_csize = csize;
+    return csize;
+}
+
+
+void 
+init_raycache(raycache *cache, float cache_size)
+{
+    // The cap is given in megabytes.
+    cache->ntables = 0;
+    cache->nbytes = 0;
+    cache->maxbytes = (double)cache_size*1024*1024;
+}
+
+
+void 
+free_raycache(raycache *cache)
+{
+    int n;
+
+    for (n=0; n<cache->ntables; n++) 
+    {
+        free(cache->tables[n].rowptr);
+        free(cache->tables[n].indi);
+        free(cache->tables[n].dist);
+    }
+    cache->ntables = 0;
+    cache->nbytes = 0;
+}
+
+
+static int 
+build_raytable(
+    raytable *table, geometry *geo, tracer *tr, double maxbytes)
+{
+    // Trace every ray of the slice geometry once and store the 
+    // intersections. Returns 0 and leaves the table empty as soon 
+    // as the table outgrows maxbytes.
+    int p, d, n, csize;
+    long nnz = 0, capacity, row = 0;
+    int nrays = geo->dx*geo->dz;
+    double rowbytes = (double)(nrays+1)*sizeof(long);
+    int *indi;
+    float *dist;
+
+    table->rowptr = NULL;
+    table->indi = NULL;
+    table->dist = NULL;
+    if (rowbytes >= maxbytes) 
+    {
+        return 0;
+    }
+
+    capacity = nrays;
+    table->rowptr = (long *)malloc((nrays+1)*sizeof(long));
+    table->indi = (int *)malloc(capacity*sizeof(int));
+    table->dist = (float *)malloc(capacity*sizeof(float));
+    assert(table->rowptr != NULL && 
+        table->indi != NULL && table->dist != NULL);
+
+    table->rowptr[0] = 0;
+    for (p=0; p<geo->dx; p++) 
+    {
+        for (d=0; d<geo->dz; d++) 
+        {
+            // Rays of symmetric angles are derived from the row of 
+            // their base angle, which precedes them in the table.
+            if (geo->base[p] == p) 
+            {
+                csize = trace_ray(tr, geo, p, d);
+                if (csize < 1) 
+                {
+                    csize = 1; // The ray misses the grid.
+                }
+            }
+            else 
+            {
+                row = d+geo->base[p]*geo->dz;
+                csize = table->rowptr[row+1]-table->rowptr[row]+1;
+            }
+            if (nnz+csize > capacity) 
+            {
+                capacity = 2*(nnz+csize);
+                if (rowbytes+capacity*(sizeof(int)+sizeof(float)) > maxbytes) 
+                {
+                    capacity = (maxbytes-rowbytes)/(sizeof(int)+sizeof(float));
+                }
+                if (nnz+csize > capacity) 
+                {
+                    free(table->rowptr);
+                    free(table->indi);
+                    free(table->dist);
+                    table->rowptr = NULL;
+                    table->indi = NULL;
+                    table->dist = NULL;
+                    return 0;
+                }
+                indi = (int *)realloc(table->indi, capacity*sizeof(int));
+                dist = (float *)realloc(table->dist, capacity*sizeof(float));
+                assert(indi != NULL && dist != NULL);
+                table->indi = indi;
+                table->dist = dist;
+            }
+            if (geo->base[p] == p) 
+            {
+                for (n=0; n<csize-1; n++) 
+                {
+                    table->indi[nnz+n] = tr->indi[n];
+                    table->dist[nnz+n] = tr->dist[n];
+                }
+            }
+            else 
+            {
+                rotate_indices(geo, geo->mirror[p], geo->rot[p], csize-1, 
+                    table->indi+table->rowptr[row], table->indi+nnz);
+                for (n=0; n<csize-1; n++) 
+                {
+                    table->dist[nnz+n] = table->dist[table->rowptr[row]+n];
+                }
+            }
+            nnz += csize-1;
+            table->rowptr[d+p*geo->dz+1] = nnz;
+        }
+    }
+    return 1;
+}
+
+
+static raytable* 
+lookup_raytable(
+    raycache *cache, geometry *geo, tracer *tr, float center)
+{
+    int n;
+    raytable *table;
+
+    for (n=0; n<cache->ntables; n++) 
+    {
+        table = &cache->tables[n];
+        if (table->center == center) 
+        {
+            return (table->rowptr != NULL) ? table : NULL;
+        }
+    }
+
+    if (cache->ntables == MAX_RAYTABLES) 
+    {
+        return NULL;
+    }
+
+    table = &cache->tables[cache->ntables++];
+    table->center = center;
+    if (!build_raytable(
+            table, geo, tr, cache->maxbytes-cache->nbytes)) 
+    {
+        return NULL;
+    }
+    n = geo->dx*geo->dz;
+    cache->nbytes += (double)(n+1)*sizeof(long)+
+        (double)table->rowptr[n]*(sizeof(int)+sizeof(float));
+    return table;
+}
+
+
+raytable* 
+get_raytable(
+    raycache *cache, geometry *geo, tracer *tr, float center)
+{
+    // Returns the ray table of the given center, building it on first
+    // use. Returns NULL when rays must be traced on the fly, either 
+    // because caching is disabled or the table exceeds the cap. The 
+    // tracer is left set up for the given center in both cases. Safe 
+    // to call from concurrent threads, each with its own tracer.
+    raytable *table;
+
+    set_tracer_center(tr, geo->dz, center);
+    if (cache->maxbytes <= 0) 
+    {
+        return NULL;
+    }
+
+    #pragma omp critical(raycache)
+    table = lookup_raytable(cache, geo, tr, center);
+    return table;
+}
+
+
+void 
+rotate_indices(
+    geometry *geo, int mirror, int rot, int n, int *indi, int *symindi)
+{
+    // Maps the pixel indices of a ray to those of the ray flipped along
+    // y if mirror is set and then turned by rot counterclockwise 
+    // quarter turns about the grid center. Odd turns require a square 
+    // grid. Every such map takes pixel (indx, indy) to 
+    // c+ax*indx+ay*indy, so all of them share one loop.
+    int m, indx, indy, c, ax, ay;
+    int ngridx = geo->ngridx;
+    int ngridy = geo->ngridy;
+    double inv = 1.0/ngridy;
+    int f0 = mirror ? ngridy-1 : 0;
+    int sy = mirror ? -1 : 1;
+
+    if (!mirror && (rot == 0 || rot == 2)) 
+    {
+        // No pixel coordinates needed.
+        c = (rot == 0) ? 0 : ngridx*ngridy-1;
+        ax = (rot == 0) ? 1 : -1;
+        for (m=0; m<n; m++) 
+        {
+            symindi[m] = c+ax*indi[m];
+        }
+        return;
+    }
+
+    switch (rot) 
+    {
+        case 1:
+            c = (ngridx-1-f0)*ngridy;
+            ax = 1;
+            ay = -sy*ngridy;
+            break;
+        case 2:
+            c = ngridx*ngridy-1-f0;
+            ax = -ngridy;
+            ay = -sy;
+            break;
+        case 3:
+            c = ngridy-1+f0*ngridy;
+            ax = -1;
+            ay = sy*ngridy;
+            break;
+        default:
+            c = f0;
+            ax = ngridy;
+            ay = sy;
+    }
+    // The row is found by multiplying with the reciprocal, which is 
+    // exact for any grid size and, unlike the integer division, 
+    // vectorizes.
+    #pragma omp simd
+    for (m=0; m<n; m++) 
+    {
+        indx = (int)((indi[m]+0.5)*inv);
+        indy = indi[m]-indx*ngridy;
+        symindi[m] = c+ax*indx+ay*indy;
+    }
+}
+
+
+int 
+get_ray(
+    tracer *tr, raytable *table, geometry *geo, int p, int d, 
+    int **indi, float **dist)
+{
+    // Returns the number of intersection points (csize) of the ray 
+    // through detector pixel d at projection angle p and points indi 
+    // and dist to its csize-1 pixel indices and intersection lengths.
+    // Without a table, the ray of the base angle is traced unless it 
+    // was the last one traced. Calling it for the angles of a group 
+    // in a row thus traces each ray only once.
+    long row;
+    int b = geo->base[p];
+
+    if (table != NULL) 
+    {
+        row = d+p*geo->dz;
+        *indi = table->indi+table->rowptr[row];
+        *dist = table->dist+table->rowptr[row];
+        return table->rowptr[row+1]-table->rowptr[row]+1;
+    }
+
+    if (tr->ray_p != b || tr->ray_d != d) 
+    {
+        trace_ray(tr, geo, b, d);
+    }
+    *dist = tr->dist;
+    if (geo->rot[p] == 0 && geo->mirror[p] == 0) 
+    {
+        *indi = tr->indi;
+    }
+    else 
+    {
+        rotate_indices(geo, geo->mirror[p], geo->rot[p], tr->ray_csize-1, 
+            tr->indi, tr->symindi);
+        *indi = tr->symindi;
+    }
+    return tr->ray_csize;
+}
@@ -65,6 +65,113 @@
 #define DLL 
 #endif
 
+// Maximum number of distinct rotation centers for which ray tables
+// are kept in memory during a single reconstruction call.
+#define MAX_RAYTABLES 16
+
+
+// Ray tracing engines. ENGINE_SORT intersects a ray with all grid 
+// lines and merges the sorted intersections. ENGINE_SIDDON walks the 
+// pixels a ray crosses from one grid line crossing to the next. 
+// ENGINE_VECTOR samples the ray once per grid column (or row) and 
+// splits the step length between the two nearest pixels (Joseph's 
+// method) in branch-free loops that the compiler vectorizes.
+#define ENGINE_SORT 0
+#define ENGINE_SIDDON 1
+#define ENGINE_VECTOR 2
+
+
+// Projection angles that differ by this much (in radians) from a 
+// symmetric angle (see geometry) are treated as symmetric.
+#define SYMMETRY_TOL 1e-6
+
+
+// Sines, cosines and quadrants of the projection angles and the ray 
+// tracing engine. Computed once per call and shared by all slices. 
+//
+// Projection angles are also grouped by symmetry. The ray through 
+// detector pixel d at angle theta+pi is the point reflection of the 
+// ray at theta about the grid center, and on square grids the ray at 
+// theta+pi/2 is its quarter turn. The ray at pi-theta is the ray at 
+// theta flipped along y, which on square grids relates theta and 
+// pi/2-theta as well. Rays of such angles are derived from the ray of 
+// the base angle of their group by mapping pixel indices. base[p] is 
+// the smallest index of the group of projection p. The ray of p is the
+// base ray flipped along y if mirror[p] is set and then turned by rot[p]
+// counterclockwise quarter turns. The projections of group g are 
+// order[groupptr[g]] to order[groupptr[g+1]-1], base first.
+//
+// A region of interest moves the grid off the rotation axis, which 
+// shifts the ray through detector pixel d at angle p by shift[p] 
+// pixels, and with radius > 0 leaves out the pixels whose centers lie
+// farther than radius from the grid center.
+
+typedef struct
+{
+    int dx, dz;
+    int ngridx, ngridy;
+    float *sin_p;
+    float *cos_p;
+    int *quadrant;
+    float *shift;
+    float radius;
+    int engine;
+    int ngroups;
+    int *groupptr;
+    int *order;
+    int *base;
+    int *rot;
+    int *mirror;
+} geometry;
+
+
+// Scratch buffers of the on-the-fly ray tracer for a single slice 
+// geometry (grid size and rotation center). The intersections of the
+// last traced ray (projection angle ray_p, detector pixel ray_d) are 
+// kept in indi and dist so that the rays of its symmetric angles can 
+// be derived from them.
+
+typedef struct
+{
+    int ngridx, ngridy, dz;
+    float mov;
+    float *gridx, *gridy;
+    float *coordx, *coordy;
+    float *ax, *ay, *bx, *by;
+    float *coorx, *coory;
+    float *dist;
+    int *indi;
+    int ray_p, ray_d, ray_csize;
+    int *symindi;
+} tracer;
+
+
+// Precomputed ray-pixel intersections of one rotation center in
+// compressed sparse row format. Row d+p*dz holds the pixel indices 
+// and intersection lengths of the ray through detector pixel d at 
+// projection angle p. A table with rowptr == NULL marks a center for
+// which the table did not fit into the memory cap.
+
+typedef struct
+{
+    float center;
+    long *rowptr;
+    int *indi;
+    float *dist;
+} raytable;
+
+
+// Ray tables of the distinct rotation centers seen in a call, 
+// bounded by a memory cap in bytes.
+
+typedef struct
+{
+    int ntables;
+    raytable tables[MAX_RAYTABLES];
+    double nbytes;
+    double maxbytes;
+} raycache;
+
 // Data simulation
 
 void 
@@ -78,7 +185,9 @@ simulate(
     int dy, 
     int dz,
     float *center,
-    float *theta);
+    float *theta,
+    int engine,
+    int ncore);
 
 // Reconstruction algorithms
 
@@ -93,7 +202,13 @@ art(
     float *recon,
     int ngridx,
     int ngridy,
-    int num_iter);
+    int num_iter,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 void 
 bart(
@@ -108,19 +223,13 @@ bart(
     int ngridy,
     int num_iter,
     int num_block,
-    float *ind_block);
-
-void 
-fbp(
-    float *data,
-    int dx, 
-    int dy, 
-    int dz,
-    float *center,
-    float *theta,
-    float *recon,
-    int ngridx,
-    int ngridy);
+    float *ind_block,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 void 
 mlem(
@@ -133,7 +242,15 @@ mlem(
     float *recon,
     int ngridx,
     int ngridy,
-    int num_iter);
+    int num_iter,
+    int num_block,
+    float *ind_block,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 void 
 osem(
@@ -148,7 +265,13 @@ osem(
     int ngridy,
     int num_iter,
     int num_block,
-    float *ind_block);
+    float *ind_block,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 void 
 ospml_hybrid(
@@ -164,7 +287,13 @@ ospml_hybrid(
     int num_iter,
     float *reg_pars,
     int num_block,
-    float *ind_block);
+    float *ind_block,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 void 
 ospml_quad(
@@ -180,7 +309,13 @@ ospml_quad(
     int num_iter,
     float *reg_pars,
     int num_block,
-    float *ind_block);
+    float *ind_block,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 void 
 pml_hybrid(
@@ -194,7 +329,13 @@ pml_hybrid(
     int ngridx,
     int ngridy,
     int num_iter,
-    float *reg_pars);
+    float *reg_pars,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 void 
 pml_quad(
@@ -208,7 +349,13 @@ pml_quad(
     int ngridx,
     int ngridy,
     int num_iter,
-    float *reg_pars);
+    float *reg_pars,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 void 
 sirt(
@@ -221,7 +368,15 @@ sirt(
     float *recon,
     int ngridx,
     int ngridy,
-    int num_iter);
+    int num_iter,
+    int num_block,
+    float *ind_block,
+    float cache_size,
+    int engine,
+    float *roi,
+    float tol,
+    float *history,
+    int ncore);
 
 // Utility functions for data simultation
 
@@ -268,6 +423,67 @@ calc_dist(
     int *indi, 
     float *dist);
 
+void 
+init_geometry(
+    geometry *geo,
+    int dx, int dz, 
+    float *theta, 
+    int ngridx, int ngridy, 
+    int engine);
+
+void 
+set_geometry_roi(
+    geometry *geo, 
+    float *roi);
+
+void 
+free_geometry(
+    geometry *geo);
+
+void 
+init_tracer(
+    tracer *tr, 
+    int ngridx, int ngridy);
+
+void 
+free_tracer(
+    tracer *tr);
+
+void 
+set_tracer_center(
+    tracer *tr, 
+    int dz, float center);
+
+int 
+trace_ray(
+    tracer *tr, geometry *geo, 
+    int p, int d);
+
+void 
+init_raycache(
+    raycache *cache, 
+    float cache_size);
+
+void 
+free_raycache(
+    raycache *cache);
+
+raytable* 
+get_raytable(
+    raycache *cache, geometry *geo, 
+    tracer *tr, float center);
+
+void 
+rotate_indices(
+    geometry *geo, int mirror, int rot, 
+    int n, int *indi, int *symindi);
+
+int 
+get_ray(
+    tracer *tr, raytable *table, geometry *geo, 
+    int p, int d, 
+    int **indi, float **dist);
+
 void 
 calc_simdata(
     int p, int s, int d, 
@@ -279,4 +495,10 @@ calc_simdata(
     float *model, 
     float *simdata);
 
+bool 
+record_iteration(
+    float *data, int dx, int dy, int dz, int s, 
+    float *simdata, float *prev, float *model, int ngrid, 
+    int i, int num_iter, float tol, float *history);
+
 #endif
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright (c) 2015, UChicago Argonne, LLC. All rights reserved.         #
+#                                                                         #
+# Copyright 2015. UChicago Argonne, LLC. This software was produced       #
+# under U.S. Government contract DE-AC02-06CH11357 for Argonne National   #
+# Laboratory (ANL), which is operated by UChicago Argonne, LLC for the    #
+# U.S. Department of Energy. The U.S. Government has rights to use,       #
+# reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR    #
+# UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR        #
+# ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is     #
+# modified to produce derivative works, such modified software should     #
+# be clearly marked, so as not to confuse it with the version available   #
+# from ANL.                                                               #
+#                                                                         #
+# Additionally, redistribution and use in source and binary forms, with   #
+# or without modification, are permitted provided that the following      #
+# conditions are met:                                                     #
+#                                                                         #
+#     * Redistributions of source code must retain the above copyright    #
+#       notice, this list of conditions and the following disclaimer.     #
+#                                                                         #
+#     * Redistributions in binary form must reproduce the above copyright #
+#       notice, this list of conditions and the following disclaimer in   #
+#       the documentation and/or other materials provided with the        #
+#       distribution.                                                     #
+#                                                                         #
+#     * Neither the name of UChicago Argonne, LLC, Argonne National       #
+#       Laboratory, ANL, the U.S. Government, nor the names of its        #
+#       contributors may be used to endorse or promote products derived   #
+#       from this software without specific prior written permission.     #
+#                                                                         #
+# THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS     #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT       #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS       #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago     #
+# Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,        #
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,    #
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;        #
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER        #
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT      #
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN       #
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE         #
+# POSSIBILITY OF SUCH DAMAGE.                                             #
+# #########################################################################
+
+from __future__ import absolute_import, division, print_function
+
+import tomopy.extern as extern
+from tomopy.recon import sirt
+import numpy as np
+from multiprocessing.pool import ThreadPool
+from contextlib import closing
+from nose.tools import assert_equals, assert_raises
+from numpy.testing import assert_array_almost_equal
+
+
+__author__ = "Doga Gursoy"
+__copyright__ = "Copyright (c) 2015, UChicago Argonne, LLC."
+__docformat__ = 'restructuredtext en'
+
+
+def test_lib_tomopy():
+    assert_equals(extern.LIB_TOMOPY is None, False)
+    assert_equals(extern.LIB_TOMOPY.sirt.restype, None)
+
+
+def test_check_shapes():
+    arr = np.ones((3, 4, 5), dtype='float32')
+    assert_raises(ValueError, extern.c_correct_air, arr[:, :, ::2], 1)
+    assert_raises(ValueError, extern.c_correct_air, arr, 6)
+    assert_raises(
+        ValueError, extern.c_apply_padding, arr,
+        np.zeros((3, 4, 4), dtype='float32'))
+    assert_raises(
+        ValueError, extern.c_downsample, arr, 2, False,
+        np.zeros((3, 4, 3), dtype='float32'), 1)
+    assert_raises(
+        ValueError, extern.c_recon, 'unknown', arr, None, None, None, (), 1)
+    assert_raises(ValueError, sirt, arr, theta=(0., 1.))
+
+
+def test_threads():
+    data = np.random.rand(8, 4, 10).astype('float32')
+    theta = np.linspace(0, np.pi, 8)
+    ref = sirt(data, theta, num_iter=2, ncore=1)
+    with closing(ThreadPool(4)) as pool:
+        out = pool.map(
+            lambda k: sirt(data, theta, num_iter=2, ncore=1), range(8))
+    for rec in out:
+        assert_array_almost_equal(rec, ref)
+
+
+if __name__ == '__main__':
+    import nose
+    nose.runmodule(exit=False)
@@ -51,12 +51,12 @@ from __future__ import absolute_import, division, print_function
 from tomopy.io.data import *
 from tomopy.io.data import (
     _add_index_to_string, _suggest_new_fname,
-    _as_uint8, _as_uint16, _as_float32)
+    _as_uint8, _as_uint16, _as_float32, _copy_float32, _out_float32)
 import numpy as np
 import os
 import shutil
 import h5py
-from nose.tools import assert_equals
+from nose.tools import assert_equals, assert_raises
 
 
 __author__ = "Doga Gursoy"
@@ -84,10 +84,39 @@ def test_as_uint16():
     assert_equals((out == [0, 21845, 43690, 65535, 65535]).all(), True)
 
 
+def test_as_float32():
+    arr = np.ones((3, 4), dtype='float32')
+    assert_equals(_as_float32(arr) is arr, True)
+    out = _as_float32(arr.T)
+    assert_equals(out.flags.c_contiguous, True)
+    out = _as_float32(np.ones((3, 4), dtype='float64'))
+    assert_equals(out.dtype, 'float32')
+
+
+def test_copy_float32():
+    arr = np.ones((3, 4), dtype='float32')
+    out = _copy_float32(arr)
+    assert_equals(out is arr, False)
+    assert_equals(_copy_float32(arr, out=arr) is arr, True)
+    out = np.zeros((3, 4), dtype='float32')
+    assert_equals(_copy_float32(arr.astype('float64'), out=out) is out, True)
+    assert_equals((out == 1).all(), True)
+
+
+def test_out_float32():
+    assert_equals(_out_float32(None, (3, 4)).shape, (3, 4))
+    out = np.empty((3, 4), dtype='float32')
+    assert_equals(_out_float32(out, (3, 4)) is out, True)
+    assert_raises(ValueError, _out_float32, out, (4, 3))
+    assert_raises(ValueError, _out_float32, out.T, (4, 3))
+    assert_raises(ValueError, _out_float32, out.astype('float64'), (3, 4))
+
+
 def test_remove_neg():
     arr = np.arange(-2, 2, dtype='float32')
     out = remove_neg(arr)
     assert_equals(out[out < 0].size, 0)
+    assert_equals(arr[arr < 0].size, 2)
 
 
 def test_remove_nan():
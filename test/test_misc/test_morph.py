@@ -51,6 +51,7 @@ from __future__ import absolute_import, division, print_function
 from tomopy.misc.morph import *
 import numpy as np
 from nose.tools import assert_equals
+from numpy.testing import assert_array_almost_equal
 
 
 def synthetic_data():
@@ -77,6 +78,41 @@ def test_apply_pad():
     out = apply_pad(synthetic_data())
     assert_equals(out.shape, (3, 4, 6))
     assert_equals(np.isnan(out).sum(), 0)
+    res = np.empty((3, 4, 6), dtype='float32')
+    assert_equals(apply_pad(synthetic_data(), out=res) is res, True)
+    assert_array_almost_equal(res, out)
+
+
+def test_downsample():
+    data = synthetic_data()
+    out = downsample(data, level=1)
+    assert_array_almost_equal(out, data.reshape(3, 4, 2, 2).mean(axis=3))
+    out = downsample(data, level=1, axis=0)
+    assert_array_almost_equal(out[0], data[0:2].mean(axis=0))
+    out = downsample(data, level=1, axis=(1, 2))
+    assert_array_almost_equal(
+        out, data.reshape(3, 2, 2, 2, 2).mean(axis=(2, 4)))
+
+
+def test_downsample_ragged():
+    data = synthetic_data()
+    out = downsample(data, binsize=3, ragged=True)
+    assert_equals(out.shape, (3, 4, 2))
+    assert_array_almost_equal(out[:, :, 0], data[:, :, 0:3].mean(axis=2))
+    assert_array_almost_equal(out[:, :, 1], data[:, :, 3])
+    res = np.empty((1, 4, 4), dtype='float32')
+    out = downsample(data, binsize=3, axis=0, out=res)
+    assert_equals(out is res, True)
+    assert_array_almost_equal(res[0], data.mean(axis=0))
+
+
+def test_upsample():
+    data = synthetic_data()
+    out = upsample(data, level=1)
+    assert_array_almost_equal(out, data.repeat(2, axis=1).repeat(2, axis=2))
+    out = upsample(data, level=1, axis=(0, 1, 2))
+    assert_equals(out.shape, (6, 8, 8))
+    assert_array_almost_equal(downsample(out, level=1, axis=0), out[::2])
 
 
 def test_focus_region():
@@ -51,7 +51,9 @@ from __future__ import absolute_import, division, print_function
 from tomopy.misc.mproc import *
 import tomopy.misc.mproc as mp
 import numpy as np
-from nose.tools import assert_equals
+import os
+import shutil
+from nose.tools import assert_equals, assert_raises
 from numpy.testing import assert_array_almost_equal
 
 
@@ -93,6 +95,73 @@ def test_distribute_jobs():
     assert_array_almost_equal(out, np.ones((3, 4, 5)))
 
 
+def test_worker_pool():
+    with WorkerPool(ncore=2) as pool:
+        data = np.zeros((6, 4, 5))
+        out = distribute_jobs(data, synthetic_func, [3.], 0, pool=pool)
+        assert_array_almost_equal(out, 3 * np.ones((6, 4, 5)))
+        assert_array_almost_equal(data, np.zeros((6, 4, 5)))
+        res = distribute_jobs(out, synthetic_func, [4.], 0, pool=pool)
+        assert_equals(res is out, True)
+        assert_array_almost_equal(out, 4 * np.ones((6, 4, 5)))
+
+
+def test_shared_array():
+    arr = shared_array((3, 4, 5))
+    arr[:] = synthetic_data()
+    out = distribute_jobs(arr, synthetic_func, [2.], 0, ncore=2)
+    assert_equals(out is arr, True)
+    assert_array_almost_equal(arr, 2 * np.ones((3, 4, 5)))
+    view = arr[1:, 1:3]
+    out = distribute_jobs(view, synthetic_func, [5.], 0, ncore=2)
+    assert_equals(out is view, True)
+    assert_array_almost_equal(arr[1:, 1:3], 5 * np.ones((2, 2, 5)))
+    assert_array_almost_equal(arr[0], 2 * np.ones((4, 5)))
+
+
+def test_shared_array_fallback():
+    statvfs = os.statvfs
+
+    class _Full(object):
+        f_bavail = 0
+        f_frsize = 4096
+
+    def _statvfs(path):
+        if path == mp._SHM_DIR:
+            return _Full()
+        return statvfs(path)
+
+    shm_dir = mp._SHM_DIR
+    mp._SHM_DIR = os.path.join('test', 'shm')
+    try:
+        os.statvfs = _statvfs
+        arr = shared_array((3, 4, 5))
+        assert_equals(
+            os.path.dirname(arr.filename), os.path.abspath(
+                mp.tempfile.gettempdir()))
+        del arr
+        os.statvfs = lambda path: _Full()
+        assert_raises(MemoryError, shared_array, (3, 4, 5))
+    finally:
+        os.statvfs = statvfs
+        mp._SHM_DIR = shm_dir
+
+
+def test_shared_array_file():
+    dest = os.path.join('test', 'tmp')
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    os.mkdir(dest)
+    fname = os.path.join(dest, 'tmp.dat')
+    arr = shared_array((3, 4, 5), fname=fname)
+    distribute_jobs(arr, synthetic_func, [2.], 0, ncore=2)
+    arr.flush()
+    out = np.fromfile(fname, dtype='float32').reshape(3, 4, 5)
+    assert_array_almost_equal(out, 2 * np.ones((3, 4, 5)))
+    del arr
+    shutil.rmtree(dest)
+
+
 if __name__ == '__main__':
     import nose
     nose.runmodule(exit=False)
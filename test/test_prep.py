@@ -49,6 +49,7 @@
 from __future__ import absolute_import, division, print_function
 
 from tomopy.prep import *
+from tomopy.misc.mproc import WorkerPool
 import numpy as np
 from nose.tools import assert_equals
 from numpy.testing import assert_array_almost_equal
@@ -198,10 +199,23 @@ def test_remove_zinger():
     assert_equals(np.isnan(out).sum(), 0)
 
 
+def test_worker_pool():
+    data = synthetic_data()
+    ref = remove_zinger(median_filter(data), dif=10)
+    with WorkerPool(ncore=2) as pool:
+        out = median_filter(data, pool=pool)
+        out = remove_zinger(out, dif=10, pool=pool)
+        assert_array_almost_equal(out, ref)
+
+
 def test_correct_air():
     out = correct_air(synthetic_data())
     assert_equals(out.shape, (3, 4, 5))
     assert_equals(np.isnan(out).sum(), 0)
+    out = correct_air(synthetic_data(), air=2)
+    data = synthetic_data()
+    assert_equals(correct_air(data, air=2, out=data) is data, True)
+    assert_equals((data == out).all(), True)
 
 
 if __name__ == '__main__':
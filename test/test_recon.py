@@ -49,10 +49,15 @@
 from __future__ import absolute_import, division, print_function
 
 from tomopy.recon import *
+import tomopy.recon as recon
 import numpy as np
 import os
 import shutil
-from nose.tools import assert_equals
+import subprocess
+import sys
+from nose import SkipTest
+from nose.tools import assert_equals, assert_raises
+from numpy.testing import assert_array_almost_equal, assert_allclose
 
 
 __author__ = "Doga Gursoy"
@@ -86,75 +91,464 @@ def test_simulate():
     assert_equals(np.isnan(out).sum(), 0)
 
 
+def test_simulate_symmetric_angles():
+    obj = synthetic_data()[:, :, 0:4]
+    theta = np.array([0.3, 0.3 + np.pi / 2, 0.3 + np.pi], dtype='float32')
+    out = simulate(obj, theta)
+    half = simulate(obj[:, ::-1, ::-1], theta[0:1])
+    quarter = simulate(
+        np.ascontiguousarray(np.rot90(obj, -1, axes=(1, 2))), theta[0:1])
+    assert_array_almost_equal(out[2], half[0], decimal=4)
+    assert_array_almost_equal(out[1], quarter[0], decimal=4)
+
+
+def test_simulate_siddon():
+    obj = np.ones((1, 4, 4), dtype='float32')
+    out = simulate(obj, theta=(0., np.pi / 2), engine='siddon')
+    assert_array_almost_equal(out[0, 0], [0., 4., 4., 4., 4., 0.])
+    assert_array_almost_equal(out[1, 0], [0., 4., 4., 4., 4., 0.])
+
+
+def test_simulate_siddon_agrees_with_sort():
+    theta = (0., 1., 2.)
+    out = simulate(synthetic_data(), theta)
+    sid = simulate(synthetic_data(), theta, engine='siddon')
+    assert_allclose(sid.sum(axis=2), out.sum(axis=2), rtol=1e-2)
+
+
+def test_sirt_siddon_agrees_with_sort():
+    theta = (0., 1., 2.)
+    out = sirt(synthetic_data(), theta, num_iter=2)
+    sid = sirt(synthetic_data(), theta, num_iter=2, engine='siddon')
+    assert_allclose(sid, out, atol=0.1 * np.abs(out).max())
+
+
+def test_simulate_vector():
+    theta = (0., 1., 2.)
+    obj = synthetic_data()
+    out = simulate(obj, theta, engine='vector')
+    mass = obj.sum(axis=(1, 2))
+    assert_allclose(out.sum(axis=2), np.tile(mass, (3, 1)), rtol=2e-2)
+
+
+def test_sirt_vector_agrees_with_siddon():
+    obj = np.zeros((1, 16, 16), dtype='float32')
+    obj[0, 4:12, 5:11] = 1.
+    theta = np.linspace(0, np.pi, 20, endpoint=False)
+    data = simulate(obj, theta, engine='siddon')
+    out = sirt(data, theta, num_iter=5, engine='siddon')
+    vec = sirt(data, theta, num_iter=5, engine='vector')
+    assert_allclose(vec, out, atol=0.2 * np.abs(out).max())
+
+
+def test_simulate_mirrored_angles():
+    obj = synthetic_data()[:, :, 0:4]
+    for grid in (obj, obj[:, :, 0:3]):
+        grid = np.ascontiguousarray(grid)
+        theta = np.array(
+            [0.3, np.pi / 2 - 0.3, np.pi - 0.3, 1.5 * np.pi - 0.3],
+            dtype='float32')
+        for engine in ('siddon', 'vector'):
+            out = simulate(grid, theta, engine=engine)
+            for p in range(theta.size):
+                ref = simulate(grid, theta[p:p + 1], engine=engine)
+                assert_array_almost_equal(out[p], ref[0], decimal=4)
+
+
 def test_gridrec():
-    out = gridrec(synthetic_data(), theta=(0., 1.))
+    out = gridrec(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_art():
-    out = art(synthetic_data(), theta=(0., 1.))
+    out = art(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_bart():
-    out = bart(synthetic_data(), theta=(0., 1.))
+    out = bart(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_fbp():
-    out = fbp(synthetic_data(), theta=(0., 1.))
+    out = fbp(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
+def test_fbp_disk():
+    n = 32
+    y, x = np.mgrid[0:n, 0:n] - n / 2. + 0.5
+    obj = np.zeros((1, n, n), dtype='float32')
+    obj[0, x * x + y * y < 10 ** 2] = 1.
+    theta = np.linspace(0, np.pi, 90, endpoint=False)
+    data = simulate(obj, theta, engine='siddon')
+    out = fbp(data, theta, num_gridx=n, num_gridy=n)
+    assert_allclose(out[0, 12:20, 12:20], 1., atol=0.05)
+    assert_allclose(out[0, 0:4, 0:4], 0., atol=0.05)
+
+
+def test_fbp_filter_name():
+    theta = (0., 1., 2.)
+    out = fbp(synthetic_data(), theta, filter_name='ramlak')
+    hann = fbp(synthetic_data(), theta, filter_name='hann')
+    assert_equals(np.allclose(out, hann), False)
+
+
+def test_fbp_ncore():
+    theta = (0., 1., 2.)
+    out = fbp(synthetic_data(), theta, ncore=1)
+    par = fbp(synthetic_data(), theta, ncore=3, nchunk=1)
+    assert_array_almost_equal(out, par)
+
+
 def test_mlem():
-    out = mlem(synthetic_data(), theta=(0., 1.))
+    out = mlem(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_osem():
-    out = osem(synthetic_data(), theta=(0., 1.))
+    out = osem(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_ospml_hybrid():
-    out = ospml_hybrid(synthetic_data(), theta=(0., 1.))
+    out = ospml_hybrid(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_ospml_quad():
-    out = ospml_quad(synthetic_data(), theta=(0., 1.))
+    out = ospml_quad(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_pml_hybrid():
-    out = pml_hybrid(synthetic_data(), theta=(0., 1.))
+    out = pml_hybrid(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_pml_quad():
-    out = pml_quad(synthetic_data(), theta=(0., 1.))
+    out = pml_quad(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
 def test_sirt():
-    out = sirt(synthetic_data(), theta=(0., 1.))
+    out = sirt(synthetic_data(), theta=(0., 1., 2.))
     assert_equals(out.shape, (4, 5, 5))
     assert_equals(np.isnan(out).sum(), 0)
 
 
+def test_sirt_ordered_subsets():
+    obj = np.zeros((1, 16, 16), dtype='float32')
+    obj[0, 4:12, 5:11] = 1.
+    theta = np.linspace(0, np.pi, 20, endpoint=False)
+    data = simulate(obj, theta)
+    out = sirt(data, theta, num_iter=2, num_gridx=16, num_gridy=16)
+    sub = sirt(
+        data, theta, num_iter=2, num_gridx=16, num_gridy=16,
+        num_block=5, ind_block='bitrev')
+    res = np.linalg.norm(simulate(out, theta) - data)
+    sub_res = np.linalg.norm(simulate(sub, theta) - data)
+    assert_equals(sub_res < 0.5 * res, True)
+
+
+def test_mlem_ordered_subsets():
+    theta = (0., 1., 2.)
+    out = osem(synthetic_data(), theta, num_iter=2, num_block=3)
+    sub = mlem(synthetic_data(), theta, num_iter=2, num_block=3)
+    assert_array_almost_equal(out, sub)
+    sub = mlem(
+        synthetic_data(), theta, num_iter=2, num_block=2,
+        ind_block='golden')
+    assert_equals(np.isnan(sub).sum(), 0)
+
+
+def test_sirt_history():
+    obj = np.zeros((2, 16, 16), dtype='float32')
+    obj[:, 4:12, 5:11] = 1.
+    theta = np.linspace(0, np.pi, 20, endpoint=False)
+    data = simulate(obj, theta)
+    out, hist = sirt(
+        data, theta, num_iter=10, num_gridx=16, num_gridy=16,
+        return_history=True)
+    assert_equals(hist.shape, (2, 10, 2))
+    assert_equals(np.isnan(hist).sum(), 0)
+    assert_equals(hist[0, -1, 0] < hist[0, 1, 0], True)
+    tol = 0.5 * (hist[0, 3, 1] + hist[0, 4, 1])
+    early, hist = sirt(
+        data, theta, num_iter=10, num_gridx=16, num_gridy=16,
+        tol=tol, nchunk=1, return_history=True)
+    assert_equals(np.isnan(hist[:, :5]).sum(), 0)
+    assert_equals(np.isnan(hist[:, 5:]).all(), True)
+    ref = sirt(data, theta, num_iter=5, num_gridx=16, num_gridy=16)
+    assert_array_almost_equal(early, ref)
+
+
+def test_pml_hybrid_resume():
+    dpath = os.path.join('test', 'tmp')
+    if not os.path.exists(dpath):
+        os.makedirs(dpath)
+    fname = os.path.join(dpath, 'checkpoint.h5')
+    theta = (0., 1., 2.)
+    out, hist = pml_hybrid(
+        synthetic_data(), theta, num_iter=5, return_history=True)
+    part = pml_hybrid(
+        synthetic_data(), theta, num_iter=3, checkpoint=fname,
+        checkpoint_every=2)
+    assert_array_almost_equal(
+        part, pml_hybrid(synthetic_data(), theta, num_iter=3))
+    res, res_hist = resume(
+        fname, synthetic_data(), theta, num_iter=5, return_history=True)
+    assert_array_almost_equal(res, out)
+    assert_array_almost_equal(res_hist, hist)
+    shutil.rmtree(dpath)
+
+
+def test_multires():
+    obj = np.zeros((1, 16, 16), dtype='float32')
+    obj[0, 4:12, 5:11] = 1.
+    theta = np.linspace(0, np.pi, 20, endpoint=False)
+    data = simulate(obj, theta)
+    dz = data.shape[2]
+    out = multires(data, theta, 'sirt', level=1, num_iter=[5, 1])
+    assert_equals(out.shape, (1, dz, dz))
+    ref = sirt(data, theta, num_iter=3)
+    o = (dz - 16) // 2
+    err = np.linalg.norm(out[:, o:o + 16, o:o + 16] - obj)
+    ref_err = np.linalg.norm(ref[:, o:o + 16, o:o + 16] - obj)
+    assert_equals(err < ref_err, True)
+    assert_raises(
+        ValueError, multires, data, theta, 'gridrec', level=1)
+
+
+def test_sirt_roi():
+    obj = np.zeros((1, 32, 32), dtype='float32')
+    obj[0, 18:24, 8:14] = 2.
+    theta = np.linspace(0, np.pi, 40, endpoint=False)
+    data = simulate(obj, theta)
+    o = (data.shape[2] - 32) // 2
+    full = sirt(data, theta, num_iter=10)
+    out = sirt(data, theta, num_iter=10, roi=(o + 16, o + 6, 10, 10))
+    assert_equals(out.shape, (1, 10, 10))
+    err = np.abs(out - obj[:, 16:26, 6:16]).mean()
+    full = full[:, o + 16:o + 26, o + 6:o + 16]
+    assert_equals(err < np.abs(full - obj[:, 16:26, 6:16]).mean(), True)
+    out = sirt(data, theta, num_iter=10, roi=(o + 21, o + 11, 5))
+    assert_equals(out.shape, (1, 10, 10))
+    assert_allclose(out[0, 5, 5], 2., atol=0.2)
+
+
+def test_sirt_roi_outer():
+    obj = np.zeros((1, 32, 32), dtype='float32')
+    obj[0, 4:28, 4:28] = 1.
+    obj[0, 18:24, 8:14] = 2.
+    theta = np.linspace(0, np.pi, 40, endpoint=False)
+    data = simulate(obj, theta)
+    o = (data.shape[2] - 32) // 2
+    roi = (o + 16, o + 6, 10, 10)
+    out = sirt(data, theta, num_iter=10, roi=roi)
+    err = np.abs(out - obj[:, 16:26, 6:16]).mean()
+    out = sirt(data, theta, num_iter=10, roi=roi, roi_outer=2)
+    outer_err = np.abs(out - obj[:, 16:26, 6:16]).mean()
+    assert_equals(outer_err < 0.25 * err, True)
+
+
+def test_block_orders():
+    theta = np.linspace(0, np.pi, 8, endpoint=False)
+    out = recon._block_order('bitrev', theta, 8)
+    assert_array_almost_equal(out, [0, 4, 2, 6, 1, 5, 3, 7])
+    out = recon._block_order('bitrev', theta[::-1], 8)
+    assert_array_almost_equal(out, [7, 3, 5, 1, 6, 2, 4, 0])
+    out = recon._block_order('golden', theta[0:5], 5)
+    assert_array_almost_equal(out, [0, 3, 1, 4, 2])
+    assert_raises(
+        ValueError, sirt, synthetic_data(), (0., 1., 2.), ind_block='x')
+
+
+def test_sirt_cache_size():
+    theta = (0., 1., 2.)
+    out = sirt(synthetic_data(), theta, num_iter=2)
+    cached = sirt(synthetic_data(), theta, num_iter=2, cache_size=1.)
+    assert_array_almost_equal(out, cached)
+
+
+def test_mlem_cache_size_fallback():
+    theta = (0., 1., 2.)
+    out = mlem(synthetic_data(), theta, num_iter=2)
+    capped = mlem(
+        synthetic_data(), theta, num_iter=2, cache_size=1e-5)
+    assert_array_almost_equal(out, capped)
+
+
+def test_pml_hybrid_ncore():
+    theta = (0., 1., 2.)
+    out = pml_hybrid(synthetic_data(), theta, num_iter=2, ncore=1)
+    par = pml_hybrid(synthetic_data(), theta, num_iter=2, ncore=3)
+    assert_array_almost_equal(out, par)
+
+
+def test_sirt_nchunk():
+    theta = (0., 1., 2.)
+    out = sirt(synthetic_data(), theta, num_iter=2)
+    par = sirt(synthetic_data(), theta, num_iter=2, nchunk=1)
+    assert_array_almost_equal(out, par)
+
+
+def test_gridrec_nchunk():
+    theta = (0., 1., 2.)
+    data = np.append(synthetic_data(), synthetic_data(), 1)
+    out = gridrec(data, theta, nchunk=8)
+    par = gridrec(data, theta, ncore=2, nchunk=3)
+    assert_array_almost_equal(out, par)
+
+
+def test_gridrec_ncore():
+    theta = (0., 1., 2.)
+    data = np.append(synthetic_data(), synthetic_data(), 1)
+    out = gridrec(data, theta, ncore=1)
+    par = gridrec(data, theta, ncore=3)
+    assert_array_almost_equal(out, par)
+
+
+def test_gridrec_plan_reuse():
+    theta = (0., 1., 2.)
+    out = gridrec(synthetic_data(), theta)
+    gridrec(np.ones((3, 2, 20), dtype='float32'), theta)
+    again = gridrec(synthetic_data(), theta)
+    assert_array_almost_equal(out, again)
+
+
+def test_gridrec_plan():
+    theta = (0., 1., 2.)
+    center = (2., 2.5, 2.5, 3.)
+    out = gridrec(synthetic_data(), theta, center=center)
+    plan = GridrecPlan(theta, 5)
+    assert_array_almost_equal(plan.execute(synthetic_data(), center), out)
+    assert_array_almost_equal(plan.execute(synthetic_data(), center), out)
+
+
+def test_gridrec_plan_sweep():
+    theta = (0., 1., 2.)
+    center = (2., 2.5, 3.)
+    plan = GridrecPlan(theta, 5)
+    out = plan.sweep(synthetic_data()[:, 1, :], center)
+    assert_equals(out.shape, (3, 5, 5))
+    for m in range(3):
+        rec = gridrec(synthetic_data()[:, 1:2, :], theta, center=center[m])
+        assert_array_almost_equal(out[m], rec[0], decimal=4)
+
+
+def test_gridrec_plan_threads():
+    theta = np.linspace(0, np.pi, 20, endpoint=False)
+    tomo = np.random.RandomState(0).rand(20, 80, 32).astype('float32')
+    center = np.linspace(14., 18., 80)
+    plan = GridrecPlan(theta, 32)
+    ref = plan.execute(tomo, center, ncore=1)
+    for _ in range(3):
+        out = plan.execute(tomo, center, ncore=8, nchunk=2)
+        assert_array_almost_equal(out, ref)
+
+
+def test_gridrec_plan_shape_mismatch():
+    plan = GridrecPlan((0., 1.), 5)
+    assert_raises(ValueError, plan.execute, synthetic_data())
+
+
+def test_gridrec_odd_slices():
+    theta = (0., 1., 2.)
+    out = gridrec(synthetic_data()[:, 0:3], theta)
+    assert_equals(out.shape, (3, 5, 5))
+    assert_equals((out[2] == 1e-6).all(), False)
+
+
+_PEAK_MEMORY_SCRIPT = """
+import resource
+import sys
+import numpy as np
+from tomopy.recon import sirt
+
+unit = 1 if sys.platform == 'darwin' else 1024
+tomo = np.ones((1000, 100, 64), dtype='float32')
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+sirt(tomo, np.linspace(0, np.pi, 1000), num_gridx=8, num_gridy=8)
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+print(after - before, tomo.nbytes)
+"""
+
+
+def test_sirt_peak_memory():
+    try:
+        import resource
+    except ImportError:
+        raise SkipTest('resource module is not available')
+
+    # The peak resident size of the test process says nothing about a
+    # single call, so the reconstruction runs in a fresh interpreter.
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    out = subprocess.check_output(
+        [sys.executable, '-c', _PEAK_MEMORY_SCRIPT], env=env)
+    growth, nbytes = [int(v) for v in out.split()[-2:]]
+
+    # The wrapper copies the data once. Simulated data must not need
+    # another volume of that size.
+    assert growth < 1.5 * nbytes
+
+
+def test_find_center():
+    obj = np.zeros((1, 32, 32), dtype='float32')
+    obj[:, 10:20, 12:22] = 1
+    theta = np.linspace(0, np.pi, 45, endpoint=False)
+    tomo = np.exp(-simulate(obj, theta, center=17.))
+    center = find_center(tomo, theta, init=16., emission=False)
+    assert_equals(isinstance(center, float), True)
+    assert_allclose(center, 17., atol=1.)
+    assert_equals(find_center(
+        tomo, theta, init=16., emission=False), center)
+
+
+def test_find_center_pc():
+    u = np.arange(64.) + 0.5
+    theta = (0., np.pi / 2, np.pi)
+    tomo = np.zeros((3, 3, 64), dtype='float32')
+    for m, center in enumerate((30., 31.3, 33.6)):
+        t = u - center
+        tomo[0, m] = np.exp(-(t - 7) ** 2 / 30.) + np.exp(-(t + 9) ** 2 / 8.)
+        tomo[2, m] = np.exp(-(t + 7) ** 2 / 30.) + np.exp(-(t - 9) ** 2 / 8.)
+    assert_allclose(find_center_pc(tomo, theta, ind=1, tol=0.1), 31.3)
+    out = find_center_pc(tomo, theta, ind=[0, 1, 2], tol=0.1)
+    assert_allclose(out, [30., 31.3, 33.6], atol=1e-6)
+    assert_raises(ValueError, find_center_pc, tomo, theta[0:2])
+
+
+def test_find_center_line():
+    u = np.arange(64.) + 0.5
+    theta = (0., np.pi / 2, np.pi)
+    center = 30. + 0.1 * np.arange(8)
+    tomo = np.zeros((3, 8, 64), dtype='float32')
+    for m in range(8):
+        t = u - center[m]
+        tomo[0, m] = np.exp(-(t - 7) ** 2 / 30.) + np.exp(-(t + 9) ** 2 / 8.)
+        tomo[2, m] = np.exp(-(t + 7) ** 2 / 30.) + np.exp(-(t - 9) ** 2 / 8.)
+    tomo[:, 3] = 1.
+    out = find_center_line(tomo, theta, method='pc', tol=0.05)
+    assert_equals(out.shape, (8,))
+    assert_allclose(out, center, atol=1e-6)
+    assert_raises(ValueError, find_center_line, tomo, theta, method='x')
+
+
 def test_write_center():
     dpath = os.path.join('test', 'tmp')
-    write_center(synthetic_data(), [0., 1.], dpath, center=[3, 5, 0.5])
+    write_center(synthetic_data(), [0., 1., 2.], dpath, center=[3, 5, 0.5])
     assert_equals(os.path.isfile(os.path.join(dpath, '3.00.tiff')), True)
     assert_equals(os.path.isfile(os.path.join(dpath, '3.50.tiff')), True)
     assert_equals(os.path.isfile(os.path.join(dpath, '4.00.tiff')), True)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# #########################################################################
+# Copyright (c) 2015, UChicago Argonne, LLC. All rights reserved.         #
+#                                                                         #
+# Copyright 2015. UChicago Argonne, LLC. This software was produced       #
+# under U.S. Government contract DE-AC02-06CH11357 for Argonne National   #
+# Laboratory (ANL), which is operated by UChicago Argonne, LLC for the    #
+# U.S. Department of Energy. The U.S. Government has rights to use,       #
+# reproduce, and distribute this software.  NEITHER THE GOVERNMENT NOR    #
+# UChicago Argonne, LLC MAKES ANY WARRANTY, EXPRESS OR IMPLIED, OR        #
+# ASSUMES ANY LIABILITY FOR THE USE OF THIS SOFTWARE.  If software is     #
+# modified to produce derivative works, such modified software should     #
+# be clearly marked, so as not to confuse it with the version available   #
+# from ANL.                                                               #
+#                                                                         #
+# Additionally, redistribution and use in source and binary forms, with   #
+# or without modification, are permitted provided that the following      #
+# conditions are met:                                                     #
+#                                                                         #
+#     * Redistributions of source code must retain the above copyright    #
+#       notice, this list of conditions and the following disclaimer.     #
+#                                                                         #
+#     * Redistributions in binary form must reproduce the above copyright #
+#       notice, this list of conditions and the following disclaimer in   #
+#       the documentation and/or other materials provided with the        #
+#       distribution.                                                     #
+#                                                                         #
+#     * Neither the name of UChicago Argonne, LLC, Argonne National       #
+#       Laboratory, ANL, the U.S. Government, nor the names of its        #
+#       contributors may be used to endorse or promote products derived   #
+#       from this software without specific prior written permission.     #
+#                                                                         #
+# THIS SOFTWARE IS PROVIDED BY UChicago Argonne, LLC AND CONTRIBUTORS     #
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT       #
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS       #
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL UChicago     #
+# Argonne, LLC OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,        #
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,    #
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;        #
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER        #
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT      #
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN       #
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE         #
+# POSSIBILITY OF SUCH DAMAGE.                                             #
+# #########################################################################
+
+"""
+Module for the bindings of the C library.
+
+The library is loaded once, from the ``lib`` directory next to the
+package, and the argument and result types of each of its entry points
+are declared here at import. The functions below check the shapes of
+the arrays they are given before calling into the library, and never
+modify the ctypes function objects, so they can be called from any
+number of threads.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import numpy as np
+import ctypes
+import os
+import sysconfig
+import logging
+logger = logging.getLogger(__name__)
+
+
+__author__ = "Doga Gursoy"
+__copyright__ = "Copyright (c) 2015, UChicago Argonne, LLC."
+__docformat__ = 'restructuredtext en'
+__all__ = []
+
+
+class _FloatArray(object):
+    """
+    Argument type of C-contiguous float32 arrays, passed as pointers to
+    their first value. None is passed as a null pointer.
+    """
+
+    @classmethod
+    def from_param(cls, arr):
+        if arr is None:
+            return None
+        if (not isinstance(arr, np.ndarray) or arr.dtype != np.float32 or
+                not arr.flags.c_contiguous):
+            raise TypeError('Expected a C-contiguous float32 array.')
+        return ctypes.c_void_p(arr.ctypes.data)
+
+
+class _String(object):
+    """
+    Argument type of null-terminated strings, passed as bytes.
+    """
+
+    @classmethod
+    def from_param(cls, name):
+        if not isinstance(name, bytes):
+            name = name.encode('ascii')
+        return ctypes.c_char_p(name)
+
+
+def _import_shared_lib(lib_name):
+    """
+    Get the path and import the C-shared library.
+
+    The ``lib`` directory next to the package is searched first, then
+    the one in the working directory.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    suffix = sysconfig.get_config_var('EXT_SUFFIX')
+    if suffix is None:
+        suffix = sysconfig.get_config_var('SO')
+    ext = '.pyd' if os.name == 'nt' else '.so'
+    for path in (root, os.getcwd()):
+        for name in (lib_name + suffix, lib_name + ext):
+            libpath = os.path.join(path, 'lib', name)
+            if os.path.isfile(libpath):
+                try:
+                    return ctypes.CDLL(libpath)
+                except OSError:
+                    pass
+    logger.warning('OSError: Shared library missing.')
+
+
+LIB_TOMOPY = _import_shared_lib('libtomopy')
+
+_i = ctypes.c_int
+_f = ctypes.c_float
+_fp = _FloatArray
+
+# Arguments of the reconstruction functions after the data, geometry
+# and reconstruction grid, which are common to all of them.
+_RECON_ARGS = {
+    'gridrec': [_String, _i],
+    'fbp': [_String, _i],
+    'art': [_i, _f, _i, _fp, _f, _fp, _i],
+    'bart': [_i, _i, _fp, _f, _i, _fp, _f, _fp, _i],
+    'mlem': [_i, _i, _fp, _f, _i, _fp, _f, _fp, _i],
+    'osem': [_i, _i, _fp, _f, _i, _fp, _f, _fp, _i],
+    'ospml_hybrid': [_i, _fp, _i, _fp, _f, _i, _fp, _f, _fp, _i],
+    'ospml_quad': [_i, _fp, _i, _fp, _f, _i, _fp, _f, _fp, _i],
+    'pml_hybrid': [_i, _fp, _f, _i, _fp, _f, _fp, _i],
+    'pml_quad': [_i, _fp, _f, _i, _fp, _f, _fp, _i],
+    'sirt': [_i, _i, _fp, _f, _i, _fp, _f, _fp, _i]}
+
+_PROTOTYPES = {
+    'simulate': [_fp, _i, _i, _i, _fp, _i, _i, _i, _fp, _fp, _i, _i],
+    'gridrec_create_plan': [_i, _i, _fp, _i, _i, _String],
+    'gridrec_execute': [ctypes.c_void_p, _fp, _i, _fp, _fp, _i],
+    'gridrec_sweep': [ctypes.c_void_p, _fp, _i, _fp, _fp, _i],
+    'gridrec_destroy_plan': [ctypes.c_void_p],
+    'correct_air': [_fp, _i, _i, _i, _i],
+    'apply_padding': [_fp, _i, _i, _i, _i, _fp],
+    'downsample2d': [_fp, _i, _i, _i, _i, _i, _fp, _i],
+    'downsample3d': [_fp, _i, _i, _i, _i, _i, _fp, _i],
+    'upsample2d': [_fp, _i, _i, _i, _i, _fp, _i],
+    'upsample3d': [_fp, _i, _i, _i, _i, _fp, _i]}
+for _name, _args in _RECON_ARGS.items():
+    _PROTOTYPES[_name] = [_fp, _i, _i, _i, _fp, _fp, _fp, _i, _i] + _args
+
+if LIB_TOMOPY is not None:
+    for _name, _args in _PROTOTYPES.items():
+        _func = getattr(LIB_TOMOPY, _name)
+        _func.argtypes = _args
+        _func.restype = None
+    LIB_TOMOPY.gridrec_create_plan.restype = ctypes.c_void_p
+
+
+def _check(arr, name, shape):
+    """
+    Raise a ValueError unless ``arr`` is a C-contiguous float32 array of
+    the given shape, where None matches any length.
+    """
+    if (not isinstance(arr, np.ndarray) or arr.dtype != np.float32 or
+            not arr.flags.c_contiguous):
+        raise ValueError('%s must be a C-contiguous float32 array.' % name)
+    if (arr.ndim != len(shape) or
+            any(n is not None and m != n for m, n in zip(arr.shape, shape))):
+        raise ValueError(
+            '%s has shape %s, expected %s.' % (
+                name, arr.shape,
+                tuple('*' if n is None else n for n in shape)))
+
+
+def c_simulate(obj, center, theta, tomo, engine, ncore):
+    """
+    Simulate the projections ``tomo`` of the object ``obj``.
+    """
+    _check(obj, 'obj', (None, None, None))
+    ox, oy, oz = obj.shape
+    _check(tomo, 'tomo', (theta.size, ox, None))
+    _check(center, 'center', (ox,))
+    _check(theta, 'theta', (tomo.shape[0],))
+    dx, dy, dz = tomo.shape
+    LIB_TOMOPY.simulate(
+        obj, ox, oy, oz, tomo, dx, dy, dz, center, theta, int(engine),
+        int(ncore))
+
+
+def c_recon(name, tomo, center, theta, recon, args, ncore, history=None):
+    """
+    Reconstruct ``tomo`` into ``recon`` with the C function ``name``.
+
+    ``args`` are the arguments specific to the method, before the
+    convergence history of the iterative methods and the number of
+    cores.
+    """
+    if name not in _RECON_ARGS:
+        raise ValueError('Unknown reconstruction method: %s' % name)
+    _check(tomo, 'tomo', (None, None, None))
+    dx, dy, dz = tomo.shape
+    _check(center, 'center', (dy,))
+    _check(theta, 'theta', (dx,))
+    _check(recon, 'recon', (dy, None, None))
+    args = tuple(args)
+    if name not in ('gridrec', 'fbp'):
+        _check(history, 'history', (dy, args[0], 2))
+        args = args + (history,)
+    getattr(LIB_TOMOPY, name)(
+        tomo, dx, dy, dz, center, theta,
+        recon, recon.shape[1], recon.shape[2], *(args + (int(ncore),)))
+
+
+def c_gridrec_create_plan(theta, dz, ngridx, ngridy, filter_name):
+    """
+    Return a new gridrec plan, to be released with
+    :func:`c_gridrec_destroy_plan`.
+    """
+    _check(theta, 'theta', (None,))
+    return ctypes.c_void_p(LIB_TOMOPY.gridrec_create_plan(
+        theta.size, dz, theta, ngridx, ngridy, filter_name))
+
+
+def c_gridrec_execute(plan, tomo, center, recon, ncore):
+    """
+    Reconstruct all slices of ``tomo`` into ``recon`` with a gridrec
+    plan.
+    """
+    _check(tomo, 'tomo', (None, None, None))
+    dy = tomo.shape[1]
+    _check(center, 'center', (dy,))
+    _check(recon, 'recon', (dy, None, None))
+    LIB_TOMOPY.gridrec_execute(plan, tomo, dy, center, recon, int(ncore))
+
+
+def c_gridrec_sweep(plan, sino, center, recon, ncore):
+    """
+    Reconstruct the sinogram ``sino`` with each rotation center with a
+    gridrec plan.
+    """
+    _check(sino, 'sino', (None, None))
+    _check(center, 'center', (None,))
+    _check(recon, 'recon', (center.size, None, None))
+    LIB_TOMOPY.gridrec_sweep(
+        plan, sino, center.size, center, recon, int(ncore))
+
+
+def c_gridrec_destroy_plan(plan):
+    """
+    Release a gridrec plan.
+    """
+    LIB_TOMOPY.gridrec_destroy_plan(plan)
+
+
+def c_correct_air(tomo, air):
+    """
+    Scale the sinograms of ``tomo`` in place by the values of the ``air``
+    pixels at each of their ends.
+    """
+    _check(tomo, 'tomo', (None, None, None))
+    dx, dy, dz = tomo.shape
+    if not 0 < air <= dz:
+        raise ValueError('air must be between 1 and %d.' % dz)
+    LIB_TOMOPY.correct_air(tomo, dx, dy, dz, int(air))
+
+
+def c_apply_padding(arr, out):
+    """
+    Copy ``arr`` to the middle of the last axis of the wider ``out``.
+    """
+    _check(arr, 'arr', (None, None, None))
+    dx, dy, dz = arr.shape
+    _check(out, 'out', (dx, dy, None))
+    if out.shape[2] < dz:
+        raise ValueError('out must be at least %d wide.' % dz)
+    LIB_TOMOPY.apply_padding(arr, dx, dy, dz, out.shape[2], out)
+
+
+def c_downsample(arr, binsize, ragged, out, ncore, both=False):
+    """
+    Average bins of ``binsize`` values along the last axis of ``arr``, or
+    the last two if ``both``, into ``out``.
+    """
+    _check(arr, 'arr', (None, None, None))
+    dx, dy, dz = arr.shape
+    binsize = int(binsize)
+
+    def _nbin(n):
+        return (n + binsize - 1) // binsize if ragged else n // binsize
+
+    if both:
+        _check(out, 'out', (dx, _nbin(dy), _nbin(dz)))
+        func = LIB_TOMOPY.downsample3d
+    else:
+        _check(out, 'out', (dx, dy, _nbin(dz)))
+        func = LIB_TOMOPY.downsample2d
+    func(arr, dx, dy, dz, binsize, bool(ragged), out, int(ncore))
+
+
+def c_upsample(arr, binsize, out, ncore, first=False):
+    """
+    Replicate each value of ``arr`` ``binsize`` times along the last two
+    axes, and the first one too if ``first``, into ``out``.
+    """
+    _check(arr, 'arr', (None, None, None))
+    dx, dy, dz = arr.shape
+    binsize = int(binsize)
+    if first:
+        _check(out, 'out', (dx * binsize, dy * binsize, dz * binsize))
+        func = LIB_TOMOPY.upsample3d
+    else:
+        _check(out, 'out', (dx, dy * binsize, dz * binsize))
+        func = LIB_TOMOPY.upsample2d
+    func(arr, dx, dy, dz, binsize, out, int(ncore))
@@ -71,6 +71,8 @@ __author__ = "Doga Gursoy"
 __copyright__ = "Copyright (c) 2015, UChicago Argonne, LLC."
 __docformat__ = 'restructuredtext en'
 __all__ = ['_as_float32',
+           '_copy_float32',
+           '_out_float32',
            '_as_uint8',
            '_as_uint16',
            'remove_neg',
@@ -87,7 +89,10 @@ __all__ = ['_as_float32',
 
 def _as_float32(arr):
     """
-    Convert a numpy array to float32.
+    Convert a numpy array to a C-contiguous float32 array.
+
+    The array itself is returned if it already is one, so that it can be
+    passed to the C routines without a copy.
 
     Parameters
     ----------
@@ -99,9 +104,48 @@ def _as_float32(arr):
     ndarray
         Output array.
     """
-    if not isinstance(arr, np.float32):
-        arr = np.array(arr, dtype='float32')
-    return arr
+    return np.ascontiguousarray(arr, dtype='float32')
+
+
+def _copy_float32(arr, out=None):
+    """
+    Copy a numpy array into a C-contiguous float32 array.
+
+    Parameters
+    ----------
+    arr : ndarray
+        Input array.
+    out : ndarray, optional
+        C-contiguous float32 array of the same shape to copy into. It may
+        be ``arr`` itself, which is then used without a copy.
+
+    Returns
+    -------
+    ndarray
+        Output array.
+    """
+    if out is None:
+        return np.array(arr, dtype='float32', order='C')
+    out = _out_float32(out, np.shape(arr))
+    if out is not arr:
+        np.copyto(out, arr, casting='unsafe')
+    return out
+
+
+def _out_float32(out, shape):
+    """
+    Return ``out``, or a new array if None, after checking that it can
+    hold a float32 result of the given shape.
+    """
+    shape = tuple(int(n) for n in shape)
+    if out is None:
+        return np.empty(shape, dtype='float32')
+    if (out.shape != shape or out.dtype != np.float32 or
+            not out.flags.c_contiguous or not out.flags.writeable):
+        raise ValueError(
+            'out must be a writeable C-contiguous float32 array of '
+            'shape %s.' % (shape,))
+    return out
 
 
 def _as_uint8(arr, dmin=None, dmax=None):
@@ -186,7 +230,7 @@ def remove_neg(dat, val=0.):
     ndarray
        Corrected data.
     """
-    dat = _as_float32(dat)
+    dat = _copy_float32(dat)
     dat[dat < 0.0] = val
     return dat
 
@@ -207,7 +251,7 @@ def remove_nan(dat, val=0.):
     ndarray
        Corrected data.
     """
-    dat = _as_float32(dat)
+    dat = _copy_float32(dat)
     dat[np.isnan(dat)] = val
     return dat
 
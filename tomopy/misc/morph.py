@@ -54,11 +54,12 @@ from __future__ import absolute_import, division, print_function
 
 import numpy as np
 import pywt
-import os
-import ctypes
+import multiprocessing
 import tomopy.misc.mproc as mp
 from scipy.ndimage import filters
 from tomopy.prep import correct_air
+from tomopy.io.data import _as_float32, _out_float32
+import tomopy.extern as extern
 import logging
 logger = logging.getLogger(__name__)
 
@@ -67,31 +68,15 @@ __author__ = "Doga Gursoy"
 __copyright__ = "Copyright (c) 2015, UChicago Argonne, LLC."
 __docformat__ = 'restructuredtext en'
 __all__ = ['apply_pad',
+           'downsample',
+           'upsample',
            'focus_region']
 
 
 PI = 3.14159265359
 
 
-def _import_shared_lib(lib_name):
-    """
-    Get the path and import the C-shared library.
-    """
-    try:
-        if os.name == 'nt':
-            libpath = os.path.join('lib', lib_name + '.pyd')
-            return ctypes.CDLL(os.path.abspath(libpath))
-        else:
-            libpath = os.path.join('lib', lib_name + '.so')
-            return ctypes.CDLL(os.path.abspath(libpath))
-    except OSError as e:
-        logger.warning('OSError: Shared library missing.')
-
-
-LIB_TOMOPY = _import_shared_lib('libtomopy')
-
-
-def apply_pad(arr, npad=None, val=0.):
+def apply_pad(arr, npad=None, val=0., out=None):
     """
     Extend size of a 3D array by padding with specified values.
 
@@ -103,6 +88,8 @@ def apply_pad(arr, npad=None, val=0.):
         New dimensions after padding.
     val : float, optional
         Pad value.
+    out : ndarray, optional
+        C-contiguous float32 array to write the padded array into.
 
     Returns
     -------
@@ -114,20 +101,124 @@ def apply_pad(arr, npad=None, val=0.):
         npad = np.ceil(dz * np.sqrt(2))
     elif npad < dz:
         npad = dz
+    npad = int(npad)
 
-    npad = np.array(npad, dtype='int32')
-    out = val * np.ones((dx, dy, npad), dtype='float32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.apply_padding.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.apply_padding(
-        arr.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx), ctypes.c_int(dy),
-        ctypes.c_int(dz), ctypes.c_int(npad),
-        out.ctypes.data_as(c_float_p))
+    arr = _as_float32(arr)
+    out = _out_float32(out, (dx, dy, npad))
+    out.fill(val)
+    extern.c_apply_padding(arr, out)
     return out
 
 
+def downsample(
+        arr, level=1, axis=2, binsize=None, ragged=False, out=None,
+        ncore=None):
+    """
+    Downsample a 3D array by binning.
+
+    Bins of neighbouring values are averaged.
+
+    Parameters
+    ----------
+    arr : ndarray
+        Arbitrary 3D array.
+    level : int, optional
+        Downsampling level in powers of two.
+    axis : int or tuple of int, optional
+        Axis along which the array is binned, or (1, 2) to bin both of
+        the last two axes.
+    binsize : int, optional
+        Number of values in a bin along each binned axis. Overrides
+        ``level``, and need not be a power of two.
+    ragged : bool, optional
+        If True, values beyond the last whole bin are averaged into one
+        more bin. Otherwise they are dropped.
+    out : ndarray, optional
+        Float32 C-contiguous array of the downsampled shape to write the
+        result into.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+
+    Returns
+    -------
+    ndarray
+        Downsampled 3D array.
+    """
+    if binsize is None:
+        binsize = 2 ** level
+    if ncore is None:
+        ncore = multiprocessing.cpu_count()
+
+    def _nbin(n):
+        return (n + binsize - 1) // binsize if ragged else n // binsize
+
+    if axis == (1, 2):
+        arr = _as_float32(arr)
+        dx, dy, dz = arr.shape
+        shape = (dx, _nbin(dy), _nbin(dz))
+    else:
+        arr = _as_float32(np.swapaxes(arr, axis, 2))
+        dx, dy, dz = arr.shape
+        shape = (dx, dy, _nbin(dz))
+
+    if axis in ((1, 2), 2, -1):
+        res = _out_float32(out, shape)
+    else:
+        res = np.empty(shape, dtype='float32')
+    extern.c_downsample(arr, binsize, ragged, res, ncore, axis == (1, 2))
+
+    if axis not in ((1, 2), 2, -1):
+        res = np.swapaxes(res, axis, 2)
+        if out is not None:
+            _out_float32(out, res.shape)[:] = res
+            res = out
+    return res
+
+
+def upsample(arr, level=1, axis=(1, 2), binsize=None, out=None, ncore=None):
+    """
+    Upsample a 3D array by replicating values.
+
+    Parameters
+    ----------
+    arr : ndarray
+        Arbitrary 3D array, such as a reconstruction.
+    level : int, optional
+        Upsampling level in powers of two.
+    axis : tuple of int, optional
+        (1, 2) to enlarge each image along the last two axes, or
+        (0, 1, 2) to also replicate the images along the first axis.
+    binsize : int, optional
+        Number of copies of each value along each axis. Overrides
+        ``level``, and need not be a power of two.
+    out : ndarray, optional
+        Float32 C-contiguous array of the upsampled shape to write the
+        result into.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+
+    Returns
+    -------
+    ndarray
+        Upsampled 3D array.
+    """
+    if binsize is None:
+        binsize = 2 ** level
+    if ncore is None:
+        ncore = multiprocessing.cpu_count()
+    arr = _as_float32(arr)
+    dx, dy, dz = arr.shape
+    if axis == (0, 1, 2):
+        shape = (dx * binsize, dy * binsize, dz * binsize)
+    elif axis == (1, 2):
+        shape = (dx, dy * binsize, dz * binsize)
+    else:
+        raise ValueError('axis must be (1, 2) or (0, 1, 2).')
+    res = _out_float32(out, shape)
+    extern.c_upsample(arr, binsize, res, ncore, axis == (0, 1, 2))
+    return res
+
+
 def focus_region(
         data, dia, xcoord=0, ycoord=0,
         center=None, pad=False, corr=True):
@@ -191,7 +282,7 @@ def focus_region(
         arr = np.expand_dims(data[m, :, ind1:ind2], axis=0)
         if pad:
             if corr:
-                roi[m, :, ind1:ind2] = correct_air(arr.copy(), air=5)
+                roi[m, :, ind1:ind2] = correct_air(arr, air=5)
             else:
                 roi[m, :, ind1:ind2] = arr
         else:
@@ -54,96 +54,233 @@ from __future__ import absolute_import, division, print_function
 
 import numpy as np
 import multiprocessing as mp
-import ctypes
-from contextlib import closing
+import mmap
+import os
+import tempfile
+import weakref
 
 
 __author__ = "Doga Gursoy"
 __copyright__ = "Copyright (c) 2015, UChicago Argonne, LLC."
 __docformat__ = 'restructuredtext en'
-__all__ = ['distribute_jobs']
+__all__ = ['distribute_jobs',
+           'shared_array',
+           'WorkerPool']
 
+# Named shared memory is a file in /dev/shm where there is one.
+_SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
 
-def distribute_jobs(data, func, args, axis, ncore=None, nchunk=None):
+
+def _shared_dir(nbytes):
+    """
+    Return the first of /dev/shm and the temporary directory with room
+    for ``nbytes``. Writing past the free space of a memory-mapped file
+    kills the process, so a MemoryError is raised if neither has room.
+    """
+    for path in (_SHM_DIR, tempfile.gettempdir()):
+        if path is None:
+            continue
+        if not hasattr(os, 'statvfs'):
+            return path
+        st = os.statvfs(path)
+        if st.f_bavail * st.f_frsize >= nbytes:
+            return path
+    raise MemoryError(
+        'No room for a shared array of %d bytes in %s or %s.' %
+        (nbytes, _SHM_DIR, tempfile.gettempdir()))
+
+
+def shared_array(shape, dtype='float32', fname=None):
+    """
+    Return a new array which the jobs of :func:`distribute_jobs` work on
+    in place, without copies.
+
+    The array is kept in named shared memory, which is released when
+    the array is no longer used, or in the file ``fname`` mapped into
+    memory. If /dev/shm is too small for the array, it is kept in a
+    file in the temporary directory instead. A :class:`numpy.memmap`
+    opened in 'r+' or 'w+' mode can be used in the same way.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape of the array.
+    dtype : data-type, optional
+        Data type of the array.
+    fname : str, optional
+        File to keep the array in.
+
+    Returns
+    -------
+    numpy.memmap
+        Zero-filled array.
+    """
+    if fname is not None:
+        return np.memmap(fname, dtype=dtype, mode='w+', shape=shape)
+    nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    fd, fname = tempfile.mkstemp(
+        prefix='tomopy-%d-' % os.getpid(), dir=_shared_dir(nbytes))
+    try:
+        os.close(fd)
+        arr = np.memmap(fname, dtype=dtype, mode='w+', shape=shape)
+    except Exception:
+        os.remove(fname)
+        raise
+    weakref.finalize(arr, os.remove, fname)
+    return arr
+
+
+class WorkerPool(object):
+    """
+    Pool of worker processes for any number of calls of
+    :func:`distribute_jobs`.
+
+    The workers are started on first use and kept until the pool is
+    closed. They attach to the memory of each array they are given, so
+    an array from :func:`shared_array`, and the array returned by each
+    call for any other input, are processed in place. A chain of
+    processing steps then makes at most one copy of the data.
+
+    Parameters
+    ----------
+    ncore : int, optional
+        Number of worker processes.
+
+    Examples
+    --------
+    >>> with WorkerPool() as pool:
+    ...     tomo = normalize(tomo, flat, dark, pool=pool)
+    ...     tomo = remove_zinger(tomo, pool=pool)
+    """
+
+    def __init__(self, ncore=None):
+        if ncore is None:
+            ncore = mp.cpu_count()
+        self.ncore = int(ncore)
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def map(self, data, func, args, axis, nchunk=None):
+        """
+        Apply ``func`` in place to chunks of ``data`` along ``axis`` in
+        the workers.
+
+        ``func`` is called as ``func(arr, *args, ind)`` with the data and
+        the indices of a chunk along ``axis``. See
+        :func:`distribute_jobs` for the other parameters.
+
+        Returns
+        -------
+        ndarray
+            Output data.
+        """
+        desc = _describe(data)
+        if desc is None:
+            arr = shared_array(data.shape)
+            arr[:] = data
+            data, desc = arr, _describe(arr)
+        if self._pool is None:
+            self._pool = mp.Pool(self.ncore)
+        tasks = [
+            (func, desc, args, ind)
+            for ind in _chunks(data.shape[axis], self.ncore, nchunk)]
+        self._pool.map(_arg_parser, tasks)
+        return data
+
+    def close(self):
+        """
+        Stop the workers.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def distribute_jobs(
+        data, func, args, axis, ncore=None, nchunk=None, pool=None):
     """
     Distribute N-dimensional shared-memory data in chunks into cores.
 
     Parameters
     ----------
+    data : ndarray
+        Input data. A float32 array in shared memory or in a file mapped
+        into memory, see :func:`shared_array`, is processed in place.
+        Any other data is first copied into a new shared array.
     func : func
-        Function to be parallelized.
+        Function to be parallelized. It is called in the workers as
+        ``func(arr, *args, ind)``, with the shared data and the indices
+        of a chunk along ``axis``, and modifies the data in place.
     args : list
         Arguments of the function in a list.
     axis : int
         Axis along which parallelization is performed.
     ncore : int, optional
-        Number of available cores that will be assigned to jobs.
+        Number of available cores that will be assigned to jobs. Ignored
+        if ``pool`` is given.
     nchunk : int, optional
         Number of data chunk size for each core.
+    pool : WorkerPool, optional
+        Pool of workers to run the jobs in. By default a new pool is
+        started for the call.
 
     Returns
     -------
     ndarray
-        Output data.
+        Output data, which is ``data`` itself if it was processed in
+        place.
     """
-    # Arrange number of processors.
-    if ncore is None:
-        ncore = mp.cpu_count()
-    dims = data.shape[axis]
+    if pool is not None:
+        return pool.map(data, func, args, axis, nchunk)
+    with WorkerPool(min(ncore or mp.cpu_count(), data.shape[axis])) as pool:
+        return pool.map(data, func, args, axis, nchunk)
 
-    # Maximum number of available processors for the task.
-    if dims < ncore:
-        ncore = dims
 
-    # Arrange chunk size.
+def _chunks(dims, ncore, nchunk=None):
+    """
+    Split ``range(dims)`` into chunks of ``nchunk`` indices, by default
+    one chunk per core.
+    """
     if nchunk is None:
-        nchunk = (dims - 1) // ncore + 1
-
-    # Determine pool size.
-    npool = dims // nchunk + 1
-
-    # Populate arguments for workers.
-    arg = []
-    for m in range(npool):
-        ind_start = m * nchunk
-        ind_end = (m + 1) * nchunk
-        if ind_start >= dims:
-            npool -= 1
-            break
-        if ind_end > dims:
-            ind_end = dims
-
-        arr = []
-        arr.append(func)
-        arr.append("SHARED")
-        for a in args:
-            arr.append(a)
-        arr.append(range(ind_start, ind_end))
-        arg.append(arr)
-
-    shared_data = mp.Array(ctypes.c_float, data.size)
-    shared_data = _to_numpy_array(shared_data, data.shape)
-    shared_data[:] = data
-
-    # write to arr from different processes
-    with closing(mp.Pool(
-            initializer=_init_shared, initargs=(shared_data,))) as p:
-        p.map_async(_arg_parser, arg)
-    p.join()
-    p.close()
-    return shared_data
+        nchunk = (dims - 1) // max(1, min(dims, ncore)) + 1
+    return [range(m, min(m + nchunk, dims)) for m in range(0, dims, nchunk)]
 
 
-def _arg_parser(args):
-    func = args[0]
-    func(*args[1::])
+def _describe(data):
+    """
+    Return the file, position, shape and strides of the float32 data in
+    a writable memory-mapped file, which the workers can map in turn, or
+    None if ``data`` is any other array.
+    """
+    if (not isinstance(data, np.ndarray) or data.dtype != np.float32 or
+            not data.flags.writeable):
+        return None
+    root = data
+    while isinstance(root.base, np.ndarray):
+        root = root.base
+    if (not isinstance(root, np.memmap) or
+            not isinstance(root.base, mmap.mmap) or
+            root.filename is None or root.mode not in ('r+', 'w+')):
+        return None
+    pos = root.offset + (
+        data.__array_interface__['data'][0] -
+        root.__array_interface__['data'][0])
+    return root.filename, pos, data.shape, data.strides
 
 
-def _init_shared(shared_data_):
+def _arg_parser(args):
+    func, (fname, pos, shape, strides), args, ind = args
+    buf = np.memmap(fname, dtype=np.uint8, mode='r+')
     global shared_data
-    shared_data = shared_data_
-
-
-def _to_numpy_array(mp_arr, dshape):
-    a = np.frombuffer(mp_arr.get_obj(), dtype=np.float32)
-    return np.reshape(a, dshape)
+    shared_data = np.ndarray(
+        shape, np.float32, buffer=buf, offset=pos, strides=strides)
+    try:
+        func(shared_data, *(tuple(args) + (ind,)))
+    finally:
+        shared_data = None
@@ -54,9 +54,9 @@ from __future__ import absolute_import, division, print_function
 
 import numpy as np
 import pywt
-import os
-import ctypes
 import tomopy.misc.mproc as mp
+from tomopy.io.data import _copy_float32
+import tomopy.extern as extern
 from scipy.ndimage import filters
 import logging
 logger = logging.getLogger(__name__)
@@ -76,28 +76,11 @@ __all__ = ['normalize',
 
 BOLTZMANN_CONSTANT = 1.3806488e-16  # [erg/k]
 SPEED_OF_LIGHT = 299792458e+2  # [cm/s]
+PLANCK_CONSTANT = 6.58211928e-19  # [keV*s]
 PI = 3.14159265359
 
 
-def _import_shared_lib(lib_name):
-    """
-    Get the path and import the C-shared library.
-    """
-    try:
-        if os.name == 'nt':
-            libpath = os.path.join('lib', lib_name + '.pyd')
-            return ctypes.CDLL(os.path.abspath(libpath))
-        else:
-            libpath = os.path.join('lib', lib_name + '.so')
-            return ctypes.CDLL(os.path.abspath(libpath))
-    except OSError as e:
-        logger.warning('OSError: Shared library missing.')
-
-
-LIB_TOMOPY = _import_shared_lib('libtomopy')
-
-
-def normalize(tomo, flat, dark, cutoff=None, ind=None):
+def normalize(tomo, flat, dark, cutoff=None, ind=None, pool=None):
     """
     Normalize raw projection data using the flat and dark field projections.
 
@@ -113,20 +96,20 @@ def normalize(tomo, flat, dark, cutoff=None, ind=None):
         Permitted maximum vaue for the normalized data.
     ind : array of int, optional
         Projection indices at which the normalization is applied.
+    pool : WorkerPool, optional
+        Pool of worker processes to run in.
 
     Returns
     -------
     ndarray
         Normalized 3D tomographic data.
     """
-    if type(tomo) == str and tomo == 'SHARED':
-        tomo = mp.shared_data
-    else:
-        arr = mp.distribute_jobs(
-            tomo, func=normalize, axis=0,
-            args=(flat, dark, cutoff))
-        return arr
+    return mp.distribute_jobs(
+        tomo, func=_normalize, axis=0,
+        args=(flat, dark, cutoff), pool=pool)
 
+
+def _normalize(tomo, flat, dark, cutoff, ind):
     dx, dy, dz = tomo.shape
     if ind is None:
         ind = np.arange(0, dx)
@@ -149,7 +132,7 @@ def normalize(tomo, flat, dark, cutoff=None, ind=None):
 
 def remove_stripe(
         tomo, level=None, wname='db5',
-        sigma=2, pad=True, ind=None):
+        sigma=2, pad=True, ind=None, pool=None):
     """
     Remove horizontal stripes from sinogram using the Fourier-Wavelet (FW)
     based method :cite:`Munch:09`.
@@ -168,20 +151,20 @@ def remove_stripe(
         If True, extend the size of the sinogram by padding with zeros.
     ind : array of int, optional
         Sinogram indices at which the stripe removal is applied.
+    pool : WorkerPool, optional
+        Pool of worker processes to run in.
 
     Returns
     -------
     ndarray
         Corrected 3D tomographic data.
     """
-    if type(tomo) == str and tomo == 'SHARED':
-        tomo = mp.shared_data
-    else:
-        arr = mp.distribute_jobs(
-            tomo, func=remove_stripe, axis=1,
-            args=(level, wname, sigma, pad))
-        return arr
+    return mp.distribute_jobs(
+        tomo, func=_remove_stripe, axis=1,
+        args=(level, wname, sigma, pad), pool=pool)
 
+
+def _remove_stripe(tomo, level, wname, sigma, pad, ind):
     dx, dy, dz = tomo.shape
     if ind is None:
         ind = np.arange(0, dy)
@@ -192,12 +175,12 @@ def remove_stripe(
     # pad temp image.
     nx = dx
     if pad:
-        nx = dx + dx / 8
+        nx = dx + dx // 8
 
     xshift = int((nx - dx) / 2.)
-    sli = np.zeros((nx, dz), dtype='float32')
 
     for n in ind:
+        sli = np.zeros((nx, dz), dtype='float32')
         sli[xshift:dx + xshift, :] = tomo[:, n, :]
 
         # Wavelet decomposition.
@@ -234,7 +217,7 @@ def remove_stripe(
 
 def retrieve_phase(
         tomo, psize=1e-4, dist=50, energy=20,
-        alpha=1e-4, pad=True, ind=None):
+        alpha=1e-4, pad=True, ind=None, pool=None):
     """
     Perform single-step phase retrieval from phase-contrast measurements
     :cite:`Paganin:02`.
@@ -255,20 +238,20 @@ def retrieve_phase(
         If True, extend the size of the projections by padding with zeros.
     ind : array of int, optional
         Projection indices at which the phase retrieval is applied.
+    pool : WorkerPool, optional
+        Pool of worker processes to run in.
 
     Returns
     -------
     ndarray
         Approximated 3D tomographic phase data.
     """
-    if type(tomo) == str and tomo == 'SHARED':
-        tomo = mp.shared_data
-    else:
-        arr = mp.distribute_jobs(
-            tomo, func=retrieve_phase,
-            args=(psize, dist, energy, alpha, pad), axis=0)
-        return arr
+    return mp.distribute_jobs(
+        tomo, func=_retrieve_phase,
+        args=(psize, dist, energy, alpha, pad), axis=0, pool=pool)
+
 
+def _retrieve_phase(tomo, psize, dist, energy, alpha, pad, ind):
     dx, dy, dz = tomo.shape
     if ind is None:
         ind = np.arange(0, dx)
@@ -332,8 +315,8 @@ def _paganin_filter(tomo, psize, dist, energy, alpha, pad):
         # Fourier pad in powers of 2.
         padpix = np.ceil(PI * wavelen * dist / psize ** 2)
 
-        nx = pow(2, np.ceil(np.log2(dy + padpix)))
-        ny = pow(2, np.ceil(np.log2(dz + padpix)))
+        nx = int(pow(2, np.ceil(np.log2(dy + padpix))))
+        ny = int(pow(2, np.ceil(np.log2(dz + padpix))))
         xshift = int((nx - dy) / 2.)
         yshift = int((ny - dz) / 2.)
 
@@ -398,7 +381,7 @@ def circular_roi(tomo, ratio=1, val=None):
     return tomo
 
 
-def median_filter(tomo, size=3, axis=0, ind=None):
+def median_filter(tomo, size=3, axis=0, ind=None, pool=None):
     """
     Apply median filter to a 3D array along a specified axis.
 
@@ -412,20 +395,20 @@ def median_filter(tomo, size=3, axis=0, ind=None):
         Axis along which median filtering is performed.
     ind : array of int, optional
         Indices at which the filtering is applied.
+    pool : WorkerPool, optional
+        Pool of worker processes to run in.
 
     Returns
     -------
     ndarray
         Median filtered 3D array.
     """
-    if type(tomo) == str and tomo == 'SHARED':
-        tomo = mp.shared_data
-    else:
-        arr = mp.distribute_jobs(
-            tomo, func=median_filter, axis=axis,
-            args=(size, axis))
-        return arr
+    return mp.distribute_jobs(
+        tomo, func=_median_filter, axis=axis,
+        args=(size, axis), pool=pool)
+
 
+def _median_filter(tomo, size, axis, ind):
     dx, dy, dz = tomo.shape
     if ind is None:
         if axis == 0:
@@ -449,7 +432,7 @@ def median_filter(tomo, size=3, axis=0, ind=None):
                 tomo[:, :, m], (size, size))
 
 
-def remove_zinger(tomo, dif=1000, size=3, ind=None):
+def remove_zinger(tomo, dif=1000, size=3, ind=None, pool=None):
     """
     Remove high intensity bright spots from tomographic data.
 
@@ -464,20 +447,20 @@ def remove_zinger(tomo, dif=1000, size=3, ind=None):
         Size of the median filter.
     ind : array of int, optional
         Projection indices at which the zinger removal is applied.
+    pool : WorkerPool, optional
+        Pool of worker processes to run in.
 
     Returns
     -------
     ndarray
         Corrected 3D tomographic data.
     """
-    if type(tomo) == str and tomo == 'SHARED':
-        tomo = mp.shared_data
-    else:
-        arr = mp.distribute_jobs(
-            tomo, func=remove_zinger, axis=0,
-            args=(dif, size))
-        return arr
+    return mp.distribute_jobs(
+        tomo, func=_remove_zinger, axis=0,
+        args=(dif, size), pool=pool)
+
 
+def _remove_zinger(tomo, dif, size, ind):
     dx, dy, dz = tomo.shape
 
     if ind is None:
@@ -490,7 +473,7 @@ def remove_zinger(tomo, dif=1000, size=3, ind=None):
         tomo[m, :, :] = tmp * mask + tomo[m, :, :] * (1 - mask)
 
 
-def correct_air(tomo, air=10):
+def correct_air(tomo, air=10, out=None):
     """
     Weights sinogram such that the left and right image boundaries
     (i.e., typically the air region around the object) are set to one
@@ -502,24 +485,15 @@ def correct_air(tomo, air=10):
         3D tomographic data.
     air : int, optional
         Number of pixels at each boundary to calculate the scaling factor.
+    out : ndarray, optional
+        C-contiguous float32 array to write the corrected data into. It
+        may be ``tomo`` itself to correct the data in place.
 
     Returns
     -------
     ndarray
         Corrected 3D tomographic data.
     """
-    dx, dy, dz = tomo.shape
-
-    # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(air, np.int32):
-        air = np.array(air, dtype='int32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.correct_air.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.correct_air(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx), ctypes.c_int(dy),
-        ctypes.c_int(dz), ctypes.c_int(air))
+    tomo = _copy_float32(tomo, out)
+    extern.c_correct_air(tomo, min(int(air), tomo.shape[2]))
     return tomo
@@ -52,15 +52,24 @@ Module for reconstruction tasks.
 
 from __future__ import absolute_import, division, print_function
 
-from tomopy.io.data import _as_uint8, _as_uint16, _as_float32
+from tomopy.io.data import (
+    _as_uint8, _as_uint16, _as_float32, _copy_float32)
+from tomopy.misc.morph import downsample, upsample
+import tomopy.extern as extern
 from skimage import io as sio
 import warnings
 import numpy as np
-from scipy.optimize import minimize
+import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
+from contextlib import closing
+from functools import partial
+from collections import OrderedDict
+import hashlib
+import threading
 from scipy import ndimage
-import ctypes
 import os
 import shutil
+import h5py
 import logging
 logger = logging.getLogger(__name__)
 
@@ -71,6 +80,7 @@ __docformat__ = 'restructuredtext en'
 __all__ = [
     'simulate',
     'gridrec',
+    'GridrecPlan',
     'art',
     'bart',
     'fbp',
@@ -81,29 +91,337 @@ __all__ = [
     'pml_hybrid',
     'pml_quad',
     'sirt',
+    'resume',
+    'multires',
     'find_center',
+    'find_center_pc',
+    'find_center_line',
     'write_center']
 
 
-def _import_shared_lib(lib_name):
+# Ray tracing engines of the C library.
+_ENGINES = {'sort': 0, 'siddon': 1, 'vector': 2}
+
+
+def _engine_id(engine):
+    """
+    Return the C identifier of a ray tracing engine.
+    """
+    if engine not in _ENGINES:
+        raise ValueError(
+            "engine must be one of %s" % ', '.join(sorted(_ENGINES)))
+    return _ENGINES[engine]
+
+
+def _block_order(ind_block, theta, dx):
+    """
+    Return the order of the ``dx`` projections used by the ordered-subset
+    methods.
+
+    ``ind_block`` is either an explicit order of projection indices, or
+    one of the orderings below of the projections sorted by angle. Both
+    spread every block of consecutive projections over all angles and
+    keep consecutive blocks far apart.
+
+    'bitrev'
+        Bit-reversed projection numbers, skipping those out of range.
+    'golden'
+        The projection nearest to each multiple of the golden ratio
+        conjugate of the angular range, in turn.
+    """
+    if ind_block is None:
+        return np.arange(dx, dtype='float32')
+    if not isinstance(ind_block, str):
+        return np.array(ind_block, dtype='float32')
+
+    if ind_block == 'bitrev':
+        nbit = int(np.ceil(np.log2(max(dx, 1))))
+        k = np.arange(2 ** nbit)
+        order = np.zeros_like(k)
+        for b in range(nbit):
+            order |= ((k >> b) & 1) << (nbit - 1 - b)
+        order = order[order < dx]
+    elif ind_block == 'golden':
+        pos = np.mod(np.arange(dx) * (np.sqrt(5.) - 1.) / 2., 1.)
+        order = np.argsort(np.argsort(pos, kind='mergesort'))
+    else:
+        raise ValueError('Unknown projection ordering: %s' % ind_block)
+    theta = np.asarray(theta, dtype='float64').ravel()
+    ang = np.arange(dx)
+    if theta.size == dx:
+        ang = np.argsort(np.mod(theta, np.pi), kind='mergesort')
+    return np.array(ang[order], dtype='float32')
+
+
+def _init_recon(recon, shape):
+    """
+    Return a float32 copy of the initial reconstruction ``recon``, which
+    the C functions update in place, or an array of the given shape
+    filled with 1e-6 if None.
+    """
+    if recon is None:
+        return np.full(shape, 1e-6, dtype='float32')
+    return _copy_float32(recon)
+
+
+def _dist_slices(func, dy, ncore, nchunk):
+    """
+    Distribute chunks of slices into a thread pool.
+
+    The C functions release the GIL, so chunks run concurrently and
+    write into disjoint slabs of the same output array.
+
+    Parameters
+    ----------
+    func : func
+        Called as ``func(s0, s1, ncore)`` for the slices ``s0:s1``.
+    dy : int
+        Number of slices.
+    ncore : int
+        Number of cores shared by the pool and the C functions.
+    nchunk : int
+        Number of slices in each chunk. If None, all slices are passed
+        to a single call which gets all cores.
+    """
+    if nchunk is None or nchunk >= dy:
+        func(0, dy, ncore)
+        return
+
+    bounds = [(s, min(s + nchunk, dy)) for s in range(0, dy, nchunk)]
+    nthread = max(1, min(ncore, len(bounds)))
+    ncore = max(1, ncore // nthread)
+    with closing(ThreadPool(nthread)) as p:
+        p.map(lambda b: func(b[0], b[1], ncore), bounds)
+    p.join()
+
+
+class _Checkpoint(object):
+    """
+    HDF5 checkpoint of an iterative reconstruction.
+
+    The file holds the estimate in 'recon', the convergence history in
+    'history', and the method name, the number of completed iterations
+    and the total number of iterations as attributes.
+    """
+
+    def __init__(self, fname, start=0, history=None):
+        self.fname = fname
+        self.start = start
+        self.history = history
+
+    def save(self, name, recon, history, iteration):
+        # Write to a temporary file first so that a run pre-empted while
+        # saving leaves the previous checkpoint intact.
+        tmp = self.fname + '.tmp'
+        with h5py.File(tmp, 'w') as f:
+            f.create_dataset('recon', data=recon)
+            f.create_dataset('history', data=history)
+            f.attrs['method'] = name
+            f.attrs['iteration'] = iteration
+            f.attrs['num_iter'] = history.shape[1]
+        if os.name == 'nt' and os.path.exists(self.fname):
+            os.remove(self.fname)
+        os.rename(tmp, self.fname)
+
+    @staticmethod
+    def load(fname):
+        with h5py.File(fname, 'r') as f:
+            name = f.attrs['method']
+            if isinstance(name, bytes):
+                name = name.decode()
+            return (
+                name, int(f.attrs['iteration']), int(f.attrs['num_iter']),
+                f['recon'][:], f['history'][:])
+
+
+class _Roi(object):
+    """
+    Region of interest of an ``ngridx`` by ``ngridy`` reconstruction
+    grid.
+
+    ``box`` is the bounding box (row, col, nrow, ncol) of the region.
+    ``params`` holds the offset of the center of the box from the
+    rotation axis along both grid axes and the radius of a circular
+    region, as passed to the C functions, or is None for the whole grid.
+    ``outer`` is the bin size of the coarse grid of the outer object.
     """
-    Get the path and import the C-shared library.
+
+    def __init__(self, roi, ngridx, ngridy, outer=None):
+        self.ngrid = (int(ngridx), int(ngridy))
+        self.box = (0, 0) + self.ngrid
+        self.radius = 0.
+        self.outer = outer
+        self.params = None
+        if roi is None:
+            return
+
+        if len(roi) == 3:
+            row, col, self.radius = roi
+            n = 2 * int(np.ceil(self.radius))
+            self.box = (
+                int(np.round(row - n / 2.)), int(np.round(col - n / 2.)), n, n)
+        elif len(roi) == 4:
+            self.box = tuple(int(v) for v in roi)
+        else:
+            raise ValueError(
+                'roi must be (row, col, nrow, ncol) or (row, col, radius).')
+        row, col, nrow, ncol = self.box
+        self.params = np.array([
+            row + nrow / 2. - self.ngrid[0] / 2.,
+            col + ncol / 2. - self.ngrid[1] / 2.,
+            self.radius], dtype='float32')
+
+    @property
+    def shape(self):
+        return self.box[2:]
+
+
+def _subtract_outer(
+        name, tomo, center, theta, args, roi, num_iter, ncore, nchunk):
+    """
+    Return ``tomo`` less the projections of the object outside ``roi``.
+
+    The object is reconstructed with the method ``name`` from the data
+    binned by ``roi.outer`` on a grid coarser by the same factor. The
+    coarse pixels which overlap the region are cleared and the rest are
+    projected and interpolated back to the detector pixels.
+    """
+    b = int(roi.outer)
+    dx, dy, dz = tomo.shape
+    ngridx, ngridy = roi.ngrid
+    data = downsample(tomo, axis=2, binsize=b, ragged=True)
+    center = center / b
+    gx, gy = -(-ngridx // b), -(-ngridy // b)
+    outer = _init_recon(None, (dy, gx, gy))
+    _iterate(
+        name, data, center, theta, outer, args, _Roi(None, gx, gy),
+        num_iter, None, False, None, None, ncore, nchunk)
+
+    # Centers of the coarse pixels in pixels of the fine grid.
+    row, col, nrow, ncol = roi.box
+    x = (np.arange(gx) - gx / 2. + 0.5) * b + ngridx / 2. - (row + nrow / 2.)
+    y = (np.arange(gy) - gy / 2. + 0.5) * b + ngridy / 2. - (col + ncol / 2.)
+    if roi.radius > 0:
+        inside = np.hypot(
+            x[:, np.newaxis], y) < roi.radius + b / np.sqrt(2.)
+    else:
+        inside = np.logical_and(
+            np.abs(x[:, np.newaxis]) < (nrow + b) / 2.,
+            np.abs(y) < (ncol + b) / 2.)
+    outer[:, inside] = 0.
+
+    sim = np.zeros((dx, dy, data.shape[2]), dtype='float32')
+    _dist_slices(
+        partial(
+            _simulate_slab, outer, center, theta, sim,
+            _engine_id('siddon')),
+        dy, ncore, nchunk)
+    pos = np.clip((np.arange(dz) + 0.5) / b - 0.5, 0, sim.shape[2] - 1)
+    i0 = pos.astype('int')
+    i1 = np.minimum(i0 + 1, sim.shape[2] - 1)
+    w = (pos - i0).astype('float32')
+    return tomo - (sim[:, :, i0] * (1 - w) + sim[:, :, i1] * w)
+
+
+def _iterate(
+        name, tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk):
+    """
+    Run the iterative method ``name`` on all slices and return the
+    reconstruction, followed by the convergence history if requested.
+
+    With a checkpoint, the iterations are run in rounds of
+    ``checkpoint_every``, saving the estimate after each round. Slices
+    which reached ``tol`` in an earlier round are not passed to later
+    rounds.
     """
-    try:
-        if os.name == 'nt':
-            libpath = os.path.join('lib', lib_name + '.pyd')
-            return ctypes.CDLL(os.path.abspath(libpath))
+    dy = tomo.shape[1]
+    num_iter = int(num_iter)
+    if tol is None:
+        tol = 0.
+    if roi.outer is not None:
+        tomo = _subtract_outer(
+            name, tomo, center, theta, args, roi, num_iter, ncore, nchunk)
+    args = args + (roi.params,)
+    history = np.empty((dy, num_iter, 2), dtype='float32')
+    history.fill(np.nan)
+
+    start = 0
+    every = num_iter
+    if checkpoint is not None:
+        if not isinstance(checkpoint, _Checkpoint):
+            checkpoint = _Checkpoint(checkpoint)
+        start = min(checkpoint.start, num_iter)
+        if checkpoint.history is not None:
+            history[:, :start] = checkpoint.history[:, :start]
+        every = max(1, int(checkpoint_every))
+
+    done = (history[:, :start, 1] < tol).any(axis=1)
+    it = start
+    while it < num_iter:
+        n = min(every, num_iter - it)
+        # Only the slices which have not converged yet are passed on.
+        active = np.flatnonzero(~done)
+        if active.size < dy:
+            sub = (
+                np.ascontiguousarray(tomo[:, active]), center[active],
+                recon[active])
         else:
-            libpath = os.path.join('lib', lib_name + '.so')
-            return ctypes.CDLL(os.path.abspath(libpath))
-    except OSError as e:
-        logger.warning('OSError: Shared library missing.')
+            sub = (tomo, center, recon)
+        hist = np.empty((active.size, n, 2), dtype='float32')
+        hist.fill(np.nan)
+        if active.size:
+            _dist_slices(
+                partial(
+                    _recon_slab, name, sub[0], sub[1], theta, sub[2],
+                    (n,) + args + (float(tol),),
+                    history=hist),
+                active.size, ncore, nchunk)
+        if active.size < dy:
+            recon[active] = sub[2]
+        history[active, it:it + n] = hist
+        done[active] = (hist[:, :, 1] < tol).any(axis=1)
+        it += n
+        if checkpoint is not None:
+            checkpoint.save(name, recon, history, it)
+
+    if return_history:
+        return recon, history
+    return recon
 
 
-LIB_TOMOPY = _import_shared_lib('libtomopy')
+def _recon_slab(
+        name, tomo, center, theta, recon, args, s0, s1, ncore,
+        history=None):
+    """
+    Reconstruct slices ``s0:s1`` into the same slab of ``recon`` with
+    the C function ``name``. The convergence history of the iterative
+    methods is written into the same slab of ``history``.
+    """
+    if s1 - s0 < tomo.shape[1]:
+        tomo = np.ascontiguousarray(tomo[:, s0:s1, :])
+        center = center[s0:s1]
+        recon = recon[s0:s1]
+        if history is not None:
+            history = history[s0:s1]
+    extern.c_recon(name, tomo, center, theta, recon, args, ncore, history)
 
 
-def simulate(obj, theta, center=None):
+def _simulate_slab(obj, center, theta, tomo, engine, s0, s1, ncore):
+    """
+    Simulate projections of the object slices ``s0:s1``.
+    """
+    dx, dy, dz = tomo.shape
+    slab = tomo
+    if s1 - s0 < obj.shape[0]:
+        slab = np.zeros((dx, s1 - s0, dz), dtype='float32')
+    extern.c_simulate(obj[s0:s1], center[s0:s1], theta, slab, engine, ncore)
+    if slab is not tomo:
+        tomo[:, s0:s1, :] = slab
+
+
+def simulate(
+        obj, theta, center=None, engine='sort', ncore=None, nchunk=None):
     """
     Simulate parallel projections of a given 3D object.
 
@@ -115,6 +433,19 @@ def simulate(obj, theta, center=None):
         Projection angles in radian.
     center: array, optional
         Location of rotation axis.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are simulated concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
@@ -131,35 +462,25 @@ def simulate(obj, theta, center=None):
         center = np.ones(dy, dtype='float32') * dz / 2.
     elif np.array(center).size == 1:
         center = np.ones(dy, dtype='float32') * center
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct.
-    if not isinstance(obj, np.float32):
-        obj = np.array(obj, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-
-    # Call C function to reconstruct recon matrix.
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.simulate.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.simulate(
-        obj.ctypes.data_as(c_float_p),
-        ctypes.c_int(ox),
-        ctypes.c_int(oy),
-        ctypes.c_int(oz),
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p))
+    obj = _as_float32(obj)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+
+    _dist_slices(
+        partial(_simulate_slab, obj, center, theta, tomo,
+                _engine_id(engine)),
+        dy, ncore, nchunk)
     return tomo
 
 
 def gridrec(
         tomo, theta, center=None, emission=True,
-        num_gridx=None, num_gridy=None, filter_name='shepp'):
+        num_gridx=None, num_gridy=None, filter_name='shepp',
+        ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using gridrec algorithm
     :cite:`Dowd:99`.
@@ -179,68 +500,225 @@ def gridrec(
     filter_name : str, optional
         Filter name for weighting. 'shepp', 'hann', 'hamming', 'ramlak',
         or 'none'.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. Gridrec
+        reconstructs slices in pairs, so odd chunk sizes are rounded up
+        to the next even number. If given, chunks are reconstructed
+        concurrently in a thread pool that shares the ``ncore`` cores.
+        By default all slices are passed to a single call, which runs
+        its own threads over slice pairs.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
     """
-    # Gridrec reconstructs 2 slices minimum.
-    flag = False
-    if tomo.shape[1] == 1:
-        flag = True
-        tomo = np.append(tomo, tomo, 1)
+    dz = tomo.shape[2]
+    if num_gridx is None:
+        num_gridx = dz
+    if num_gridy is None:
+        num_gridy = dz
+    tomo, center, nslice = _gridrec_prep(tomo, center, emission)
+    dy = tomo.shape[1]
+    if ncore is None:
+        ncore = mp.cpu_count()
+    if nchunk is not None:
+        nchunk = 2 * ((nchunk + 1) // 2)
+    recon = _init_recon(None, (dy, num_gridx, num_gridy))
+
+    # Make sure that inputs datatypes are correct
+    theta = _as_float32(theta)
+    args = (filter_name,)
+    _dist_slices(
+        partial(_recon_slab, 'gridrec', tomo, center, theta, recon, args),
+        dy, ncore, nchunk)
+
+    # Dump the duplicated slice.
+    return recon[0:nslice]
+
+
+def _gridrec_prep(tomo, center, emission):
+    """
+    Prepare the data and rotation centers for gridrec.
+
+    Gridrec reconstructs slices in pairs, so the last slice is duplicated
+    when the number of slices is odd. Returns the float32 data and
+    centers, and the original number of slices.
+    """
+    nslice = tomo.shape[1]
+    if nslice % 2 == 1:
+        tomo = np.append(tomo, tomo[:, -1:, :], 1)
 
     dx, dy, dz = tomo.shape
     if center is None:
         center = np.ones(dy, dtype='float32') * dz / 2.
     elif np.array(center).size == 1:
         center = np.ones(dy, dtype='float32') * center
-    if num_gridx is None:
-        num_gridx = dz
-    if num_gridy is None:
-        num_gridy = dz
+    elif np.array(center).size < dy:
+        center = np.append(center, center[-1])
     if emission is False:
         tomo = -np.log(tomo)
-    recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    filter_name = np.array(filter_name, dtype=(str, 16))
-
-    c_char_p = ctypes.POINTER(ctypes.c_char)
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.gridrec.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.gridrec(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        filter_name.ctypes.data_as(c_char_p))
-
-    # Dump second slice.
-    if flag is True:
-        recon = recon[0:1]
-    return recon
+    tomo = _as_float32(tomo)
+    center = _as_float32(center)
+    return tomo, center, nslice
+
+
+class GridrecPlan(object):
+    """
+    Gridrec reconstruction of a fixed geometry :cite:`Dowd:99`.
+
+    The plan computes the tables that depend only on the projection
+    angles, the detector width and the filter once, and can then be
+    executed repeatedly on new data, e.g. in center searches or live
+    previews. Filter tables are computed once per distinct rotation
+    center and kept in the plan, which holds on to those of the most
+    recently used centers.
+
+    Parameters
+    ----------
+    theta : array
+        Projection angles in radian.
+    dz : int
+        Number of detector pixels.
+    num_gridx, num_gridy : int, optional
+        Number of pixels along x- and y-axes in the reconstruction grid.
+    filter_name : str, optional
+        Filter name for weighting. 'shepp', 'hann', 'hamming', 'ramlak',
+        or 'none'.
+    """
+
+    def __init__(
+            self, theta, dz, num_gridx=None, num_gridy=None,
+            filter_name='shepp'):
+        if num_gridx is None:
+            num_gridx = dz
+        if num_gridy is None:
+            num_gridy = dz
+        self.theta = np.array(theta, dtype='float32').ravel()
+        self.dz = int(dz)
+        self.num_gridx = int(num_gridx)
+        self.num_gridy = int(num_gridy)
+        self.filter_name = filter_name
+
+        self._plan = extern.c_gridrec_create_plan(
+            self.theta, self.dz, self.num_gridx, self.num_gridy,
+            filter_name)
+
+    def __del__(self):
+        plan = getattr(self, '_plan', None)
+        if plan is not None and extern.LIB_TOMOPY is not None:
+            extern.c_gridrec_destroy_plan(plan)
+            self._plan = None
+
+    def execute(self, tomo, center=None, emission=True, ncore=None,
+                nchunk=None):
+        """
+        Reconstruct object from projection data.
+
+        Parameters
+        ----------
+        tomo : ndarray
+            3D tomographic data. Its number of projections and detector
+            pixels must match the plan.
+        center: array, optional
+            Location of rotation axis.
+        emission : bool, optional
+            Determines whether data is emission or transmission type.
+        ncore : int, optional
+            Number of cores that will be assigned to jobs.
+        nchunk : int, optional
+            Chunk size (number of slices) for each thread. Odd chunk
+            sizes are rounded up to the next even number. By default all
+            slices are passed to a single call, which runs its own
+            threads over slice pairs.
+
+        Returns
+        -------
+        ndarray
+            Reconstructed 3D object.
+        """
+        if tomo.shape[0] != self.theta.size or tomo.shape[2] != self.dz:
+            raise ValueError(
+                "tomo must have %d projections and %d detector pixels" %
+                (self.theta.size, self.dz))
+        tomo, center, nslice = _gridrec_prep(tomo, center, emission)
+        dy = tomo.shape[1]
+        if ncore is None:
+            ncore = mp.cpu_count()
+        if nchunk is not None:
+            nchunk = 2 * ((nchunk + 1) // 2)
+        recon = _init_recon(None, (dy, self.num_gridx, self.num_gridy))
+
+        _dist_slices(
+            partial(_gridrec_slab, self._plan, tomo, center, recon),
+            dy, ncore, nchunk)
+
+        # Dump the duplicated slice.
+        return recon[0:nslice]
+
+    def sweep(self, sino, center, emission=True, ncore=None):
+        """
+        Reconstruct one sinogram with each of a range of rotation
+        centers.
+
+        The projections are Fourier transformed once for all centers,
+        and two centers are reconstructed per 2D transform.
+
+        Parameters
+        ----------
+        sino : ndarray
+            2D sinogram (projections, detector pixels) matching the plan.
+        center : array
+            Rotation centers to evaluate.
+        emission : bool, optional
+            Determines whether data is emission or transmission type.
+        ncore : int, optional
+            Number of cores that will be assigned to jobs.
+
+        Returns
+        -------
+        ndarray
+            Reconstructed images, one per center.
+        """
+        if sino.shape != (self.theta.size, self.dz):
+            raise ValueError(
+                "sino must have %d projections and %d detector pixels" %
+                (self.theta.size, self.dz))
+        if emission is False:
+            sino = -np.log(sino)
+        if ncore is None:
+            ncore = mp.cpu_count()
+        sino = _as_float32(sino)
+        center = np.array(center, dtype='float32').ravel()
+        recon = np.zeros(
+            (center.size, self.num_gridx, self.num_gridy), dtype='float32')
+        extern.c_gridrec_sweep(self._plan, sino, center, recon, ncore)
+        return recon
+
+
+def _gridrec_slab(plan, tomo, center, recon, s0, s1, ncore):
+    """
+    Reconstruct slices ``s0:s1`` into the same slab of ``recon`` with a
+    gridrec plan.
+    """
+    if s1 - s0 < tomo.shape[1]:
+        tomo = np.ascontiguousarray(tomo[:, s0:s1, :])
+        center = center[s0:s1]
+        recon = recon[s0:s1]
+    extern.c_gridrec_execute(plan, tomo, center, recon, ncore)
 
 
 def art(
         tomo, theta, center=None, emission=True,
-        recon=None, num_gridx=None, num_gridy=None, num_iter=1):
+        recon=None, num_gridx=None, num_gridy=None, num_iter=1,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using algebraic reconstruction
     technique (ART) :cite:`Kak:98`.
@@ -261,11 +739,57 @@ def art(
         Number of pixels along x- and y-axes in the reconstruction grid.
     num_iter : int, optional
         Number of algorithm iterations performed.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -278,45 +802,32 @@ def art(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.art.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.art(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter))
-    return recon
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+
+    args = (
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'art', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
 
 
 def bart(
         tomo, theta, center=None, emission=True,
         recon=None, num_gridx=None, num_gridy=None, num_iter=1,
-        num_block=1, ind_block=None):
+        num_block=1, ind_block=None,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using block algebraic
     reconstruction technique (BART).
@@ -339,13 +850,61 @@ def bart(
         Number of algorithm iterations performed.
     num_block : int, optional
         Number of data blocks for intermediate updating the object.
-    ind_block : array of int, optional
-        Order of projections to be used for updating.
+    ind_block : array of int or str, optional
+        Order of projections to be used for updating. 'bitrev' or
+        'golden' order the projections by bit reversal or by the golden
+        ratio of their angles, so that each block covers all angles.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -358,56 +917,40 @@ def bart(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
-    if ind_block is None:
-        ind_block = np.arange(0, dx).astype("float32")
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
+    ind_block = _block_order(ind_block, theta, dx)
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-    if not isinstance(num_block, np.int32):
-        num_block = np.array(num_block, dtype='int32')
-    if not isinstance(ind_block, np.float32):
-        ind_block = np.array(ind_block, dtype='float32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.bart.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.bart(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter),
-        ctypes.c_int(num_block),
-        ind_block.ctypes.data_as(c_float_p))
-    return recon
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+    ind_block = _as_float32(ind_block)
+
+    args = (
+        int(num_block),
+        ind_block,
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'bart', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
 
 
 def fbp(
         tomo, theta, center=None, emission=True,
-        recon=None, num_gridx=None, num_gridy=None):
+        recon=None, num_gridx=None, num_gridy=None, filter_name='shepp',
+        ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using filtered back
     projection (FBP).
 
+    Each projection is convolved with a ramp filter in Fourier space and
+    smeared back across the grid, interpolating linearly between the
+    detector pixels.
+
     Parameters
     ----------
     tomo : ndarray
@@ -422,6 +965,16 @@ def fbp(
         Initial values of the reconstruction object.
     num_gridx, num_gridy : int, optional
         Number of pixels along x- and y-axes in the reconstruction grid.
+    filter_name : str, optional
+        Filter name for weighting. 'shepp', 'hann', 'hamming', 'ramlak',
+        or 'none'.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
@@ -439,41 +992,30 @@ def fbp(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
+    recon = _init_recon(recon, (dy, num_gridx, num_gridy))
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.fbp.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.fbp(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy))
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+
+    args = (filter_name,)
+    _dist_slices(
+        partial(_recon_slab, 'fbp', tomo, center, theta, recon, args),
+        dy, ncore, nchunk)
     return recon
 
 
 def mlem(
         tomo, theta, center=None, emission=True,
-        recon=None, num_gridx=None, num_gridy=None, num_iter=1):
+        recon=None, num_gridx=None, num_gridy=None, num_iter=1,
+        num_block=1, ind_block=None,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using maximum-likelihood
     expectation-maximization algorithm. (ML-EM) :cite:`Dempster:77`.
@@ -494,11 +1036,64 @@ def mlem(
         Number of pixels along x- and y-axes in the reconstruction grid.
     num_iter : int, optional
         Number of algorithm iterations performed.
+    num_block : int, optional
+        Number of data blocks for intermediate updating the object. More
+        than one block gives the ordered-subset variant of the method.
+    ind_block : array of int or str, optional
+        Order of projections to be used for updating. 'bitrev' or
+        'golden' order the projections by bit reversal or by the golden
+        ratio of their angles, so that each block covers all angles.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -511,45 +1106,35 @@ def mlem(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
+    ind_block = _block_order(ind_block, theta, dx)
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.mlem.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.mlem(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter))
-    return recon
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+
+    args = (
+        int(num_block),
+        ind_block,
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'mlem', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
 
 
 def osem(
         tomo, theta, center=None, emission=True,
         recon=None, num_gridx=None, num_gridy=None, num_iter=1,
-        num_block=1, ind_block=None):
+        num_block=1, ind_block=None,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using ordered-subset
     expectation-maximization (OS-EM) :cite:`Hudson:94`.
@@ -572,13 +1157,61 @@ def osem(
         Number of algorithm iterations performed.
     num_block : int, optional
         Number of data blocks for intermediate updating the object.
-    ind_block : array of int, optional
-        Order of projections to be used for updating.
+    ind_block : array of int or str, optional
+        Order of projections to be used for updating. 'bitrev' or
+        'golden' order the projections by bit reversal or by the golden
+        ratio of their angles, so that each block covers all angles.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -591,53 +1224,36 @@ def osem(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
-    if ind_block is None:
-        ind_block = np.arange(0, dx).astype("float32")
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
+    ind_block = _block_order(ind_block, theta, dx)
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-    if not isinstance(num_block, np.int32):
-        num_block = np.array(num_block, dtype='int32')
-    if not isinstance(ind_block, np.float32):
-        ind_block = np.array(ind_block, dtype='float32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.osem.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.osem(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter),
-        ctypes.c_int(num_block),
-        ind_block.ctypes.data_as(c_float_p))
-    return recon
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+    ind_block = _as_float32(ind_block)
+
+    args = (
+        int(num_block),
+        ind_block,
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'osem', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
 
 
 def ospml_hybrid(
         tomo, theta, center=None, emission=True,
         recon=None, num_gridx=None, num_gridy=None, num_iter=1,
-        reg_par=None, num_block=1, ind_block=None):
+        reg_par=None, num_block=1, ind_block=None,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using ordered-subset
     penalized maximum likelihood algorithm with weighted linear and
@@ -663,13 +1279,61 @@ def ospml_hybrid(
         Regularization hyperparameters as an array, (beta, delta).
     num_block : int, optional
         Number of data blocks for intermediate updating the object.
-    ind_block : array of int, optional
-        Order of projections to be used for updating.
+    ind_block : array of int or str, optional
+        Order of projections to be used for updating. 'bitrev' or
+        'golden' order the projections by bit reversal or by the golden
+        ratio of their angles, so that each block covers all angles.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -682,58 +1346,40 @@ def ospml_hybrid(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
     if reg_par is None:
         reg_par = np.ones(10, dtype="float32")
-    if ind_block is None:
-        ind_block = np.arange(0, dx).astype("float32")
+    ind_block = _block_order(ind_block, theta, dx)
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-    if not isinstance(reg_par, np.float32):
-        reg_par = np.array(reg_par, dtype='float32')
-    if not isinstance(num_block, np.int32):
-        num_block = np.array(num_block, dtype='int32')
-    if not isinstance(ind_block, np.float32):
-        ind_block = np.array(ind_block, dtype='float32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.ospml_hybrid.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.ospml_hybrid(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter),
-        reg_par.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_block),
-        ind_block.ctypes.data_as(c_float_p))
-    return recon
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+    reg_par = _as_float32(reg_par)
+    ind_block = _as_float32(ind_block)
+
+    args = (
+        reg_par,
+        int(num_block),
+        ind_block,
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'ospml_hybrid', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
 
 
 def ospml_quad(
         tomo, theta, center=None, emission=True,
         recon=None, num_gridx=None, num_gridy=None, num_iter=1,
-        reg_par=None, num_block=1, ind_block=None):
+        reg_par=None, num_block=1, ind_block=None,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using ordered-subset
     penalized maximum likelihood algorithm with quadratic penalty.
@@ -758,13 +1404,61 @@ def ospml_quad(
         Regularization parameter for smoothing.
     num_block : int, optional
         Number of data blocks for intermediate updating the object.
-    ind_block : array of int, optional
-        Order of projections to be used for updating.
+    ind_block : array of int or str, optional
+        Order of projections to be used for updating. 'bitrev' or
+        'golden' order the projections by bit reversal or by the golden
+        ratio of their angles, so that each block covers all angles.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -777,58 +1471,40 @@ def ospml_quad(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
     if reg_par is None:
         reg_par = np.ones(10, dtype="float32")
-    if ind_block is None:
-        ind_block = np.arange(0, dx).astype("float32")
+    ind_block = _block_order(ind_block, theta, dx)
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-    if not isinstance(reg_par, np.float32):
-        reg_par = np.array(reg_par, dtype='float32')
-    if not isinstance(num_block, np.int32):
-        num_block = np.array(num_block, dtype='int32')
-    if not isinstance(ind_block, np.float32):
-        ind_block = np.array(ind_block, dtype='float32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.ospml_quad.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.ospml_quad(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter),
-        reg_par.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_block),
-        ind_block.ctypes.data_as(c_float_p))
-    return recon
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+    reg_par = _as_float32(reg_par)
+    ind_block = _as_float32(ind_block)
+
+    args = (
+        reg_par,
+        int(num_block),
+        ind_block,
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'ospml_quad', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
 
 
 def pml_hybrid(
         tomo, theta, center=None, emission=True,
         recon=None, num_gridx=None, num_gridy=None, num_iter=1,
-        reg_par=None):
+        reg_par=None,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using penalized maximum
     likelihood algorithm with weighted linear and quadratic penalties
@@ -856,11 +1532,57 @@ def pml_hybrid(
         Number of data blocks for intermediate updating the object.
     ind_block : array of int, optional
         Order of projections to be used for updating.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -873,50 +1595,36 @@ def pml_hybrid(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
     if reg_par is None:
         reg_par = np.ones(10, dtype="float32")
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-    if not isinstance(reg_par, np.float32):
-        reg_par = np.array(reg_par, dtype='float32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.pml_hybrid.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.pml_hybrid(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter),
-        reg_par.ctypes.data_as(c_float_p))
-    return recon
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+    reg_par = _as_float32(reg_par)
+
+    args = (
+        reg_par,
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'pml_hybrid', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
 
 
 def pml_quad(
         tomo, theta, center=None, emission=True,
         recon=None, num_gridx=None, num_gridy=None, num_iter=1,
-        reg_par=None):
+        reg_par=None,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using penalized maximum
     likelihood algorithm with quadratic penalty.
@@ -940,11 +1648,57 @@ def pml_quad(
         Number of algorithm iterations performed.
     reg_par : float, optional
         Regularization parameter for smoothing.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -957,49 +1711,36 @@ def pml_quad(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
     if reg_par is None:
         reg_par = np.ones(10, dtype="float32")
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-    if not isinstance(reg_par, np.float32):
-        reg_par = np.array(reg_par, dtype='float32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.pml_quad.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.pml_quad(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter),
-        reg_par.ctypes.data_as(c_float_p))
-    return recon
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+    reg_par = _as_float32(reg_par)
+
+    args = (
+        reg_par,
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'pml_quad', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
 
 
 def sirt(
         tomo, theta, center=None, emission=True,
-        recon=None, num_gridx=None, num_gridy=None, num_iter=1):
+        recon=None, num_gridx=None, num_gridy=None, num_iter=1,
+        num_block=1, ind_block=None,
+        tol=None, return_history=False,
+        checkpoint=None, checkpoint_every=10,
+        roi=None, roi_outer=None,
+        cache_size=0, engine='sort', ncore=None, nchunk=None):
     """
     Reconstruct object from projection data using simultaneous
     iterative reconstruction technique (SIRT).
@@ -1020,11 +1761,64 @@ def sirt(
         Number of pixels along x- and y-axes in the reconstruction grid.
     num_iter : int, optional
         Number of algorithm iterations performed.
+    num_block : int, optional
+        Number of data blocks for intermediate updating the object. More
+        than one block gives the ordered-subset variant of the method.
+    ind_block : array of int or str, optional
+        Order of projections to be used for updating. 'bitrev' or
+        'golden' order the projections by bit reversal or by the golden
+        ratio of their angles, so that each block covers all angles.
+    tol : float, optional
+        Stop iterating a slice once an iteration changes it by less than
+        ``tol`` relative to its norm. By default all ``num_iter``
+        iterations are run.
+    return_history : bool, optional
+        If ``True``, also return the convergence history.
+    checkpoint : str, optional
+        HDF5 file to which the estimate and the number of completed
+        iterations are saved, for continuing the run with ``resume``.
+    checkpoint_every : int, optional
+        Number of iterations between saves to ``checkpoint``.
+    roi : tuple, optional
+        Region of interest to reconstruct, a rectangle (row, col,
+        nrow, ncol) or a circle (row, col, radius) in pixels of the
+        ``num_gridx`` by ``num_gridy`` grid. Only the rays crossing it
+        are traced, and the reconstruction holds its bounding box.
+        Pixels outside a circle keep their initial values.
+    roi_outer : int, optional
+        Bin size of a coarse grid over the whole slice on which the
+        object outside ``roi`` is first reconstructed, to subtract its
+        projections from the data. By default the object is taken to
+        be zero outside ``roi``.
+    cache_size : float, optional
+        Memory cap in megabytes for tables of precomputed ray-pixel
+        intersections. A table is built once per distinct rotation
+        center and reused by all iterations and slices. Rays are traced
+        on the fly when a table does not fit, or when the cap is zero.
+    engine : str, optional
+        Ray tracing engine. 'sort' intersects each ray with all grid
+        lines and sorts the intersections, 'siddon' walks only the
+        pixels a ray crosses. 'vector' samples each ray once per grid
+        column or row and interpolates between the two nearest pixels
+        (Joseph's method) in vectorized loops.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+    nchunk : int, optional
+        Chunk size (number of slices) for each thread. If given, chunks
+        are reconstructed concurrently in a thread pool that shares the
+        ``ncore`` cores. By default all slices are passed to a single
+        call, which runs its own threads over slices.
 
     Returns
     -------
     ndarray
         Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of shape (dy, num_iter, 2), returned if
+        ``return_history`` is ``True``. For each slice and iteration, the
+        residual norm of the forward projections made in the iteration
+        and the norm of the change of the slice, both relative. Entries
+        of iterations skipped because of ``tol`` are NaN.
     """
     dx, dy, dz = tomo.shape
     if center is None:
@@ -1037,45 +1831,153 @@ def sirt(
         num_gridy = dz
     if emission is False:
         tomo = -np.log(tomo)
-    if recon is None:
-        recon = 1e-6 * np.ones((dy, num_gridx, num_gridy), dtype='float32')
+    roi = _Roi(roi, num_gridx, num_gridy, roi_outer)
+    recon = _init_recon(recon, (dy,) + roi.shape)
+    ind_block = _block_order(ind_block, theta, dx)
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Make sure that inputs datatypes are correct
-    if not isinstance(tomo, np.float32):
-        tomo = np.array(tomo, dtype='float32')
-    if not isinstance(theta, np.float32):
-        theta = np.array(theta, dtype='float32')
-    if not isinstance(center, np.float32):
-        center = np.array(center, dtype='float32')
-    if not isinstance(recon, np.float32):
-        recon = np.array(recon, dtype='float32')
-    if not isinstance(num_gridx, np.int32):
-        num_gridx = np.array(num_gridx, dtype='int32')
-    if not isinstance(num_gridy, np.int32):
-        num_gridy = np.array(num_gridy, dtype='int32')
-    if not isinstance(num_iter, np.int32):
-        num_iter = np.array(num_iter, dtype='int32')
-
-    c_float_p = ctypes.POINTER(ctypes.c_float)
-    LIB_TOMOPY.sirt.restype = ctypes.POINTER(ctypes.c_void_p)
-    LIB_TOMOPY.sirt(
-        tomo.ctypes.data_as(c_float_p),
-        ctypes.c_int(dx),
-        ctypes.c_int(dy),
-        ctypes.c_int(dz),
-        center.ctypes.data_as(c_float_p),
-        theta.ctypes.data_as(c_float_p),
-        recon.ctypes.data_as(c_float_p),
-        ctypes.c_int(num_gridx),
-        ctypes.c_int(num_gridy),
-        ctypes.c_int(num_iter))
+    tomo = _as_float32(tomo)
+    theta = _as_float32(theta)
+    center = _as_float32(center)
+
+    args = (
+        int(num_block),
+        ind_block,
+        float(cache_size),
+        _engine_id(engine))
+    return _iterate(
+        'sirt', tomo, center, theta, recon, args, roi, num_iter, tol,
+        return_history, checkpoint, checkpoint_every, ncore, nchunk)
+
+
+def _iterative_method(name):
+    """
+    Return the iterative reconstruction function called ``name``.
+    """
+    methods = {
+        'art': art, 'bart': bart, 'mlem': mlem, 'osem': osem,
+        'ospml_hybrid': ospml_hybrid, 'ospml_quad': ospml_quad,
+        'pml_hybrid': pml_hybrid, 'pml_quad': pml_quad, 'sirt': sirt}
+    if name not in methods:
+        raise ValueError(
+            "algorithm must be one of %s" % ', '.join(sorted(methods)))
+    return methods[name]
+
+
+def resume(fname, tomo, theta, num_iter=None, **kwargs):
+    """
+    Continue an iterative reconstruction from its checkpoint file.
+
+    Parameters
+    ----------
+    fname : str
+        Checkpoint file written by an iterative method called with
+        ``checkpoint=fname``. It is updated as the run continues.
+    tomo : ndarray
+        3D tomographic data.
+    theta : array
+        Projection angles in radian.
+    num_iter : int, optional
+        Total number of iterations, counting those already completed.
+        Defaults to the number requested by the checkpointed run.
+    **kwargs
+        Other arguments of the checkpointed method, which must be the
+        same as in the checkpointed run.
+
+    Returns
+    -------
+    ndarray
+        Reconstructed 3D object.
+    ndarray, optional
+        Convergence history of all iterations, returned if
+        ``return_history`` is ``True``.
+    """
+    name, start, total, recon, history = _Checkpoint.load(fname)
+    if num_iter is None:
+        num_iter = total
+    return _iterative_method(name)(
+        tomo, theta, recon=recon, num_iter=num_iter,
+        checkpoint=_Checkpoint(fname, start, history), **kwargs)
+
+
+def multires(
+        tomo, theta, algorithm='sirt', center=None, emission=True,
+        level=2, num_iter=1, **kwargs):
+    """
+    Reconstruct object from projection data from coarse to fine
+    resolution with an iterative method.
+
+    The detector axis of the data is binned by 2**level and the object
+    is reconstructed on a grid coarser by the same factor. The estimate
+    is then upsampled as the initial object of the next finer level,
+    down to the full resolution. Iterations at the coarse levels are
+    cheap and remove the low frequency error which is slow to converge
+    at full resolution.
+
+    Parameters
+    ----------
+    tomo : ndarray
+        3D tomographic data.
+    theta : array
+        Projection angles in radian.
+    algorithm : str, optional
+        Name of the iterative method, such as 'sirt' or 'mlem'.
+    center: array, optional
+        Location of rotation axis.
+    emission : bool, optional
+        Determines whether data is emission or transmission type.
+    level : int, optional
+        Number of coarse levels.
+    num_iter : int or list of int, optional
+        Number of iterations at each level, or a list with the number of
+        iterations of the levels from the coarsest to the full
+        resolution.
+    **kwargs
+        Other arguments of the method, except ``recon``, ``num_gridx``,
+        ``num_gridy``, ``return_history``, ``checkpoint`` and ``roi``.
+
+    Returns
+    -------
+    ndarray
+        Reconstructed 3D object.
+    """
+    method = _iterative_method(algorithm)
+    dx, dy, dz = tomo.shape
+    if center is None:
+        center = dz / 2.
+    center = np.ones(dy, dtype='float32') * center
+    if emission is False:
+        tomo = -np.log(tomo)
+    if np.ndim(num_iter) == 0:
+        num_iter = [num_iter] * (level + 1)
+    if len(num_iter) != level + 1:
+        raise ValueError('num_iter must have one entry for each level.')
+
+    recon = None
+    for lev, n in zip(range(level, -1, -1), num_iter):
+        data = tomo
+        if lev > 0:
+            data = downsample(tomo, level=lev, axis=2)
+        ngrid = data.shape[2]
+        if recon is not None:
+            # Pixels are twice as small at the next level, so attenuation
+            # per pixel is halved. Odd sizes get one more row and column.
+            recon = 0.5 * upsample(recon, level=1)
+            pad = ngrid - recon.shape[1]
+            recon = np.pad(recon, ((0, 0), (0, pad), (0, pad)), 'edge')
+        recon = method(
+            data, theta, center=center / 2 ** lev, emission=True,
+            recon=recon, num_gridx=ngrid, num_gridy=ngrid, num_iter=n,
+            **kwargs)
     return recon
 
 
 def write_center(
         tomo, theta, dpath='tmp/center', center=None, ind=None,
         emission=True, mask=True, ratio=1.,
-        dtype='float32', dmin=None, dmax=None):
+        dtype='float32', dmin=None, dmax=None, ncore=None):
     """
     Save images reconstructed with a range of rotation centers.
 
@@ -1108,60 +2010,72 @@ def write_center(
         The desired data-type for saved images.
     dmin, dmax : float, optional
         Mininum and maximum values to adjust float-to-int conversion range.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
     """
     dx, dy, dz = tomo.shape
     if ind is None:
-        ind = dy / 2
+        ind = dy // 2
     if center is None:
         center = np.arange(dz / 2 - 5, dz / 2 + 5, 0.5)
     else:
-        center = np.arange(center[0], center[1], center[2] / 2.)
-    stack = np.zeros((dx, len(center), dz))
-    for m in range(len(center)):
-        stack[:, m, :] = tomo[:, ind, :]
+        center = np.arange(center[0], center[1], center[2])
+    if ncore is None:
+        ncore = mp.cpu_count()
 
     # Reconstruct the same slice with a range of centers.
-    rec = gridrec(stack, theta, center, emission)
+    plan = GridrecPlan(theta, dz)
+    rec = plan.sweep(tomo[:, ind, :], center, emission, ncore)
 
     # Apply circular mask.
     if mask is True:
-        rad = dz / 2.
-        y, x = np.ogrid[-rad:rad, -rad:rad]
-        msk = x * x + y * y > ratio * ratio * rad * rad
-        for m in range(center.size):
-            rec[m, msk] = 0
+        rec[:, _circular_mask(dz, ratio)] = 0
 
     # Save images to a temporary folder.
     if os.path.isdir(dpath):
         shutil.rmtree(dpath)
     os.makedirs(dpath)
-    for m in range(len(center)):
-        if m % 2 == 0:  # 2 slices same bec of gridrec.
-            fname = os.path.join(dpath, str('%.02f' % center[m]) + '.tiff')
-            arr = rec[m, :, :]
+    with closing(ThreadPool(ncore)) as p:
+        p.map(
+            partial(_write_center_image, rec, center, dpath,
+                    dtype, dmin, dmax),
+            range(len(center)))
+    p.join()
 
-            if dtype is 'uint8':
-                arr = _as_uint8(arr, dmin, dmax)
-            elif dtype is 'uint16':
-                arr = _as_uint16(arr, dmin, dmax)
-            elif dtype is 'float32':
-                arr = _as_float32(arr)
 
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                sio.imsave(fname, arr, plugin='tifffile')
+def _write_center_image(rec, center, dpath, dtype, dmin, dmax, m):
+    """
+    Save the image reconstructed with the m-th center.
+    """
+    fname = os.path.join(dpath, str('%.02f' % center[m]) + '.tiff')
+    arr = rec[m, :, :]
+
+    if dtype == 'uint8':
+        arr = _as_uint8(arr, dmin, dmax)
+    elif dtype == 'uint16':
+        arr = _as_uint16(arr, dmin, dmax)
+    elif dtype == 'float32':
+        arr = _as_float32(arr)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        sio.imsave(fname, arr, plugin='tifffile')
 
 
 def find_center(
         tomo, theta, ind=None, emission=True, init=None,
-        tol=0.5, mask=True, ratio=1.):
+        tol=0.5, mask=True, ratio=1., ncore=None):
     """
     Find rotation axis location.
 
     The function exploits systematic artifacts in reconstructed images
     due to shifts in the rotation center. It uses image entropy
-    as the error metric and ''Nelder-Mead'' routine (of the scipy
-    optimization module) as the optimizer :cite:`Donath:06`.
+    as the error metric :cite:`Donath:06`. The entropy is first
+    evaluated on a coarse grid of centers around ``init``, using a
+    sinogram binned along the detector, and then at full resolution on a
+    grid with ``tol`` spacing around the coarse minimum. Each grid is
+    reconstructed in a single gridrec sweep. Entropies are memoized, so
+    repeated calls with the same data are nearly free.
 
     Parameters
     ----------
@@ -1183,6 +2097,8 @@ def find_center(
     ratio : float, optional
         The ratio of the radius of the circular mask to the edge of the
         reconstructed image.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
 
     Returns
     -------
@@ -1191,56 +2107,324 @@ def find_center(
     """
     dx, dy, dz = tomo.shape
     if ind is None:
-        ind = dy / 2
+        ind = dy // 2
     if init is None:
-        init = dz / 2
+        init = dz / 2.
+    sino = tomo[:, ind, :]
+    if emission is False:
+        sino = -np.log(sino)
+    sino = _as_float32(sino)
+    theta = _as_float32(theta)
+    return _find_center_sino(sino, theta, init, tol, mask, ratio, ncore)
 
-    # Make an initial reconstruction to adjust histogram limits.
-    rec = gridrec(tomo[:, ind - 1:ind, :], theta, emission=emission)
 
-    # Apply circular mask.
-    if mask is True:
-        rad = tomo.shape[2] / 2
-        y, x = np.ogrid[-rad:rad, -rad:rad]
-        msk = x * x + y * y > ratio * ratio * rad * rad
-        rec[0, msk] = 0
-
-    # Adjust histogram boundaries according to reconstruction.
-    hmin = np.min(rec)
-    if hmin < 0:
-        hmin = 2 * hmin
-    elif hmin >= 0:
-        hmin = 0.5 * hmin
-    hmax = np.max(rec)
-    if hmax < 0:
-        hmax = 0.5 * hmax
-    elif hmax >= 0:
-        hmax = 2 * hmax
-
-    # Magic is ready to happen...
-    res = minimize(
-        _find_center_cost, init,
-        args=(tomo, rec, theta, ind, hmin, hmax, mask, ratio, emission),
-        method='Nelder-Mead',
-        tol=tol)
-    return res.x
-
-
-def _find_center_cost(
-        center, tomo, rec, theta, ind, hmin, hmax, mask, ratio, emission):
-    """
-    Cost function used for the ``find_center`` routine.
-    """
-    center = np.array(center, dtype='float32')
-    rec = gridrec(tomo[:, ind - 1:ind, :], theta, center, emission)
+def find_center_line(
+        tomo, theta, ind=None, emission=True, init=None, tol=0.5,
+        mask=True, ratio=1., method='entropy', ncore=None):
+    """
+    Find rotation axis locations of all slices from a few of them.
 
-    # Apply circular mask.
-    if mask is True:
-        rad = tomo.shape[2] / 2
-        y, x = np.ogrid[-rad:rad, -rad:rad]
-        msk = x * x + y * y > ratio * ratio * rad * rad
-        rec[0, msk] = 0
-
-    hist, e = np.histogram(rec, bins=64, range=[hmin, hmax])
-    hist = hist.astype('float32') / rec.size + 1e-12
-    return -np.dot(hist, np.log2(hist))
+    The rotation axis is located at several slices, which are processed
+    in parallel and share their reconstruction setup, and a straight line
+    is fitted to the locations with the Theil-Sen estimator, so that a
+    slightly tilted axis and the odd failed slice are handled.
+
+    Parameters
+    ----------
+    tomo : ndarray
+        3D tomographic data.
+    theta : array
+        Projection angles in radian.
+    ind : array of int, optional
+        Indices of the slices to be used. Defaults to nine evenly spaced
+        slices.
+    emission : bool, optional
+        Determines whether data is emission or transmission type.
+    init : float, optional
+        Initial guess for the center (``entropy`` method only).
+    tol : scalar, optional
+        Desired sub-pixel accuracy.
+    mask : bool, optional
+        If ``True``, apply a circular mask to the reconstructed image to
+        limit the analysis into a circular region (``entropy`` method
+        only).
+    ratio : float, optional
+        The ratio of the radius of the circular mask to the edge of the
+        reconstructed image (``entropy`` method only).
+    method : {'entropy', 'pc'}, optional
+        Use :func:`find_center` or :func:`find_center_pc` at each slice.
+    ncore : int, optional
+        Number of cores that will be assigned to jobs.
+
+    Returns
+    -------
+    ndarray
+        Rotation axis location of every slice, ready to be passed as the
+        ``center`` of the reconstruction functions.
+    """
+    dx, dy, dz = tomo.shape
+    if ind is None:
+        ind = np.linspace(0, dy - 1, min(dy, 9))
+    ind = np.unique(np.round(ind).astype('int'))
+    if init is None:
+        init = dz / 2.
+
+    if method == 'pc':
+        center = find_center_pc(tomo, theta, ind, emission, tol)
+    elif method == 'entropy':
+        if ncore is None:
+            ncore = mp.cpu_count()
+        theta = _as_float32(theta)
+        sinos = []
+        for m in ind:
+            sino = tomo[:, m, :]
+            if emission is False:
+                sino = -np.log(sino)
+            sinos.append(_as_float32(sino))
+        func = partial(
+            _find_center_sino, theta=theta, init=init, tol=tol,
+            mask=mask, ratio=ratio, ncore=1)
+        with closing(ThreadPool(min(ncore, ind.size))) as p:
+            center = np.array(p.map(func, sinos))
+    else:
+        raise ValueError('Unknown method: %s' % method)
+
+    slope, offset = _theil_sen(ind, center)
+    return offset + slope * np.arange(dy)
+
+
+def _theil_sen(x, y):
+    """
+    Return the slope and the intercept of the Theil-Sen line fit.
+    """
+    i, j = np.triu_indices(x.size, 1)
+    slope = 0.
+    if i.size > 0:
+        slope = np.median((y[j] - y[i]) / (x[j] - x[i]))
+    return slope, np.median(y - slope * x)
+
+
+def _find_center_sino(sino, theta, init, tol, mask, ratio, ncore):
+    """
+    Return the rotation axis location of a float32 sinogram.
+    """
+    dz = sino.shape[1]
+    cache = _center_cache(sino, theta, mask, ratio)
+
+    # Coarse search, one binned pixel apart, within a quarter of the
+    # detector width of the initial guess.
+    nbin = max(1, dz // _CENTER_COARSE_WIDTH)
+    rad = max(dz / 4., 4.)
+    center = nbin * np.arange(
+        np.floor((init - rad) / nbin), np.ceil((init + rad) / nbin) + 1)
+    center = center[(center > 0) & (center < dz)]
+    if center.size == 0:
+        center = np.array([init])
+    cost = _center_entropy(cache, theta, nbin, center, ncore)
+    best = center[np.argmin(cost)]
+
+    # Refine at full resolution between the coarse neighbors.
+    center = best + np.arange(-nbin, nbin + tol / 2., tol)
+    cost = _center_entropy(cache, theta, 1, center, ncore)
+    return float(center[np.argmin(cost)])
+
+
+def find_center_pc(tomo, theta, ind=None, emission=True, tol=0.5):
+    """
+    Find rotation axis location by phase correlation.
+
+    The projection at angle ``theta + pi`` is the mirror image of the
+    projection at ``theta`` about the rotation axis. The pair of
+    projections closest to being opposite is picked from ``theta``, one of
+    them is mirrored, and their relative shift along the detector is
+    found by phase correlation, refined to sub-pixel accuracy with a
+    local discrete Fourier transform :cite:`Guizar:08`. No reconstruction
+    is needed, so this is much faster than :func:`find_center`.
+
+    Parameters
+    ----------
+    tomo : ndarray
+        3D tomographic data.
+    theta : array
+        Projection angles in radian. Must include (nearly) opposite angles,
+        as in 180 or 360 degree scans.
+    ind : int or array of int, optional
+        Index of the slices to be used. If ``None``, all slices are
+        combined into a single estimate.
+    emission : bool, optional
+        Determines whether data is emission or transmission type.
+    tol : scalar, optional
+        Desired sub-pixel accuracy.
+
+    Returns
+    -------
+    float or ndarray
+        Rotation axis location. An array with one center per slice is
+        returned when ``ind`` is a sequence.
+    """
+    dx, dy, dz = tomo.shape
+    theta = np.array(theta, dtype='float64')
+    if theta.size != dx:
+        raise ValueError(
+            'theta has %d angles but tomo has %d projections' %
+            (theta.size, dx))
+
+    # Pick the most nearly opposite pair of projections.
+    diff = theta[np.newaxis, :] - theta[:, np.newaxis] - np.pi
+    diff = np.abs(np.mod(diff + np.pi, 2 * np.pi) - np.pi)
+    p, q = np.unravel_index(np.argmin(diff), diff.shape)
+    if diff[p, q] > 1e-3:
+        logger.warning(
+            'No opposite projections; using angles %.4f and %.4f.',
+            theta[p], theta[q])
+
+    rows = ind
+    if rows is None:
+        rows = slice(None)
+    elif np.ndim(rows) == 0:
+        rows = [rows]
+    proj1 = np.array(tomo[p, rows, :], dtype='float64', ndmin=2)
+    proj2 = np.array(tomo[q, rows, ::-1], dtype='float64', ndmin=2)
+    if emission is False:
+        proj1 = -np.log(proj1)
+        proj2 = -np.log(proj2)
+
+    # Normalized cross-power spectrum, zero padded against wrap-around.
+    n = 2 * dz
+    cps = np.conj(np.fft.fft(proj2, n)) * np.fft.fft(proj1, n)
+    if ind is None:
+        cps = cps.sum(axis=0, keepdims=True)
+    cps /= np.abs(cps) + 1e-12 * np.abs(cps).max()
+
+    # Integer shift, then a finer grid around it. The center moves by
+    # half of the shift.
+    shift = np.argmax(np.fft.ifft(cps).real, axis=1)
+    shift = np.where(shift > n // 2, shift - n, shift).astype('float64')
+    step = 2. * tol
+    grid = np.arange(-1., 1. + step / 2., step)
+    freq = np.fft.fftfreq(n)
+    peak = shift.copy()
+    for s in np.unique(peak):
+        sel = peak == s
+        kernel = np.exp(2j * np.pi * np.outer(freq, s + grid))
+        corr = np.dot(cps[sel], kernel).real
+        shift[sel] = s + grid[np.argmax(corr, axis=1)]
+    center = (dz + shift) / 2.
+
+    if ind is None or np.ndim(ind) == 0:
+        return float(center[0])
+    return center
+
+
+# Detector width of the binned sinogram of the coarse center search.
+_CENTER_COARSE_WIDTH = 256
+
+# Number of sinograms for which find_center keeps its evaluations.
+_CENTER_CACHE_SIZE = 8
+
+# Number of geometries for which find_center keeps its gridrec plans.
+_CENTER_PLAN_SIZE = 4
+
+# The caches are shared by the threads of find_center_line, which hold
+# the lock while looking up, adding and dropping entries.
+_center_lock = threading.Lock()
+_center_caches = OrderedDict()
+_center_plans = OrderedDict()
+_masks = {}
+
+
+def _center_cache(sino, theta, mask, ratio):
+    """
+    Return the memo of ``find_center`` evaluations for the sinogram,
+    creating it if necessary. Least recently used memos are dropped.
+    """
+    key = (hashlib.sha1(sino.tobytes()).hexdigest(),
+           hashlib.sha1(theta.tobytes()).hexdigest(),
+           sino.shape, mask, ratio)
+    with _center_lock:
+        cache = _center_caches.pop(key, None)
+        if cache is None:
+            cache = {'sino': sino, 'mask': mask, 'ratio': ratio}
+        _center_caches[key] = cache
+        while len(_center_caches) > _CENTER_CACHE_SIZE:
+            _center_caches.popitem(last=False)
+    return cache
+
+
+def _center_plan(theta, dz):
+    """
+    Return the (cached) gridrec plan of ``find_center`` for the geometry,
+    so that all slices of a dataset share it.
+    """
+    key = (hashlib.sha1(theta.tobytes()).hexdigest(), dz)
+    with _center_lock:
+        plan = _center_plans.pop(key, None)
+        if plan is None:
+            plan = GridrecPlan(theta, dz)
+        _center_plans[key] = plan
+        while len(_center_plans) > _CENTER_PLAN_SIZE:
+            _center_plans.popitem(last=False)
+    return plan
+
+
+def _center_entropy(cache, theta, nbin, center, ncore):
+    """
+    Return the entropy of the reconstructions of the cached sinogram,
+    binned by ``nbin`` along the detector, for each center. Centers are
+    given in unbinned pixels. Only centers not evaluated before are
+    reconstructed.
+    """
+    level = cache.get(nbin)
+    if level is None:
+        sino = cache['sino']
+        if nbin > 1:
+            dz = sino.shape[1] // nbin
+            sino = sino[:, 0:dz * nbin].reshape(-1, dz, nbin).mean(axis=2)
+        dz = sino.shape[1]
+        level = {'sino': sino, 'plan': _center_plan(theta, dz), 'cost': {}}
+        if cache['mask'] is True:
+            level['mask'] = _circular_mask(dz, cache['ratio'])
+
+        # Make an initial reconstruction to adjust histogram limits.
+        rec = level['plan'].sweep(sino, dz / 2., ncore=ncore)
+        if 'mask' in level:
+            rec[:, level['mask']] = 0
+        hmin = np.min(rec)
+        if hmin < 0:
+            hmin = 2 * hmin
+        elif hmin >= 0:
+            hmin = 0.5 * hmin
+        hmax = np.max(rec)
+        if hmax < 0:
+            hmax = 0.5 * hmax
+        elif hmax >= 0:
+            hmax = 2 * hmax
+        level['range'] = (hmin, hmax)
+        cache[nbin] = level
+
+    cost = level['cost']
+    todo = [float(c) for c in center if float(c) not in cost]
+    if todo:
+        rec = level['plan'].sweep(
+            level['sino'], np.array(todo) / nbin, ncore=ncore)
+        if 'mask' in level:
+            rec[:, level['mask']] = 0
+        for m in range(len(todo)):
+            hist, e = np.histogram(rec[m], bins=64, range=level['range'])
+            hist = hist.astype('float32') / rec[m].size + 1e-12
+            cost[todo[m]] = -np.dot(hist, np.log2(hist))
+    return np.array([cost[float(c)] for c in center])
+
+
+def _circular_mask(n, ratio):
+    """
+    Return the (cached) mask of the pixels of an ``n`` by ``n`` image
+    that lie outside the circle of radius ``ratio * n / 2``.
+    """
+    key = (n, ratio)
+    with _center_lock:
+        if key not in _masks:
+            rad = n / 2.
+            y, x = np.ogrid[-rad:rad, -rad:rad]
+            _masks[key] = x * x + y * y > ratio * ratio * rad * rad
+        return _masks[key]